@@ -0,0 +1,212 @@
+"""
+Offline codegen benchmark.
+
+Replays every non-empty graph of the state store (core_db/users.db, legacy
+user_assets/*/data_config.json files are imported by its migration) through
+map_json, gen_code and graph_to_code against the local LLM stub, and reports per stage
+latency, validation failures and cache effectiveness (template hits and
+single-flight coalescing).
+
+    python -m benchmarks.codegen_bench --rounds 3 --duplicates 4 --latency 1.5
+    python -m benchmarks.codegen_bench --recordings benchmarks/recordings --record   # needs GROQ_API_KEY once
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from dotenv import load_dotenv
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+DUMMY_WALLET = {"address": "0x0", "privateKey": {}, "secretKey": "benchmark"}
+
+
+def start_stub(port, latency, recordings, record):
+    import uvicorn
+    from codegen_engine.llm_stub_server import create_stub_app
+
+    app = create_stub_app(latency=latency, recordings_dir=recordings, record=record, api_key=os.getenv("GROQ_API_KEY"))
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return app, server
+
+
+def prepare_sandbox(assets_dir, db_path):
+    # graph_to_code writes into the uid asset folders and the state store, so run against a throwaway copy
+    sandbox = tempfile.mkdtemp(prefix="codegen_bench_")
+    shutil.copytree(assets_dir, os.path.join(sandbox, "user_assets"))
+    os.makedirs(os.path.join(sandbox, "core_db"))
+    if os.path.isfile(db_path):
+        shutil.copy2(db_path, os.path.join(sandbox, "core_db", "users.db"))
+    return sandbox
+
+
+async def load_corpus():
+    # Runs inside the sandbox: migrating the copied database imports any legacy sidecar files
+    from core_db.db_access import init_db, fetch_all
+    from core_db.state_store import set_wallet_once
+
+    await init_db()
+    corpus = []
+    for uid, graph in await fetch_all("SELECT uid, graph FROM user_state ORDER BY uid"):
+        graph = json.loads(graph)
+        if isinstance(graph, dict) and graph.get("nodes"):
+            corpus.append((uid, graph))
+            await set_wallet_once(uid, DUMMY_WALLET)
+    return corpus
+
+
+def summarise(samples):
+    if not samples:
+        return "n/a"
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return f"mean {statistics.mean(ordered) * 1000:9.2f} ms | p50 {statistics.median(ordered) * 1000:9.2f} ms | p95 {p95 * 1000:9.2f} ms | n={len(ordered)}"
+
+
+async def run_benchmark(rounds, duplicates):
+    from utils.json_to_map import map_json
+    from utils.graph_preprocess import canonical_graph_hash
+    from codegen_engine.graph_codegen import gen_code
+    from codegen_engine.code_correction import validate_generated_code
+    from codegen_engine.template_compiler import compile_graph
+    from server_integrity.deploy_loc import graph_to_code
+
+    corpus = await load_corpus()
+    timings = {"map_json": [], "template": [], "gen_code": [], "validate": [], "graph_to_code": []}
+    counters = {"graphs": 0, "gen_requests": 0, "template_hits": 0, "validation_failures": 0, "deploy_failures": 0}
+
+    for _ in range(rounds):
+        for uid, graph in corpus:
+            counters["graphs"] += 1
+
+            started = time.perf_counter()
+            mapped = map_json(graph)
+            timings["map_json"].append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            compiled = compile_graph(graph)
+            timings["template"].append(time.perf_counter() - started)
+            if compiled:
+                counters["template_hits"] += 1
+
+            # Duplicate concurrent requests for the same graph exercise single-flight
+            key = canonical_graph_hash(graph)
+
+            async def timed_gen():
+                begin = time.perf_counter()
+                result = await gen_code(mapped, None, key=key)
+                timings["gen_code"].append(time.perf_counter() - begin)
+                return result
+
+            results = await asyncio.gather(*[timed_gen() for _ in range(duplicates)], return_exceptions=True)
+            counters["gen_requests"] += duplicates
+            for result in results:
+                if isinstance(result, Exception):
+                    counters["validation_failures"] += 1
+                    continue
+                started = time.perf_counter()
+                validation = validate_generated_code(*result)
+                timings["validate"].append(time.perf_counter() - started)
+                if validation["status"] != "success":
+                    counters["validation_failures"] += 1
+
+            started = time.perf_counter()
+            output = await graph_to_code(uid, None, "low")
+            timings["graph_to_code"].append(time.perf_counter() - started)
+            if output.get("status") != "success":
+                counters["deploy_failures"] += 1
+
+    return corpus, timings, counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline codegen benchmark against the recorded/stub LLM")
+    parser.add_argument("--assets", default=os.path.join(PROJECT_ROOT, "user_assets"))
+    parser.add_argument("--db", default=os.path.join(PROJECT_ROOT, "core_db", "users.db"))
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--duplicates", type=int, default=3, help="Concurrent identical gen_code calls per graph")
+    parser.add_argument("--latency", type=float, default=0.0, help="Injected LLM latency in seconds")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--recordings", help="Replay (and with --record, capture) responses from this directory")
+    parser.add_argument("--record", action="store_true")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    # Configure the codegen client before codegen_engine is imported; .env first, it never overrides what is set
+    load_dotenv()
+    if not args.record:
+        # The stub answers from recordings or canned responses, any key satisfies the client
+        os.environ.setdefault("GROQ_API_KEY", "offline-benchmark")
+    elif not os.getenv("GROQ_API_KEY"):
+        parser.error("--record forwards to Groq and needs GROQ_API_KEY (environment or .env)")
+    os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{args.port}"
+
+    assets_dir = os.path.abspath(args.assets)
+    recordings = os.path.abspath(args.recordings) if args.recordings else None
+    app, server = start_stub(args.port, args.latency, recordings, args.record)
+    sandbox = prepare_sandbox(assets_dir, os.path.abspath(args.db))
+    cwd = os.getcwd()
+    os.chdir(sandbox)
+    try:
+        started = time.perf_counter()
+        corpus, timings, counters = asyncio.run(run_benchmark(args.rounds, args.duplicates))
+        wall = time.perf_counter() - started
+    finally:
+        from core_db.db_access import close_db
+        close_db()
+        os.chdir(cwd)
+        server.should_exit = True
+        shutil.rmtree(sandbox, ignore_errors=True)
+
+    if not corpus:
+        print(f"No graphs found in {args.db}")
+        return
+
+    from codegen_engine.token_metrics import usage_summary
+    stub_stats = dict(app.state.stats)
+    llm_calls = stub_stats["requests"]
+    llm_wanted = counters["gen_requests"] + counters["graphs"] - counters["template_hits"]
+    report = {
+        "graphs": len(corpus),
+        "rounds": args.rounds,
+        "wall_seconds": round(wall, 3),
+        "stages": {stage: summarise(samples) for stage, samples in timings.items()},
+        "counters": counters,
+        "validation_failure_rate": counters["validation_failures"] / max(counters["gen_requests"], 1),
+        "template_hit_rate": counters["template_hits"] / max(counters["graphs"], 1),
+        "llm_calls": llm_calls,
+        "llm_calls_saved": max(llm_wanted - llm_calls, 0),
+        "stub": stub_stats,
+        "tokens": usage_summary()["totals"],
+    }
+
+    print(f"\nCodegen benchmark: {len(corpus)} graph(s) x {args.rounds} round(s), {args.duplicates} duplicate request(s), {args.latency}s injected latency")
+    print("-" * 100)
+    for stage, line in report["stages"].items():
+        print(f"{stage:<14} {line}")
+    print("-" * 100)
+    print(f"Validation failure rate : {report['validation_failure_rate']:.1%}")
+    print(f"Template hit rate       : {report['template_hit_rate']:.1%}")
+    print(f"LLM calls               : {llm_calls} ({report['llm_calls_saved']} saved by coalescing/caching)")
+    print(f"Stub                    : {stub_stats}")
+    print(f"Deploy failures         : {counters['deploy_failures']}")
+    print(f"Wall time               : {wall:.2f}s")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
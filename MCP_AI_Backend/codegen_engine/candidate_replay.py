@@ -0,0 +1,69 @@
+"""
+Replay scoring of a generated strategy candidate, run as its own process.
+
+candidate_selection starts `python -m codegen_engine.candidate_replay` per
+candidate with {"imports", "code", "candles"} as JSON on stdin and reads
+{"score"} or {"error"} from stdout. Generated code never executes inside the
+API server: a candidate that loops forever or misbehaves is killed with its
+process when the replay timeout expires.
+"""
+import json
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+REPLAY_STEPS = 120      # decisions replayed per candidate
+REPLAY_WINDOW = 380     # candles visible to the strategy at each step
+
+
+def build_strategy(imports, code):
+    """Compile a validated candidate into a callable agent_code(data), mirroring trading_code.py."""
+    from scipy.stats import linregress
+    namespace = {"np": np, "json": json, "time": time, "datetime": datetime, "linregress": linregress}
+    exec("\n".join(imports), namespace)
+    body = "\n".join("    " + line for line in code.splitlines())
+    exec(f"def agent_code(data):\n{body}\n    return decision_to_buy_or_sell", namespace)
+    return namespace["agent_code"]
+
+
+def score_candidate(imports, code, candles):
+    """Replay the strategy over the last REPLAY_STEPS candles, returns the long/flat equity multiple."""
+    strategy = build_strategy(imports, code)
+    closes = np.array([c["close"] for c in candles], dtype=float)
+    start = max(len(candles) - REPLAY_STEPS, 1)
+
+    decisions = []
+    for end in range(start, len(candles)):
+        data = {"candlesticks": candles[max(0, end + 1 - REPLAY_WINDOW):end + 1]}
+        decisions.append(strategy(data))
+
+    # Same state machine as the bot: buy enters a position, sell leaves it
+    position = np.zeros(len(decisions))
+    holding = 0.0
+    for i, decision in enumerate(decisions):
+        if decision == "buy":
+            holding = 1.0
+        elif decision == "sell":
+            holding = 0.0
+        position[i] = holding
+
+    returns = np.diff(closes[start - 1:]) / closes[start - 1:-1]
+    # Position taken at candle i earns the return of candle i + 1
+    equity = np.prod(1 + position[:-1] * returns[1:]) if len(decisions) > 1 else 1.0
+    return float(equity)
+
+
+def main():
+    request = json.load(sys.stdin)
+    # The candidate may print, only the last stdout line is the result
+    try:
+        result = {"score": score_candidate(request["imports"], request["code"], request["candles"])}
+    except Exception as e:
+        result = {"error": f"{type(e).__name__}: {e}"}
+    sys.stdout.write("\n" + json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
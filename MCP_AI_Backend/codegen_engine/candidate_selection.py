@@ -0,0 +1,116 @@
+import asyncio
+import json
+import os
+import sys
+from codegen_engine.graph_codegen import generate_code_response, codegen_flight, report
+from codegen_engine.code_correction import validate_generated_code
+from data_integrity.sui_fetch import fetch_candlesticks
+
+MAX_CANDIDATES = 5
+CANDLE_FETCH_TIMEOUT = 5
+REPLAY_TIMEOUT = 20     # seconds a candidate replay process may run before it is killed
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def fetch_replay_candles(symbol="SUIUSDC"):
+    """Current 1m window used to score candidates, None when it cannot be fetched in time."""
+    try:
+        return await asyncio.wait_for(
+            asyncio.to_thread(fetch_candlesticks, symbol=symbol, interval="1m", limit=500),
+            timeout=CANDLE_FETCH_TIMEOUT,
+        )
+    except Exception as e:
+        print(f"[CANDIDATES] Unable to fetch replay candles: {e}")
+        return None
+
+
+async def replay_score(imports, code, candles):
+    """Score a candidate in its own process (codegen_engine.candidate_replay), killed after REPLAY_TIMEOUT seconds."""
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "codegen_engine.candidate_replay",
+        cwd=PROJECT_ROOT,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    payload = json.dumps({"imports": imports, "code": code, "candles": candles}).encode("utf-8")
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(payload), timeout=REPLAY_TIMEOUT)
+    except BaseException:
+        # Timeout, or the deploy stream was cancelled: never leave the candidate running
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        raise
+    lines = stdout.decode("utf-8", errors="replace").strip().splitlines()
+    try:
+        result = json.loads(lines[-1])
+    except (IndexError, json.JSONDecodeError):
+        raise RuntimeError(f"Replay exited with code {process.returncode}: {stderr.decode('utf-8', errors='replace')[-300:]}")
+    if "error" in result:
+        raise RuntimeError(result["error"])
+    return result["score"]
+
+
+async def gen_best_code(json_data, candidates, on_progress=None, key=None):
+    """Generate candidates concurrently, validate them and keep the best one on a short replay."""
+    if key is not None:
+        result, _ = await codegen_flight.do(f"{key}:best-of-{candidates}", _gen_best_code, json_data, candidates, on_progress)
+    else:
+        result = await _gen_best_code(json_data, candidates, on_progress)
+    requirements, imports, code = result
+    return list(requirements), list(imports), code
+
+
+async def _gen_best_code(json_data, candidates, on_progress=None):
+    candidates = max(1, min(candidates, MAX_CANDIDATES))
+    candles_task = asyncio.create_task(fetch_replay_candles())
+    generations = [asyncio.create_task(generate_code_response(json_data)) for _ in range(candidates)]
+
+    valid = []
+    try:
+        for i, generation in enumerate(asyncio.as_completed(generations), start=1):
+            try:
+                response = await generation
+            except Exception as e:
+                report(on_progress, f"[GRAPH CANDIDATE] Candidate {i}/{candidates} failed: {e}\n")
+                continue
+            validation = validate_generated_code(response.requirements, response.imports, response.code)
+            if validation["status"] != "success":
+                report(on_progress, f"[GRAPH CANDIDATE] Candidate {i}/{candidates} rejected: {validation['errors'][0]}\n")
+                continue
+            report(on_progress, f"[GRAPH CANDIDATE] Candidate {i}/{candidates} passed validation\n")
+            valid.append((validation["requirements"], validation["imports"], validation["code"]))
+    finally:
+        for generation in generations:
+            generation.cancel()
+
+    if not valid:
+        candles_task.cancel()
+        raise ValueError(f"None of the {candidates} generated candidates passed validation")
+
+    candles = await candles_task
+    if len(valid) == 1 or not candles:
+        return valid[0]
+
+    # Score all candidates in parallel replay processes
+    scores = await asyncio.gather(
+        *[replay_score(imports, code, candles) for _, imports, code in valid],
+        return_exceptions=True,
+    )
+    best, best_score = None, None
+    for i, (candidate, score) in enumerate(zip(valid, scores), start=1):
+        if isinstance(score, asyncio.TimeoutError):
+            report(on_progress, f"[GRAPH CANDIDATE] Candidate {i} replay killed after {REPLAY_TIMEOUT}s\n")
+            continue
+        if isinstance(score, Exception):
+            report(on_progress, f"[GRAPH CANDIDATE] Candidate {i} failed replay: {score}\n")
+            continue
+        report(on_progress, f"[GRAPH CANDIDATE] Candidate {i} replay return: {(score - 1) * 100:+.3f}%\n")
+        if best_score is None or score > best_score:
+            best, best_score = candidate, score
+
+    if best is None:
+        raise ValueError("Every candidate failed the replay")
+    return best
@@ -0,0 +1,75 @@
+import asyncio
+import json
+from utils.asset_files import read_asset, write_asset
+from utils.json_to_map import map_json
+from codegen_engine.graph_codegen import gen_code, report
+from codegen_engine.candidate_selection import gen_best_code
+from codegen_engine.template_compiler import compile_graph
+from codegen_engine.code_correction import validate_generated_code
+
+CODE_CACHE_FILE = "generated_code.json"
+
+
+class CodeValidationError(ValueError):
+    pass
+
+
+async def load_cached_code(uid):
+    try:
+        return json.loads(await asyncio.to_thread(read_asset, uid, CODE_CACHE_FILE, "{}"))
+    except json.JSONDecodeError:
+        return {}
+
+
+async def save_cached_code(uid, entries):
+    # The atomic write fsyncs, keep it off the event loop
+    await asyncio.to_thread(write_asset, uid, CODE_CACHE_FILE, json.dumps(entries, indent=4))
+
+
+async def discard_cached_code(uid):
+    # A deploy stage after code generation failed, the next attempt must not reuse the same code
+    await save_cached_code(uid, {})
+
+
+async def generate_graph_code(ir, on_progress=None, candidates=1):
+    # Template, best-of-K or a single generation
+    key = ir.fingerprint
+    graph = ir.to_workflow()
+    compiled = compile_graph(graph)
+    if compiled:
+        template, req, imp, code = compiled
+        report(on_progress, f"[GRAPH TEMPLATE] Strategy matched the built-in '{template}' template, skipping LLM generation\n")
+    elif candidates > 1:
+        req, imp, code = await gen_best_code(map_json(graph), candidates, on_progress, key=key)
+    else:
+        req, imp, code = await gen_code(map_json(graph), on_progress, key=key)
+
+    validation = validate_generated_code(req, imp, code)
+    if validation["status"] != "success":
+        raise CodeValidationError("Generated code failed validation: " + "; ".join(validation["errors"]))
+    for repair in validation["repairs"]:
+        report(on_progress, f"[GRAPH REPAIR] {repair}\n")
+    return {"requirements": validation["requirements"], "imports": validation["imports"], "code": validation["code"]}
+
+
+async def build_strategy_code(uid, ir, on_progress=None, candidates=1):
+    """
+    Generate the strategy for a graph, reusing the cached code of an unchanged graph.
+
+    The whole graph is generated at once, its strategy nodes together, and the
+    result is cached under the IR fingerprint, so a layout-only edit (moving a
+    node) does not regenerate. Editing any node's data regenerates the whole
+    graph: strategy nodes are not cached one by one, since there is no rule to
+    merge their separate decisions. A failed install, import or launch discards
+    the cache through discard_cached_code.
+    """
+    key = ir.fingerprint
+    cached = await load_cached_code(uid)
+    if key in cached:
+        report(on_progress, "[GRAPH CODE CACHE] Graph unchanged since the last generation, reusing its code\n")
+        entry = cached[key]
+    else:
+        entry = await generate_graph_code(ir, on_progress, candidates)
+        # Only the current graph is kept
+        await save_cached_code(uid, {key: entry})
+    return list(entry["requirements"]), list(entry["imports"]), entry["code"]
@@ -0,0 +1,298 @@
+import ast
+import re
+import builtins
+
+# Standard library modules generated strategies may import
+ALLOWED_STDLIB = {
+    "math", "statistics", "random", "datetime", "time", "json", "collections",
+    "itertools", "functools", "operator", "decimal", "fractions", "typing",
+    "heapq", "bisect", "copy",
+}
+
+# Third party modules generated strategies may import -> PyPI distribution name
+ALLOWED_PACKAGES = {
+    "numpy": "numpy",
+    "pandas": "pandas",
+    "ta": "ta",
+    "scipy": "scipy",
+    "sklearn": "scikit-learn",
+    "statsmodels": "statsmodels",
+    "pandas_ta": "pandas-ta",
+}
+
+# Conventional aliases we can add an import for when the model forgot it
+KNOWN_ALIASES = {
+    "pd": "import pandas as pd",
+    "np": "import numpy as np",
+    "math": "import math",
+    "statistics": "import statistics",
+    "random": "import random",
+}
+
+# Names defined by the trading_code.py template around agent_code(data)
+TEMPLATE_NAMES = {"data", "np", "json", "time", "datetime", "linregress"}
+
+# Template globals and builtins a strategy must never touch
+FORBIDDEN_NAMES = {
+    "open", "eval", "exec", "compile", "__import__", "globals", "locals", "vars",
+    "input", "breakpoint", "exit", "quit", "getattr", "setattr", "delattr",
+    "os", "requests", "redis", "wallet", "swap", "candle_generator",
+}
+
+# Methods that would mutate `data` in place
+MUTATING_METHODS = {
+    "append", "extend", "insert", "pop", "remove", "clear", "update", "sort",
+    "reverse", "setdefault", "popitem", "__setitem__", "__delitem__",
+}
+
+DECISION_NAME = "decision_to_buy_or_sell"
+DECISIONS = {"buy", "sell", "hold"}
+BUILTIN_NAMES = set(dir(builtins))
+
+
+def _root_name(node):
+    # data['candlesticks'][-1].x -> "data"
+    while isinstance(node, (ast.Subscript, ast.Attribute)):
+        node = node.value
+    return node.id if isinstance(node, ast.Name) else None
+
+
+def _module_root(name):
+    return name.split(".")[0] if name else ""
+
+
+def _requirement_name(requirement):
+    # "pandas>=2.0" -> "pandas"
+    return re.split(r"[<>=!~\[; ]", requirement.strip(), maxsplit=1)[0].lower().replace("_", "-")
+
+
+def _assigns_decision(stmts):
+    """True when every path through stmts assigns decision_to_buy_or_sell."""
+    for stmt in stmts:
+        if isinstance(stmt, (ast.Assign, ast.AnnAssign)):
+            targets = stmt.targets if isinstance(stmt, ast.Assign) else [stmt.target]
+            for target in targets:
+                names = [n.id for n in ast.walk(target) if isinstance(n, ast.Name)]
+                if DECISION_NAME in names and (not isinstance(stmt, ast.AnnAssign) or stmt.value is not None):
+                    return True
+        elif isinstance(stmt, ast.If):
+            if _assigns_decision(stmt.body) and _assigns_decision(stmt.orelse):
+                return True
+        elif isinstance(stmt, ast.Try):
+            if _assigns_decision(stmt.finalbody):
+                return True
+            body_ok = _assigns_decision(stmt.body + stmt.orelse)
+            if body_ok and all(_assigns_decision(handler.body) for handler in stmt.handlers):
+                return True
+        elif isinstance(stmt, ast.With):
+            if _assigns_decision(stmt.body):
+                return True
+        elif isinstance(stmt, ast.Match):
+            last = stmt.cases[-1] if stmt.cases else None
+            catch_all = last is not None and isinstance(last.pattern, ast.MatchAs) and last.pattern.pattern is None and last.guard is None
+            if catch_all and all(_assigns_decision(case.body) for case in stmt.cases):
+                return True
+    return False
+
+
+def _decision_constants(tree):
+    """String literals assigned (directly or via a conditional expression) to the decision."""
+    values = []
+
+    def collect(node):
+        if isinstance(node, ast.Constant):
+            values.append(node.value)
+        elif isinstance(node, ast.IfExp):
+            collect(node.body)
+            collect(node.orelse)
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id == DECISION_NAME for t in node.targets):
+            collect(node.value)
+    return values
+
+
+class _PrintRemover(ast.NodeTransformer):
+    def __init__(self):
+        self.removed = 0
+
+    def visit_Expr(self, node):
+        if isinstance(node.value, ast.Call) and isinstance(node.value.func, ast.Name) and node.value.func.id == "print":
+            self.removed += 1
+            return None
+        return node
+
+    def generic_visit(self, node):
+        super().generic_visit(node)
+        # Keep blocks syntactically valid when their only statement was a print
+        if not isinstance(node, ast.Module) and isinstance(getattr(node, "body", None), list) and not node.body:
+            node.body.append(ast.Pass())
+        return node
+
+
+def _clean_code(code):
+    code = code.strip()
+    # Markdown fences around the code segment
+    code = re.sub(r"^```(?:python)?\s*\n", "", code)
+    code = re.sub(r"\n```\s*$", "", code)
+    # Literal "\n" sequences instead of real new lines
+    if "\n" not in code and "\\n" in code:
+        code = code.replace("\\n", "\n")
+    return code
+
+
+def validate_generated_code(requirements, imports, code):
+    """
+    Statically check an LLM generated strategy before anything is installed.
+
+    Enforces the rules of the codegen prompt (no loops/prints/returns, `data` is
+    read only, the decision is assigned on every path, only allowed modules,
+    requirements match imports) and repairs what can be repaired safely:
+    imports inside the code, print calls, missing well known imports and the
+    requirements list.
+    """
+    errors = []
+    repairs = []
+
+    # Step 1: Parse the import statements
+    import_nodes = []
+    import_lines = []
+    for line in imports:
+        try:
+            parsed = ast.parse(line.strip())
+        except SyntaxError as e:
+            errors.append(f"Invalid import statement '{line}': {e.msg}")
+            continue
+        for stmt in parsed.body:
+            if isinstance(stmt, (ast.Import, ast.ImportFrom)):
+                import_nodes.append(stmt)
+                import_lines.append(ast.unparse(stmt))
+            else:
+                errors.append(f"Non-import statement in imports: '{ast.unparse(stmt)}'")
+
+    # Step 2: Parse the strategy code
+    cleaned = _clean_code(code)
+    if cleaned != code.strip():
+        repairs.append("Removed code fences / escaped new lines from the code")
+    try:
+        tree = ast.parse(cleaned)
+    except SyntaxError as e:
+        errors.append(f"Strategy code does not parse: {e.msg} (line {e.lineno})")
+        return {"status": "error", "errors": errors, "repairs": repairs}
+    code_changed = False
+
+    # Step 3: Move import statements out of the code body
+    body = []
+    for stmt in tree.body:
+        if isinstance(stmt, (ast.Import, ast.ImportFrom)):
+            import_nodes.append(stmt)
+            import_lines.append(ast.unparse(stmt))
+            repairs.append(f"Moved '{ast.unparse(stmt)}' from the code into imports")
+            code_changed = True
+        else:
+            body.append(stmt)
+    tree.body = body
+
+    # Step 4: Strip print calls
+    remover = _PrintRemover()
+    tree = remover.visit(tree)
+    if remover.removed:
+        repairs.append(f"Removed {remover.removed} print statement(s)")
+        code_changed = True
+    if not tree.body:
+        errors.append("Strategy code is empty")
+
+    # Step 5: Structural rules
+    bound = set(TEMPLATE_NAMES)
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.For, ast.AsyncFor, ast.While)):
+            errors.append(f"Loops are not allowed (line {node.lineno})")
+        elif isinstance(node, (ast.Return, ast.Yield, ast.YieldFrom)):
+            errors.append(f"return/yield is not allowed (line {node.lineno})")
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            errors.append(f"Nested import statements are not allowed (line {node.lineno})")
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            errors.append(f"global/nonlocal is not allowed (line {node.lineno})")
+        elif isinstance(node, ast.Name):
+            if node.id in FORBIDDEN_NAMES:
+                errors.append(f"Use of '{node.id}' is not allowed (line {node.lineno})")
+            if node.id == "data" and isinstance(node.ctx, (ast.Store, ast.Del)):
+                errors.append(f"`data` must not be reassigned (line {node.lineno})")
+            if isinstance(node.ctx, ast.Store):
+                bound.add(node.id)
+        elif isinstance(node, (ast.Subscript, ast.Attribute)) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            if _root_name(node) == "data":
+                errors.append(f"`data` must not be modified (line {node.lineno})")
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+            if node.func.attr in MUTATING_METHODS and _root_name(node.func.value) == "data":
+                errors.append(f"`data` must not be modified via .{node.func.attr}() (line {node.lineno})")
+        elif isinstance(node, (ast.FunctionDef, ast.Lambda)):
+            args = node.args
+            for arg in args.posonlyargs + args.args + args.kwonlyargs + [args.vararg, args.kwarg]:
+                if arg is not None:
+                    bound.add(arg.arg)
+            if isinstance(node, ast.FunctionDef):
+                bound.add(node.name)
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            bound.add(node.name)
+
+    if not _assigns_decision(tree.body):
+        errors.append(f"`{DECISION_NAME}` is not assigned on every code path")
+    for value in _decision_constants(tree):
+        if value not in DECISIONS:
+            errors.append(f"`{DECISION_NAME}` assigned invalid value {value!r}, expected buy/sell/hold")
+
+    # Step 6: Module allow list
+    used_modules = set()
+    for stmt in import_nodes:
+        if isinstance(stmt, ast.ImportFrom):
+            if stmt.level:
+                errors.append(f"Relative imports are not allowed: '{ast.unparse(stmt)}'")
+                continue
+            modules = [stmt.module]
+            for alias in stmt.names:
+                if alias.name == "*":
+                    errors.append(f"Star imports are not allowed: '{ast.unparse(stmt)}'")
+                bound.add(alias.asname or alias.name)
+        else:
+            modules = [alias.name for alias in stmt.names]
+            for alias in stmt.names:
+                bound.add(alias.asname or _module_root(alias.name))
+        for module in modules:
+            root = _module_root(module)
+            if root not in ALLOWED_STDLIB and root not in ALLOWED_PACKAGES:
+                errors.append(f"Module '{module}' is not allowed")
+            used_modules.add(root)
+
+    # Step 7: Names that are used but never defined -> missing imports
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load):
+            if node.id in bound or node.id in BUILTIN_NAMES:
+                continue
+            if node.id in KNOWN_ALIASES:
+                line = KNOWN_ALIASES[node.id]
+                import_lines.append(line)
+                used_modules.add(_module_root(line.split()[1]))
+                bound.add(node.id)
+                repairs.append(f"Added missing '{line}'")
+            else:
+                errors.append(f"Name '{node.id}' is used but never defined (line {node.lineno})")
+                bound.add(node.id)
+
+    # Step 8: Requirements must be exactly the third party packages that are imported
+    expected = sorted({ALLOWED_PACKAGES[m] for m in used_modules if m in ALLOWED_PACKAGES})
+    given = sorted({_requirement_name(r) for r in requirements if r.strip()})
+    if given != expected:
+        repairs.append(f"Requirements {given} replaced by {expected} to match the imports")
+
+    if errors:
+        return {"status": "error", "errors": errors, "repairs": repairs}
+
+    return {
+        "status": "success",
+        "errors": [],
+        "repairs": repairs,
+        "requirements": expected,
+        "imports": list(dict.fromkeys(import_lines)),
+        "code": ast.unparse(ast.fix_missing_locations(tree)) if code_changed else cleaned,
+    }
@@ -1,7 +1,11 @@
 import json
-from groq import Groq
+import time
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List
+from codegen_engine.llm_client import stream_chat_completion
+from codegen_engine.stream_parser import ResponseStreamParser, MalformedStreamError
+from codegen_engine.single_flight import SingleFlight
+from codegen_engine.token_metrics import record_usage
 
 
 class ResponseFormat(BaseModel):
@@ -122,46 +126,88 @@ else:
 """
 
 
-def generate_code_response(json_data) -> Dict[str, Any]:
-    client = Groq(api_key="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")
+def report(on_progress, line):
+    if on_progress:
+        on_progress(line)
+
+
+async def generate_code_response(json_data, on_progress=None) -> ResponseFormat:
     prompt = get_prompt(json_data)
-    chat_completion = client.chat.completions.create(
-        model="deepseek-r1-distill-llama-70b",
-        messages=[
-            {
-                "role": "user",
-                "content": prompt
-            }
-        ],
-        temperature=0.6,
-        max_completion_tokens=4096,
-        top_p=0.95,
-        stream=False,
-        reasoning_format="parsed",
-        response_format={"type": "json_object"}
-    )
-
-    response_content = chat_completion.choices[0].message.content
-    parsed_response = json.loads(response_content)
+    parser = ResponseStreamParser()
+    reasoning_chunks = 0
+    content_chunks = 0
+    usage = None
+    started = time.monotonic()
+
+    try:
+        # JSON mode is not available on streamed completions, the parser enforces the schema instead
+        async for chunk in stream_chat_completion(
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            temperature=0.6,
+            max_completion_tokens=4096,
+            top_p=0.95,
+            reasoning_format="parsed",
+        ):
+            # Groq reports usage on the final chunk
+            x_groq = getattr(chunk, "x_groq", None)
+            usage = getattr(x_groq, "usage", None) or getattr(chunk, "usage", None) or usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if getattr(delta, "reasoning", None):
+                reasoning_chunks += 1
+                if reasoning_chunks % 200 == 0:
+                    report(on_progress, f"[GRAPH STREAM] Model reasoning... {reasoning_chunks} tokens\n")
+            if delta.content:
+                content_chunks += 1
+                # Raises MalformedStreamError and closes the stream on the first invalid character
+                for field in parser.feed(delta.content):
+                    report(on_progress, f"[GRAPH STREAM] Received '{field}' ({content_chunks} tokens)\n")
+                if content_chunks % 100 == 0:
+                    report(on_progress, f"[GRAPH STREAM] Generating strategy code... {content_chunks} tokens\n")
+    except BaseException:
+        record_usage("codegen", len(prompt), usage, time.monotonic() - started, aborted=True)
+        raise
+    record_usage("codegen", len(prompt), usage, time.monotonic() - started)
+
+    if not parser.complete:
+        raise MalformedStreamError("LLM response ended before the JSON object was complete")
+
+    # The prompt asks for the code on real lines, strict=False accepts raw newlines and tabs inside strings
+    parsed_response = json.loads(parser.text(), strict=False)
 
     # Optional: Validate the structure using the Pydantic model
     validated_response = ResponseFormat(**parsed_response)
 
-    # Return as dict
     return validated_response
 
 
+# Identical graphs deployed at the same time share one LLM call
+codegen_flight = SingleFlight()
+
+
 # Example of how to use this function:
-def gen_code(json_data) -> tuple[list[str], list[str], str]:
-    result = generate_code_response(json_data)
+async def gen_code(json_data, on_progress=None, key=None) -> tuple[list[str], list[str], str]:
+    if key is None:
+        result = await generate_code_response(json_data, on_progress)
+    else:
+        if codegen_flight.in_flight(key):
+            report(on_progress, "[GRAPH STREAM] Identical graph is already being generated, joining it...\n")
+        result, _ = await codegen_flight.do(key, generate_code_response, json_data, on_progress)
     
     # Extract the values from the ResponseFormat model
-    requirements = result.requirements
-    imports = result.imports
+    # (copies, since a coalesced result is handed to several callers)
+    requirements = list(result.requirements)
+    imports = list(result.imports)
     code = result.code
 
     # Pretty-print the entire structure if needed
     # print(json.dumps(result.dict(), indent=4))
     
     # Return the tuple
-    return requirements, imports, code
\ No newline at end of file
+    return requirements, imports, code
@@ -0,0 +1,84 @@
+import os
+import asyncio
+import httpx
+from dotenv import load_dotenv
+from groq import AsyncGroq, DefaultAsyncHttpxClient
+
+load_dotenv()
+
+# LLM configuration, read once from the environment / .env file
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None  # e.g. http://localhost:8765 for the offline stub server
+CODEGEN_MODEL = os.getenv("CODEGEN_MODEL", "deepseek-r1-distill-llama-70b")
+CODEGEN_MAX_CONCURRENCY = int(os.getenv("CODEGEN_MAX_CONCURRENCY", 8))
+CODEGEN_TIMEOUT = float(os.getenv("CODEGEN_TIMEOUT", 60))
+
+_client = None
+_semaphore = None
+
+
+def get_llm_client() -> AsyncGroq:
+    """Return the process wide AsyncGroq client, creating it on first use."""
+    global _client
+    if _client is None:
+        if not GROQ_API_KEY:
+            raise RuntimeError("GROQ_API_KEY is not configured, add it to the .env file")
+        # One pooled HTTP client shared by every codegen call
+        http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=CODEGEN_MAX_CONCURRENCY,
+                max_keepalive_connections=CODEGEN_MAX_CONCURRENCY,
+            ),
+            timeout=httpx.Timeout(CODEGEN_TIMEOUT, connect=5.0),
+        )
+        _client = AsyncGroq(
+            api_key=GROQ_API_KEY,
+            base_url=GROQ_BASE_URL,
+            http_client=http_client,
+            max_retries=1,
+        )
+    return _client
+
+
+def get_llm_semaphore() -> asyncio.Semaphore:
+    """Bound the number of LLM requests in flight across all users."""
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(CODEGEN_MAX_CONCURRENCY)
+    return _semaphore
+
+
+async def stream_chat_completion(**kwargs):
+    """Yield streamed completion chunks; the semaphore is held and the timeout enforced for the whole stream."""
+    client = get_llm_client()
+    loop = asyncio.get_running_loop()
+    async with get_llm_semaphore():
+        # The budget starts once a slot is free, time spent queued behind other requests does not count
+        deadline = loop.time() + CODEGEN_TIMEOUT
+        try:
+            stream = await asyncio.wait_for(
+                client.chat.completions.create(model=CODEGEN_MODEL, stream=True, **kwargs),
+                timeout=CODEGEN_TIMEOUT,
+            )
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"LLM request timed out after {CODEGEN_TIMEOUT:.0f}s")
+        try:
+            chunks = stream.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=max(deadline - loop.time(), 0))
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"LLM stream timed out after {CODEGEN_TIMEOUT:.0f}s")
+                yield chunk
+        finally:
+            # Closing the stream drops the connection, so an aborted generation stops costing tokens
+            await stream.close()
+
+
+async def close_llm_client():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
@@ -0,0 +1,171 @@
+"""
+Offline OpenAI-compatible stub for the codegen LLM.
+
+Point the backend at it with GROQ_BASE_URL=http://localhost:8765 (any non-empty
+GROQ_API_KEY works) to exercise the /deploy pipeline without reaching Groq.
+
+    python -m codegen_engine.llm_stub_server --port 8765 --latency 1.5
+
+With --recordings DIR the stub replays responses recorded per prompt; adding
+--record forwards unknown prompts to Groq once, with the same streamed request
+the backend sent, and stores the answer, so later runs are fully offline and
+deterministic.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+import uvicorn
+
+UPSTREAM_URL = "https://api.groq.com/openai/v1/chat/completions"
+
+# Canned strategy returned for every prompt, follows the ResponseFormat schema
+DEFAULT_RESPONSE = {
+    "requirements": ["numpy"],
+    "imports": ["import numpy as np"],
+    "code": (
+        "closes = np.array([c['close'] for c in data['candlesticks']])\n"
+        "sma_fast = closes[-20:].mean()\n"
+        "sma_slow = closes[-50:].mean()\n"
+        "if sma_fast > sma_slow:\n"
+        "    decision_to_buy_or_sell = \"buy\"\n"
+        "elif sma_fast < sma_slow:\n"
+        "    decision_to_buy_or_sell = \"sell\"\n"
+        "else:\n"
+        "    decision_to_buy_or_sell = \"hold\""
+    ),
+}
+
+
+def prompt_key(prompt):
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def create_stub_app(response=None, latency=0.0, recordings_dir=None, record=False, api_key=None):
+    app = FastAPI()
+    default_content = json.dumps(response or DEFAULT_RESPONSE)
+    app.state.stats = {"requests": 0, "replayed": 0, "recorded": 0, "default": 0}
+
+    async def record_upstream(body):
+        # Forward the request exactly as the backend sent it (streamed, no JSON mode), replays then see what production sees
+        headers = {"Authorization": f"Bearer {api_key}"}
+        async with httpx.AsyncClient(timeout=120) as client:
+            if not body.get("stream"):
+                reply = await client.post(UPSTREAM_URL, json=body, headers=headers)
+                reply.raise_for_status()
+                data = reply.json()
+                return {"content": data["choices"][0]["message"]["content"], "usage": data.get("usage")}
+            content, usage = [], None
+            async with client.stream("POST", UPSTREAM_URL, json=body, headers=headers) as reply:
+                reply.raise_for_status()
+                async for line in reply.aiter_lines():
+                    if not line.startswith("data: ") or line == "data: [DONE]":
+                        continue
+                    chunk = json.loads(line[len("data: "):])
+                    # Groq reports usage on the final chunk
+                    usage = (chunk.get("x_groq") or {}).get("usage") or chunk.get("usage") or usage
+                    for choice in chunk.get("choices", []):
+                        content.append((choice.get("delta") or {}).get("content") or "")
+        return {"content": "".join(content), "usage": usage}
+
+    async def resolve(prompt, body):
+        if recordings_dir:
+            path = os.path.join(recordings_dir, f"{prompt_key(prompt)}.json")
+            if os.path.isfile(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    app.state.stats["replayed"] += 1
+                    return json.load(f)
+            if record:
+                recording = await record_upstream(body)
+                os.makedirs(recordings_dir, exist_ok=True)
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump(recording, f, indent=4)
+                app.state.stats["recorded"] += 1
+                return recording
+        app.state.stats["default"] += 1
+        return {"content": default_content, "usage": None}
+
+    @app.post("/openai/v1/chat/completions")
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.stats["requests"] += 1
+        if latency:
+            await asyncio.sleep(latency)
+        prompt = "".join(str(m.get("content", "")) for m in body.get("messages", []))
+        answer = await resolve(prompt, body)
+        content = answer["content"]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        model = body.get("model", "stub")
+        usage = answer.get("usage") or {
+            # Rough 4 characters per token estimate, good enough for offline runs
+            "prompt_tokens": len(prompt) // 4,
+            "completion_tokens": len(content) // 4,
+            "total_tokens": (len(prompt) + len(content)) // 4,
+        }
+        if body.get("stream"):
+            return StreamingResponse(stream_chunks(completion_id, model, content, usage), media_type="text/event-stream")
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": usage,
+        }
+
+    @app.get("/stats")
+    async def stats():
+        return app.state.stats
+
+    async def stream_chunks(completion_id, model, content, usage):
+        def chunk(delta, finish_reason=None, extra=None):
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            payload.update(extra or {})
+            return f"data: {json.dumps(payload)}\n\n"
+
+        yield chunk({"role": "assistant", "content": ""})
+        # Roughly token sized pieces
+        for i in range(0, len(content), 4):
+            yield chunk({"content": content[i:i + 4]})
+        yield chunk({}, "stop", {"x_groq": {"id": completion_id, "usage": usage}})
+        yield "data: [DONE]\n\n"
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenAI-compatible LLM stub for offline codegen tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before answering")
+    parser.add_argument("--response-file", help="JSON file with requirements/imports/code to return")
+    parser.add_argument("--recordings", help="Directory of recorded responses to replay")
+    parser.add_argument("--record", action="store_true", help="Record missing prompts from Groq (needs GROQ_API_KEY)")
+    args = parser.parse_args()
+
+    response = None
+    if args.response_file:
+        with open(args.response_file, "r") as f:
+            response = json.load(f)
+
+    app = create_stub_app(response, args.latency, args.recordings, args.record, os.getenv("GROQ_API_KEY"))
+    uvicorn.run(app, host=args.host, port=args.port)
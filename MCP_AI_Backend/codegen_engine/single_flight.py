@@ -0,0 +1,49 @@
+import asyncio
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one execution.
+
+    The first caller for a key starts the work in its own task; callers that
+    arrive while it is running await the same task and receive the same result
+    (or exception). The task is only cancelled once every waiter has gone away.
+    """
+
+    def __init__(self):
+        self._inflight = {}  # key -> [task, waiter count]
+
+    def in_flight(self, key) -> bool:
+        return key in self._inflight
+
+    async def do(self, key, func, *args, **kwargs):
+        """Run func(*args, **kwargs) once per key, returning (result, shared)."""
+        entry = self._inflight.get(key)
+        shared = entry is not None
+        if not shared:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            entry = [task, 0]
+            self._inflight[key] = entry
+            task.add_done_callback(lambda _, key=key, entry=entry: self._forget(key, entry))
+
+        task = entry[0]
+        entry[1] += 1
+        try:
+            result = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if task.done():
+                raise
+            entry[1] -= 1
+            if entry[1] == 0:
+                task.cancel()
+            raise
+        entry[1] -= 1
+        return result, shared
+
+    def _forget(self, key, entry):
+        if self._inflight.get(key) is entry:
+            del self._inflight[key]
+        task = entry[0]
+        # Mark the exception as retrieved even if every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
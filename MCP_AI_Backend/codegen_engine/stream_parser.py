@@ -0,0 +1,162 @@
+class MalformedStreamError(ValueError):
+    """Raised as soon as a streamed completion can no longer become a valid ResponseFormat object."""
+
+
+# Expected top level fields and the character their value has to start with
+EXPECTED_FIELDS = {
+    "requirements": "[",
+    "imports": "[",
+    "code": '"',
+}
+
+
+class ResponseStreamParser:
+    """
+    Incrementally checks a streamed JSON completion against the ResponseFormat schema.
+
+    Chunks are fed as they arrive; the parser only tracks the top level object
+    (keys, value types, nesting) so malformed output is rejected after a few
+    characters instead of after the whole completion has been generated.
+    """
+
+    def __init__(self):
+        self.buffer = []
+        self.state = "start"        # start -> key -> colon -> value -> comma -> done
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.current_key = None
+        self.key_chars = []
+        self.completed_fields = []  # fields whose value has been fully received
+        self.fence = ""             # tolerate a leading ```json fence
+
+    def feed(self, text: str) -> list[str]:
+        """Consume a chunk, returning the names of fields completed by it."""
+        completed = []
+        for char in text:
+            self.buffer.append(char)
+            field = self._step(char)
+            if field:
+                completed.append(field)
+        return completed
+
+    def text(self) -> str:
+        raw = "".join(self.buffer).strip()
+        start, end = raw.find("{"), raw.rfind("}")
+        return raw[start:end + 1] if start != -1 and end != -1 else raw
+
+    def _fail(self, reason):
+        raise MalformedStreamError(f"Malformed LLM response ({reason}) after {len(self.buffer)} characters")
+
+    def _step(self, char):
+        if self.state == "start":
+            if char.isspace():
+                return None
+            if char == "{":
+                self.state = "key"
+                self.depth = 1
+                return None
+            # Allow the model to wrap the object in a markdown code fence
+            self.fence += char
+            if "```json".startswith(self.fence):
+                return None
+            self._fail("expected a JSON object")
+
+        if self.state == "done":
+            if not char.isspace() and char != "`":
+                self._fail("unexpected text after the JSON object")
+            return None
+
+        # Inside a key string
+        if self.state == "key_string":
+            if char == '"':
+                self.current_key = "".join(self.key_chars)
+                if self.current_key not in EXPECTED_FIELDS:
+                    self._fail(f"unexpected field '{self.current_key}'")
+                self.state = "colon"
+                return None
+            self.key_chars.append(char)
+            prefix = "".join(self.key_chars)
+            if not any(field.startswith(prefix) for field in EXPECTED_FIELDS):
+                self._fail(f"unexpected field '{prefix}...'")
+            return None
+
+        if self.state == "key":
+            if char.isspace():
+                return None
+            if char == '"':
+                self.state = "key_string"
+                self.key_chars = []
+                return None
+            if char == "}" and not self.completed_fields:
+                self._fail("empty object")
+            self._fail("expected a field name")
+
+        if self.state == "colon":
+            if char.isspace():
+                return None
+            if char != ":":
+                self._fail("expected ':'")
+            self.state = "value_start"
+            return None
+
+        if self.state == "value_start":
+            if char.isspace():
+                return None
+            if char != EXPECTED_FIELDS[self.current_key]:
+                self._fail(f"field '{self.current_key}' has the wrong type")
+            self.state = "value"
+            if char == '"':
+                self.in_string = True
+            else:
+                self.depth += 1
+            return None
+
+        if self.state == "value":
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                    if self.depth == 1:
+                        return self._finish_value()
+                return None
+            if char == '"':
+                self.in_string = True
+            elif char in "[{":
+                self.depth += 1
+            elif char in "]}":
+                self.depth -= 1
+                if self.depth == 1:
+                    return self._finish_value()
+            return None
+
+        if self.state == "comma":
+            if char.isspace():
+                return None
+            if char == ",":
+                self.state = "key"
+                return None
+            if char == "}":
+                missing = [f for f in EXPECTED_FIELDS if f not in self.completed_fields]
+                if missing:
+                    self._fail(f"missing fields {missing}")
+                self.depth = 0
+                self.state = "done"
+                return None
+            self._fail("expected ',' or '}'")
+        return None
+
+    def _finish_value(self):
+        field = self.current_key
+        if field in self.completed_fields:
+            self._fail(f"duplicate field '{field}'")
+        self.completed_fields.append(field)
+        self.state = "comma"
+        return field
+
+    @property
+    def complete(self) -> bool:
+        return self.state == "done"
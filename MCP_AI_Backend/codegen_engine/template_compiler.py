@@ -0,0 +1,235 @@
+"""
+Rule based compiler for the strategy texts users write most often.
+
+A strategy text is split into clauses ("buy when ...", "sell when ..."); every
+clause has to match one of the patterns below, otherwise the text is handed to
+the LLM. Recognised strategies are emitted as vectorised numpy code that sets
+`decision_to_buy_or_sell`, exactly like an LLM generation would. A template
+only ever replaces the LLM for a whole graph: one strategy node plus nodes that
+shape no code (start, empty nodes, agents described by name only, and the
+model, notification and telegram nodes the generated code never reads).
+"""
+import re
+from utils.graph_compiler import compile_graph_ir
+from utils.json_to_map import UI_FIELDS
+from codegen_engine.code_correction import validate_generated_code
+
+BUY = r"(?P<action>buy|purchase|long|acquire|enter|sell|send|exit|short|dump)"
+WHEN = r"(?:when|if|once|whenever|as soon as)"
+NUM = r"\$?(?P<value>\d+(?:\.\d+)?)"
+CMP = (
+    r"(?P<op>is at or below|is at or above|is below|is under|is above|is over|is less than|is greater than|is more than|"
+    r"drops below|drops to|falls below|falls to|goes below|goes above|rises above|rises to|crosses above|crosses below|"
+    r"reaches|hits|touches|is|at|below|under|above|over|<=|>=|<|>|=)"
+)
+SUBJECT = r"(?:the\s+)?(?:(?:current\s+|close\s+|closing\s+)?price(?:\s+of\s+(?:1\s+|one\s+)?[a-z]+)?|(?:1\s+)?(?:sui|strk|token)|it)"
+PERIOD = r"(?:\s*\(?\s*(?P<{name}>\d+)\s*\)?)?"
+
+PRICE_CLAUSE = re.compile(rf"^{BUY}\s+(?:{WHEN}\s+{SUBJECT}\s+{CMP}\s+{NUM}|at\s+{NUM.replace('value', 'at_value')})$")
+RSI_CLAUSE = re.compile(
+    rf"^{BUY}\s+{WHEN}\s+(?:the\s+)?(?:(?P<pre_period>\d+)[- ]?(?:period\s+)?)?rsi{PERIOD.format(name='period')}\s+"
+    rf"(?:{CMP}\s+{NUM}|is\s+(?P<zone>oversold|overbought))$"
+)
+MA_CLAUSE = re.compile(
+    rf"^{BUY}\s+{WHEN}\s+(?:the\s+)?(?:(?P<fast_pre>\d+)[- ]?(?:period\s+)?)?(?P<kind>sma|ema){PERIOD.format(name='fast')}\s+"
+    r"(?:crosses\s+|is\s+|goes\s+|moves\s+)?(?P<direction>above|over|below|under)\s+"
+    rf"(?:the\s+)?(?:(?P<slow_pre>\d+)[- ]?(?:period\s+)?)?(?:sma|ema){PERIOD.format(name='slow')}$"
+)
+MA_SHORTHAND = re.compile(r"^(?P<kind>sma|ema)\s*(?:crossover\s*)?\(?(?P<fast>\d+)\s*[/,]\s*(?P<slow>\d+)\)?(?:\s*crossover)?(?:\s+strategy)?$")
+
+# Node types and data fields the LLM would not turn into code either
+STRUCTURAL_TYPES = {"startNode", "agentNode"}
+# Nodes handled outside the decision code (LLM choice, delivery of the signal), whatever their data
+UNREAD_TYPES = {"modelNode", "notificationNode", "telegramNode"}
+DESCRIPTIVE_FIELDS = UI_FIELDS | {"name", "description", "parentId"}
+
+BUY_ACTIONS = {"buy", "purchase", "long", "acquire", "enter"}
+BELOW_OPS = {"is at or below", "is below", "is under", "is less than", "drops below", "drops to", "falls below", "falls to", "goes below", "crosses below", "below", "under", "<=", "<"}
+ABOVE_OPS = {"is at or above", "is above", "is over", "is greater than", "is more than", "goes above", "rises above", "rises to", "crosses above", "above", "over", ">=", ">"}
+
+
+def _normalise(text):
+    text = text.lower().replace(",", " , ")
+    text = re.sub(r"\s+", " ", text).strip(" .!")
+    return text
+
+
+def _split_clauses(text):
+    parts = re.split(r"\s*(?:,|;|\band then\b|\bthen\b|\band\b)\s*", text)
+    return [p.strip() for p in parts if p.strip()]
+
+
+def _side(action):
+    return "buy" if action in BUY_ACTIONS else "sell"
+
+
+def _comparison(op, side):
+    # "buy when price is 3.2" means at or below, "sell when it is 3.3" means at or above
+    if op in BELOW_OPS:
+        return "<" if op in {"<", "is less than", "below", "under", "is below", "is under", "drops below", "falls below", "goes below", "crosses below"} else "<="
+    if op in ABOVE_OPS:
+        return ">" if op in {">", "is greater than", "is more than", "above", "over", "is above", "is over", "rises above", "goes above", "crosses above"} else ">="
+    return "<=" if side == "buy" else ">="
+
+
+def _parse_clause(clause):
+    match = PRICE_CLAUSE.match(clause)
+    if match:
+        side = _side(match["action"])
+        value = match["value"] or match["at_value"]
+        return "price", side, {"op": _comparison(match["op"] or "at", side), "value": float(value)}
+
+    match = RSI_CLAUSE.match(clause)
+    if match:
+        side = _side(match["action"])
+        period = int(match["period"] or match["pre_period"] or 14)
+        if match["zone"]:
+            op, value = ("<", 30.0) if match["zone"] == "oversold" else (">", 70.0)
+        else:
+            op, value = _comparison(match["op"], side), float(match["value"])
+        return "rsi", side, {"op": op, "value": value, "period": period}
+
+    match = MA_CLAUSE.match(clause)
+    if match:
+        fast = match["fast"] or match["fast_pre"]
+        slow = match["slow"] or match["slow_pre"]
+        if not fast or not slow:
+            return None
+        above = match["direction"] in {"above", "over"}
+        return "ma", _side(match["action"]), {"kind": match["kind"], "fast": int(fast), "slow": int(slow), "above": above}
+
+    return None
+
+
+def _closes_line():
+    return "closes = np.array([c['close'] for c in data['candlesticks']], dtype=float)"
+
+
+def _ma_expression(kind, period):
+    if kind == "sma":
+        return f"closes[-{period}:].mean()"
+    # EMA over the whole window with normalised exponential weights (pandas ewm(adjust=True))
+    return f"np.average(closes, weights=(1 - 2 / ({period} + 1)) ** np.arange(len(closes))[::-1])"
+
+
+def _decision_block(buy_condition, sell_condition):
+    return [
+        f"if {buy_condition}:",
+        "    decision_to_buy_or_sell = 'buy'",
+        f"elif {sell_condition}:",
+        "    decision_to_buy_or_sell = 'sell'",
+        "else:",
+        "    decision_to_buy_or_sell = 'hold'",
+    ]
+
+
+def _emit_price(rules):
+    lines = ["price = data['candlesticks'][-1]['close']"]
+    lines += _decision_block(
+        f"price {rules['buy']['op']} {rules['buy']['value']}",
+        f"price {rules['sell']['op']} {rules['sell']['value']}",
+    )
+    return lines
+
+
+def _emit_rsi(rules):
+    period = rules["buy"]["period"]
+    lines = [
+        _closes_line(),
+        f"deltas = np.diff(closes[-{period + 1}:])",
+        "gain = np.clip(deltas, 0, None).mean()",
+        "loss = -np.clip(deltas, None, 0).mean()",
+        "rsi = 100.0 if loss == 0 else 100 - 100 / (1 + gain / loss)",
+    ]
+    lines += _decision_block(
+        f"rsi {rules['buy']['op']} {rules['buy']['value']}",
+        f"rsi {rules['sell']['op']} {rules['sell']['value']}",
+    )
+    return lines
+
+
+def _emit_ma(rules):
+    rule = rules["buy"]
+    fast_name, slow_name = f"{rule['kind']}_fast", f"{rule['kind']}_slow"
+    lines = [
+        _closes_line(),
+        f"{fast_name} = {_ma_expression(rule['kind'], rule['fast'])}",
+        f"{slow_name} = {_ma_expression(rule['kind'], rule['slow'])}",
+    ]
+    buy_op = ">" if rule["above"] else "<"
+    sell_op = ">" if rules["sell"]["above"] else "<"
+    lines += _decision_block(f"{fast_name} {buy_op} {slow_name}", f"{fast_name} {sell_op} {slow_name}")
+    return lines
+
+
+def compile_strategy_text(text):
+    """Compile a strategy text into (template name, requirements, imports, code) or None."""
+    if not text or not isinstance(text, str):
+        return None
+    normalised = _normalise(text)
+
+    shorthand = MA_SHORTHAND.match(normalised)
+    if shorthand:
+        fast, slow = sorted((int(shorthand["fast"]), int(shorthand["slow"])))
+        rule = {"kind": shorthand["kind"], "fast": fast, "slow": slow, "above": True}
+        parsed = [("ma", "buy", rule), ("ma", "sell", dict(rule, above=False))]
+    else:
+        parsed = [_parse_clause(clause) for clause in _split_clauses(normalised)]
+        if not parsed or None in parsed:
+            return None
+
+    families = {family for family, _, _ in parsed}
+    rules = {side: rule for _, side, rule in parsed}
+    if len(families) != 1 or len(parsed) != 2 or set(rules) != {"buy", "sell"}:
+        return None
+    family = families.pop()
+
+    if family == "price":
+        lines = _emit_price(rules)
+    elif family == "rsi":
+        if rules["buy"]["period"] != rules["sell"]["period"]:
+            return None
+        lines = _emit_rsi(rules)
+    else:
+        buy, sell = rules["buy"], rules["sell"]
+        same_pair = (buy["kind"], buy["fast"], buy["slow"]) == (sell["kind"], sell["fast"], sell["slow"])
+        if not same_pair or buy["above"] == sell["above"] or buy["fast"] > buy["slow"]:
+            return None
+        lines = _emit_ma(rules)
+
+    code = "\n".join(lines)
+    imports = ["import numpy as np"] if "np." in code else []
+    requirements = ["numpy"] if imports else []
+
+    # Templates go through the same static checks as LLM output
+    validation = validate_generated_code(requirements, imports, code)
+    if validation["status"] != "success":
+        return None
+    return family, validation["requirements"], validation["imports"], validation["code"]
+
+
+def _covered(ir):
+    # Any other node (memory, risk ...) or data field reaches the LLM prompt, so the template would drop it
+    for node in ir.nodes.values():
+        # UI fields never reach the prompt (map_json drops them), a node with nothing else is empty
+        filled = {key for key, value in node.data.items() if value not in (None, "", [], {})} - UI_FIELDS
+        if node.type in UNREAD_TYPES or not filled:
+            continue
+        if node.type == "strategyNode":
+            allowed = DESCRIPTIVE_FIELDS | {"strategyText"}
+        elif node.type in STRUCTURAL_TYPES:
+            allowed = DESCRIPTIVE_FIELDS
+        else:
+            return False
+        if filled - allowed:
+            return False
+    return True
+
+
+def compile_graph(graph):
+    """Compile a graph made of one recognisable strategy node and structural nodes, None means use the LLM."""
+    ir = compile_graph_ir(graph)
+    strategy_nodes = ir.nodes_of_type("strategyNode")
+    if len(strategy_nodes) != 1 or not _covered(ir):
+        return None
+    return compile_strategy_text(strategy_nodes[0].data.get("strategyText"))
@@ -0,0 +1,59 @@
+import time
+from collections import deque
+
+# Aggregated LLM usage since startup, plus the most recent calls for inspection
+_totals = {
+    "calls": 0,
+    "aborted": 0,
+    "prompt_chars": 0,
+    "prompt_tokens": 0,
+    "completion_tokens": 0,
+    "reasoning_tokens": 0,
+    "llm_seconds": 0.0,
+}
+_recent = deque(maxlen=200)
+
+
+def record_usage(stage, prompt_chars, usage=None, duration=0.0, aborted=False):
+    """Record token counts for one LLM call; counts are estimated from characters when the API sent none."""
+    prompt_tokens = getattr(usage, "prompt_tokens", None)
+    completion_tokens = getattr(usage, "completion_tokens", None)
+    details = getattr(usage, "completion_tokens_details", None)
+    reasoning_tokens = getattr(details, "reasoning_tokens", None) or 0
+    estimated = prompt_tokens is None
+    if estimated:
+        prompt_tokens = prompt_chars // 4
+        completion_tokens = 0
+
+    _totals["calls"] += 1
+    _totals["aborted"] += int(aborted)
+    _totals["prompt_chars"] += prompt_chars
+    _totals["prompt_tokens"] += prompt_tokens
+    _totals["completion_tokens"] += completion_tokens or 0
+    _totals["reasoning_tokens"] += reasoning_tokens
+    _totals["llm_seconds"] += duration
+
+    entry = {
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "stage": stage,
+        "prompt_chars": prompt_chars,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens or 0,
+        "reasoning_tokens": reasoning_tokens,
+        "duration": round(duration, 3),
+        "estimated": estimated,
+        "aborted": aborted,
+    }
+    _recent.append(entry)
+    print(f"[TOKENS] {stage}: prompt={prompt_tokens} completion={completion_tokens} ({duration:.2f}s{', aborted' if aborted else ''})")
+    return entry
+
+
+def usage_summary():
+    calls = _totals["calls"] or 1
+    return {
+        "totals": dict(_totals),
+        "average_prompt_tokens": _totals["prompt_tokens"] / calls,
+        "average_completion_tokens": _totals["completion_tokens"] / calls,
+        "recent": list(_recent),
+    }
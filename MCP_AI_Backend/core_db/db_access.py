@@ -0,0 +1,356 @@
+"""
+Shared access to ./core_db/users.db.
+
+Handlers never open SQLite themselves: queries run on a small pool of
+long-lived connections inside a dedicated thread executor, so the event loop
+never blocks on disk I/O. The database runs in WAL mode (readers do not block
+the writer), statements are parameterised so sqlite3 reuses the compiled
+statement from each connection's cache, and writes are serialised in-process
+instead of spinning on SQLITE_BUSY. The schema is migrated once, through
+PRAGMA user_version, instead of on every request.
+"""
+import asyncio
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append('..')
+from uid_management.uid_hasher import hash_data, hash_password_interim, rekey_digest
+from utils.asset_files import is_shard_name
+
+DB_PATH = "./core_db/users.db"
+USER_ASSETS_DIR = "./user_assets"
+POOL_SIZE = 4
+BUSY_TIMEOUT_MS = 5000
+STATEMENT_CACHE = 128
+
+
+def _hash_plaintext_passwords(conn):
+    # Salted hash for verification, plain sha256 owner digest for the /fetch_data lookup by password.
+    # PBKDF2 for every user would hold the write lock for minutes on a large table, the interim hash
+    # costs microseconds and authenticate() upgrades it on the first login.
+    rows = conn.execute("SELECT uid, user_password FROM users").fetchall()
+    conn.executemany(
+        "INSERT INTO users_v2 (uid, password_hash, owner_digest) VALUES (?, ?, ?)",
+        [(uid, hash_password_interim(password), hash_data(password)) for uid, password in rows],
+    )
+
+
+def _load_sidecar(folder, name):
+    try:
+        with open(os.path.join(folder, name), "r") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def _import_asset_files(conn):
+    # code_sync.json / wallet_sync.json / data_config.json of every existing uid folder
+    if not os.path.isdir(USER_ASSETS_DIR):
+        return
+    rows = []
+    for uid in sorted(os.listdir(USER_ASSETS_DIR)):
+        folder = os.path.join(USER_ASSETS_DIR, uid)
+        if not os.path.isdir(folder):
+            continue
+        code_sync = _load_sidecar(folder, "code_sync.json") or {}
+        wallet = (_load_sidecar(folder, "wallet_sync.json") or {}).get("wallet")
+        graph = _load_sidecar(folder, "data_config.json") or {}
+        signature = code_sync.get("graph_signature")
+        rows.append((
+            uid,
+            int(bool(code_sync.get("deploy_status", False))),
+            int(bool(code_sync.get("clone_status", False))),
+            code_sync.get("cloned_from_uid"),
+            json.dumps(graph, separators=(",", ":")),
+            code_sync.get("graph_fingerprint"),
+            json.dumps(signature, separators=(",", ":")) if signature is not None else None,
+            json.dumps(wallet, separators=(",", ":")) if wallet is not None else None,
+        ))
+    conn.executemany(
+        "INSERT OR IGNORE INTO user_state (uid, deploy_status, clone_status, cloned_from_uid, graph, graph_fingerprint, graph_signature, wallet) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+    print(f"[DB] Imported the state of {len(rows)} uid folder(s) from {USER_ASSETS_DIR}")
+
+
+def _sidecar_row(uid, folder):
+    # user_state values of a uid folder, None for a folder without sidecar files
+    code_sync = _load_sidecar(folder, "code_sync.json")
+    wallet_sync = _load_sidecar(folder, "wallet_sync.json")
+    graph = _load_sidecar(folder, "data_config.json")
+    if code_sync is None and wallet_sync is None and graph is None:
+        return None
+    code_sync, graph = code_sync or {}, graph or {}
+    wallet = (wallet_sync or {}).get("wallet")
+    signature = code_sync.get("graph_signature")
+    return (
+        uid,
+        int(bool(code_sync.get("deploy_status", False))),
+        int(bool(code_sync.get("clone_status", False))),
+        code_sync.get("cloned_from_uid"),
+        json.dumps(graph, separators=(",", ":")),
+        code_sync.get("graph_fingerprint"),
+        json.dumps(signature, separators=(",", ":")) if signature is not None else None,
+        json.dumps(wallet, separators=(",", ":")) if wallet is not None else None,
+    )
+
+
+def _import_sharded_asset_files(conn):
+    # Migration 3 only knew the flat layout: on a sharded tree it imported .blobs and the shard directories as uids
+    if not os.path.isdir(USER_ASSETS_DIR):
+        return
+    bogus = []
+    for name in sorted(os.listdir(USER_ASSETS_DIR)):
+        folder = os.path.join(USER_ASSETS_DIR, name)
+        if (name.startswith(".") or is_shard_name(name)) and os.path.isdir(folder) and _sidecar_row(name, folder) is None:
+            bogus.append(name)
+    conn.execute(
+        "DELETE FROM user_state WHERE uid IN (SELECT value FROM json_each(?)) AND graph = '{}' AND wallet IS NULL AND deploy_status = 0",
+        (json.dumps(bogus),),
+    )
+
+    # uid folders already in ./user_assets/<h[:2]>/<h[2:4]>/<uid>, rows imported from the flat layout are kept
+    rows = []
+    for first in sorted(os.listdir(USER_ASSETS_DIR)):
+        if not is_shard_name(first) or not os.path.isdir(os.path.join(USER_ASSETS_DIR, first)):
+            continue
+        for second in sorted(os.listdir(os.path.join(USER_ASSETS_DIR, first))):
+            shard = os.path.join(USER_ASSETS_DIR, first, second)
+            if not is_shard_name(second) or not os.path.isdir(shard):
+                continue
+            for uid in sorted(os.listdir(shard)):
+                folder = os.path.join(shard, uid)
+                row = _sidecar_row(uid, folder) if os.path.isdir(folder) else None
+                if row is not None:
+                    rows.append(row)
+    conn.executemany(
+        "INSERT OR IGNORE INTO user_state (uid, deploy_status, clone_status, cloned_from_uid, graph, graph_fingerprint, graph_signature, wallet) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+    print(f"[DB] Removed {len(bogus)} non-uid row(s), imported the state of {len(rows)} sharded uid folder(s) from {USER_ASSETS_DIR}")
+
+
+def _rekey_owner_digests(conn):
+    # Plain sha256 owner digests of public wallet addresses are reversible by anyone holding the database
+    rows = conn.execute("SELECT uid, owner_digest FROM users").fetchall()
+    conn.executemany("UPDATE users SET owner_digest = ? WHERE uid = ?", [(rekey_digest(digest), uid) for uid, digest in rows])
+
+
+# Each entry upgrades the schema by one version, never edit an applied entry.
+# Entries are SQL strings or callables taking the connection.
+MIGRATIONS = [
+    # 1: tables and indexes the handlers used to create on every request
+    [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            uid TEXT PRIMARY KEY UNIQUE NOT NULL,
+            user_password TEXT NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_user_password ON users (user_password)",
+        # The primary key already indexes uid
+        "DROP INDEX IF EXISTS idx_uid",
+        """
+        CREATE TABLE IF NOT EXISTS pid_data (
+            uid TEXT PRIMARY KEY NOT NULL UNIQUE,
+            user_password TEXT NOT NULL,
+            pid INTEGER NOT NULL UNIQUE
+        )
+        """,
+    ],
+    # 2: no plaintext passwords at rest
+    [
+        """
+        CREATE TABLE users_v2 (
+            uid TEXT PRIMARY KEY NOT NULL,
+            password_hash TEXT NOT NULL,
+            owner_digest TEXT NOT NULL
+        )
+        """,
+        _hash_plaintext_passwords,
+        "DROP TABLE users",
+        "ALTER TABLE users_v2 RENAME TO users",
+        "CREATE INDEX idx_owner_digest ON users (owner_digest)",
+        """
+        CREATE TABLE pid_data_v2 (
+            uid TEXT PRIMARY KEY NOT NULL,
+            pid INTEGER NOT NULL UNIQUE
+        )
+        """,
+        "INSERT INTO pid_data_v2 (uid, pid) SELECT uid, pid FROM pid_data",
+        "DROP TABLE pid_data",
+        "ALTER TABLE pid_data_v2 RENAME TO pid_data",
+    ],
+    # 3: per-uid state that used to live in code_sync.json, wallet_sync.json and data_config.json
+    [
+        """
+        CREATE TABLE user_state (
+            uid TEXT PRIMARY KEY NOT NULL,
+            deploy_status INTEGER NOT NULL DEFAULT 0,
+            clone_status INTEGER NOT NULL DEFAULT 0,
+            cloned_from_uid TEXT,
+            graph TEXT NOT NULL DEFAULT '{}',
+            graph_fingerprint TEXT,
+            graph_signature TEXT,
+            wallet TEXT,
+            updated_at REAL NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS REAL))
+        )
+        """,
+        "CREATE INDEX idx_user_state_deployed ON user_state (uid) WHERE deploy_status = 1",
+        "CREATE INDEX idx_user_state_cloned_from ON user_state (cloned_from_uid)",
+        _import_asset_files,
+    ],
+    # 4: owner listings are paged by uid, so the owner index covers the keyset too
+    [
+        "DROP INDEX idx_owner_digest",
+        "CREATE INDEX idx_owner_digest_uid ON users (owner_digest, uid)",
+    ],
+    # 5: deleted uids whose asset folder the background reaper has not removed yet
+    [
+        """
+        CREATE TABLE tombstones (
+            uid TEXT PRIMARY KEY NOT NULL,
+            deleted_at REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX idx_tombstones_deleted_at ON tombstones (deleted_at)",
+    ],
+    # 6: owner digests keyed with the server side secret (uid_hasher.owner_digest)
+    [
+        _rekey_owner_digests,
+    ],
+    # 7: uid folders in the sharded layout, and no rows for .blobs or shard directories
+    [
+        _import_sharded_asset_files,
+    ],
+]
+
+_executor = None
+_pool = queue.Queue()
+_created = 0
+_pool_lock = threading.Lock()
+_write_lock = threading.Lock()
+_schema_ready = False
+
+
+def _connect():
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, cached_statements=STATEMENT_CACHE, isolation_level=None)
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+
+def migrate(conn):
+    """Apply pending MIGRATIONS, returns the resulting schema version."""
+    global _schema_ready
+    with _write_lock:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for target, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for statement in statements:
+                    if callable(statement):
+                        statement(conn)
+                    else:
+                        conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {target}")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            print(f"[DB] Migrated {DB_PATH} to schema version {target}")
+            version = target
+        _schema_ready = True
+        return version
+
+
+def _acquire():
+    global _created
+    try:
+        return _pool.get_nowait()
+    except queue.Empty:
+        pass
+    with _pool_lock:
+        if _created < POOL_SIZE:
+            _created += 1
+            conn = _connect()
+            if not _schema_ready:
+                migrate(conn)
+            return conn
+    return _pool.get()
+
+
+def _release(conn):
+    _pool.put(conn)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="sqlite")
+    return _executor
+
+
+def _run(func, *args, write=False):
+    conn = _acquire()
+    try:
+        if not write:
+            return func(conn, *args)
+        with _write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(conn, *args)
+                conn.execute("COMMIT")
+                return result
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+    finally:
+        _release(conn)
+
+
+async def run_db(func, *args, write=False):
+    """Run func(conn, *args) on a pooled connection; write=True wraps it in one transaction."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), lambda: _run(func, *args, write=write))
+
+
+async def fetch_one(sql, params=()):
+    return await run_db(lambda conn: conn.execute(sql, params).fetchone())
+
+
+async def fetch_all(sql, params=()):
+    return await run_db(lambda conn: conn.execute(sql, params).fetchall())
+
+
+async def execute(sql, params=()):
+    """Single write statement in its own transaction, returns the affected row count."""
+    return await run_db(lambda conn: conn.execute(sql, params).rowcount, write=True)
+
+
+async def init_db():
+    """Migrate the schema once at startup and warm up one pooled connection."""
+    return await run_db(lambda conn: conn.execute("PRAGMA user_version").fetchone()[0])
+
+
+def close_db():
+    global _executor, _created, _schema_ready
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+    while True:
+        try:
+            _pool.get_nowait().close()
+        except queue.Empty:
+            break
+    _created = 0
+    _schema_ready = False
@@ -0,0 +1,212 @@
+"""
+Per-uid state: deploy status, clone lineage, wallet and graph.
+
+One row of the user_state table replaces code_sync.json, wallet_sync.json and
+data_config.json, so questions across users (every deployed bot, every graph
+of an owner) are a single indexed query instead of a file open per uid folder.
+JSON columns (graph, graph_signature, wallet) are decoded on the way out.
+"""
+import json
+import sys
+import time
+
+sys.path.append('..')
+from core_db.db_access import fetch_one, fetch_all, execute, run_db
+from uid_management.uid_hasher import owner_digest
+
+JSON_COLUMNS = ("graph", "graph_signature", "wallet")
+STATE_COLUMNS = ("deploy_status", "clone_status", "cloned_from_uid", "graph_fingerprint", "graph_signature")
+UPDATABLE_COLUMNS = STATE_COLUMNS + ("graph", "wallet")
+
+
+def _encode(column, value):
+    if column in JSON_COLUMNS:
+        return None if value is None else json.dumps(value, separators=(",", ":"))
+    if column in ("deploy_status", "clone_status"):
+        return int(bool(value))
+    return value
+
+
+def _decode(columns, row):
+    state = {}
+    for column, value in zip(columns, row):
+        if column in JSON_COLUMNS and value is not None:
+            value = json.loads(value)
+        elif column in ("deploy_status", "clone_status"):
+            value = bool(value)
+        state[column] = value
+    return state
+
+
+def encode_state(fields):
+    """Column -> stored value for some state columns, rejects unknown columns."""
+    unknown = set(fields) - set(UPDATABLE_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown state column(s): {', '.join(sorted(unknown))}")
+    return {column: _encode(column, value) for column, value in fields.items()}
+
+
+async def create_state(uid):
+    """Empty state for a new uid, False when it already exists."""
+    return await execute("INSERT OR IGNORE INTO user_state (uid, updated_at) VALUES (?, ?)", (uid, time.time())) > 0
+
+
+async def get_state(uid):
+    """Deploy/clone flags and graph metadata, None for an unknown uid. Leaves the graph itself in the database."""
+    row = await fetch_one(f"SELECT {', '.join(STATE_COLUMNS)} FROM user_state WHERE uid = ?", (uid,))
+    return None if row is None else _decode(STATE_COLUMNS, row)
+
+
+async def get_graph(uid):
+    row = await fetch_one("SELECT graph FROM user_state WHERE uid = ?", (uid,))
+    return None if row is None else json.loads(row[0])
+
+
+async def get_wallet(uid):
+    row = await fetch_one("SELECT wallet FROM user_state WHERE uid = ?", (uid,))
+    return None if row is None or row[0] is None else json.loads(row[0])
+
+
+async def set_wallet_once(uid, wallet):
+    """Store a wallet unless the uid already has one; concurrent deploys never overwrite each other's wallet."""
+    return await execute(
+        "UPDATE user_state SET wallet = ?, updated_at = ? WHERE uid = ? AND wallet IS NULL",
+        (_encode("wallet", wallet), time.time(), uid),
+    ) > 0
+
+
+async def update_state(uid, **fields):
+    """Set some columns of a uid, returns False when the uid has no state."""
+    encoded = encode_state(fields)
+    assignments = ", ".join(f"{column} = ?" for column in encoded)
+    params = list(encoded.values()) + [time.time(), uid]
+    return await execute(f"UPDATE user_state SET {assignments}, updated_at = ? WHERE uid = ?", params) > 0
+
+
+async def set_deploy_status(uid, deployed):
+    return await update_state(uid, deploy_status=deployed)
+
+
+async def mark_deployed(uid, pid):
+    """
+    Record the bot pid and set deploy_status in one transaction.
+
+    False when the uid has no state any more (deleted meanwhile, possibly by
+    another worker); tombstone_users refuses deployed uids, so once this
+    commits the uid cannot be deleted under the running bot.
+    """
+    def mark(conn):
+        if conn.execute("SELECT 1 FROM user_state WHERE uid = ?", (uid,)).fetchone() is None:
+            return False
+        conn.execute("INSERT OR REPLACE INTO pid_data (uid, pid) VALUES (?, ?)", (uid, pid))
+        conn.execute("UPDATE user_state SET deploy_status = 1, updated_at = ? WHERE uid = ?", (time.time(), uid))
+        return True
+
+    return await run_db(mark, write=True)
+
+
+async def sync_graph(uid, graph, fingerprint, signature, describe_old):
+    """
+    Store an edited graph with its fingerprint and signature unless the uid is deployed.
+
+    The deploy check and the write share one transaction, so a deploy
+    committed meanwhile (by any worker) is never overwritten. describe_old(graph)
+    -> (fingerprint, signature) is only called for rows imported without sync
+    metadata. Returns None for an unknown uid, else (deployed, old signature);
+    a deployed uid is left untouched.
+    """
+    def sync(conn):
+        row = conn.execute(
+            "SELECT deploy_status, graph_fingerprint, graph_signature FROM user_state WHERE uid = ?", (uid,),
+        ).fetchone()
+        if row is None:
+            return None
+        deployed, old_fingerprint, old_signature = row
+        if deployed:
+            return True, None
+        if not old_fingerprint or old_signature is None:
+            old_graph = conn.execute("SELECT graph FROM user_state WHERE uid = ?", (uid,)).fetchone()[0]
+            old_fingerprint, old_signature = describe_old(json.loads(old_graph))
+        else:
+            old_signature = json.loads(old_signature)
+        encoded = encode_state({"graph": graph, "graph_fingerprint": fingerprint, "graph_signature": signature})
+        conn.execute(
+            "UPDATE user_state SET graph = ?, graph_fingerprint = ?, graph_signature = ?, updated_at = ? WHERE uid = ?",
+            (*encoded.values(), time.time(), uid),
+        )
+        return False, old_signature
+
+    return await run_db(sync, write=True)
+
+
+async def list_deployed():
+    rows = await fetch_all("SELECT uid FROM user_state WHERE deploy_status = 1")
+    return [row[0] for row in rows]
+
+
+async def list_graphs_for_owner(password, after=None, limit=None, include_graph=True):
+    """
+    Graphs created with this password (wallet address), ordered by uid.
+
+    Keyset paginated: pass the last uid of a page as `after`. Without
+    include_graph only metadata is read, the name comes out of the stored JSON
+    in SQLite and the graph column is never decoded.
+    """
+    sql = (
+        "SELECT s.uid, json_extract(s.graph, '$.name'), s.deploy_status, s.updated_at, s.graph_fingerprint"
+        + (", s.graph" if include_graph else "")
+        + " FROM users u JOIN user_state s ON s.uid = u.uid WHERE u.owner_digest = ?"
+    )
+    params = [owner_digest(password)]
+    if after is not None:
+        sql += " AND u.uid > ?"
+        params.append(after)
+    sql += " ORDER BY u.uid"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+
+    def query(conn):
+        # Decoding large graphs happens here, on the database thread, not on the event loop
+        graphs = []
+        for row in conn.execute(sql, params):
+            entry = {
+                "uid": row[0],
+                "name": row[1],
+                "deploy_status": bool(row[2]),
+                "updated_at": row[3],
+                "fingerprint": row[4],
+            }
+            if include_graph:
+                entry["graph"] = json.loads(row[5])
+            graphs.append(entry)
+        return graphs
+
+    return await run_db(query)
+
+
+async def copy_state(uid_from, uid_to):
+    """Copy graph, metadata and wallet of uid_from onto uid_to as an undeployed clone."""
+    def copy(conn):
+        return conn.execute(
+            """
+            UPDATE user_state SET
+                deploy_status = 0,
+                clone_status = 1,
+                cloned_from_uid = ?,
+                graph = src.graph,
+                graph_fingerprint = src.graph_fingerprint,
+                graph_signature = src.graph_signature,
+                wallet = src.wallet,
+                updated_at = ?
+            FROM (SELECT graph, graph_fingerprint, graph_signature, wallet FROM user_state WHERE uid = ?) AS src
+            WHERE user_state.uid = ?
+            """,
+            (uid_from, time.time(), uid_from, uid_to),
+        ).rowcount
+
+    return await run_db(copy, write=True) > 0
+
+
+async def delete_state(uid):
+    return await execute("DELETE FROM user_state WHERE uid = ?", (uid,)) > 0
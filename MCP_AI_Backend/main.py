@@ -1,6 +1,6 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, Field, field_validator
 from enum import Enum
 from fastapi.responses import StreamingResponse
 import json
@@ -8,13 +8,13 @@ import uvicorn
 import asyncio
 import uvicorn
 from uvicorn import Config, Server
-from server_integrity.assign_loc import create_user
+from server_integrity.assign_loc import create_user, create_users, MAX_BATCH
 from server_integrity.update_loc import update_user
 from server_integrity.deploy_loc import graph_to_code
-from server_integrity.fetch_loc import fetch_user_data
+from server_integrity.fetch_loc import fetch_user_data, stream_user_data
 from server_integrity.clone_loc import clone_code
-from server_integrity.delete_loc import delete_asset
-from server_integrity.fetch_log import get_datalogs
+from server_integrity.delete_loc import delete_asset, delete_assets, run_reaper, MAX_BATCH as MAX_DELETE_BATCH
+from server_integrity.fetch_log import get_datalogs, stream_datalogs, get_decisions, get_decision_stats, DEFAULT_LIMIT as LOG_DEFAULT_LIMIT, MAX_LIMIT as LOG_MAX_LIMIT, MAX_TAIL as LOG_MAX_TAIL, MAX_DECISIONS
 from server_integrity.fetch_wallet_data import get_user_wallet_address
 from data_integrity.sui_fetch import start_binance_data_publisher
 from data_integrity.sui_catch import start_binance_data_subscriber
@@ -25,10 +25,34 @@ from user_runtime.wallet_check import ensure_wallet
 # from user_runtime.code_exec import exec_code
 from user_runtime.fin_deploy import deploy_code
 from user_runtime.stop_exec import kill_code
+from codegen_engine.llm_client import close_llm_client
+from codegen_engine.code_cache import discard_cached_code
+from codegen_engine.token_metrics import usage_summary
+from core_db.db_access import init_db, close_db
+from uid_management.auth_service import require_auth
+from utils.uid_locks import uid_lock
+from contextlib import asynccontextmanager
 import threading
 import time
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema migrations run once here instead of inside the request handlers
+    schema_version = await init_db()
+    print(f"[DB] users.db ready (schema version {schema_version})")
+    # Folders of deleted uids are removed in the background, at a bounded rate
+    reaper = asyncio.create_task(run_reaper())
+    yield
+    reaper.cancel()
+    try:
+        await reaper
+    except asyncio.CancelledError:
+        pass
+    # Release the pooled LLM and SQLite connections on shutdown
+    await close_llm_client()
+    close_db()
+
+app = FastAPI(lifespan=lifespan)
 
 # Allow all CORS origins
 app.add_middleware(
@@ -48,6 +72,16 @@ async def compile_code(request: CompileRequest):
     output = await create_user(request.password)
     return output
 
+class ProvisionRequest(BaseModel):
+    password: str
+    count: int = Field(ge=1, le=MAX_BATCH)
+
+# Bulk /get_uid: every uid is created in one transaction and returned in one response
+@app.post("/provision")
+async def provision_users(request: ProvisionRequest):
+    output = await create_users(request.password, request.count)
+    return output
+
 class UpdateRequest(BaseModel):
     uid: str
     password: str
@@ -67,8 +101,11 @@ class UpdateRequest(BaseModel):
         return v
 
 @app.post("/update")
-async def update_code(request: UpdateRequest):
-    output = await update_user(request.uid, request.password, request.code)
+async def update_code(request: UpdateRequest, auth: dict = Depends(require_auth())):
+    if auth["status"] != "success":
+        return auth
+    async with uid_lock(request.uid):
+        output = await update_user(request.uid, request.code)
     return output
 
 class DeployRequest(BaseModel):
@@ -76,7 +113,9 @@ class DeployRequest(BaseModel):
     password: str
 
 @app.post("/fetch_wallet")
-async def fetch_wallet(request: DeployRequest):
+async def fetch_wallet(request: DeployRequest, auth: dict = Depends(require_auth())):
+    if auth["status"] != "success":
+        return auth
     output = await get_user_wallet_address(request.uid)
     return output
 
@@ -91,10 +130,41 @@ class ActDeployRequest(BaseModel):
     profit: float
     loss: float
     risk: RiskLevel
+    candidates: int = Field(default=1, ge=1, le=5)  # >1 generates several strategies and keeps the best on a replay
     
+async def stream_progress(task, progress):
+    # Forward progress lines from a running task until it finishes
+    getter = None
+    try:
+        while True:
+            getter = asyncio.ensure_future(progress.get())
+            await asyncio.wait({task, getter}, return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                yield getter.result()
+                continue
+            getter.cancel()
+            while not progress.empty():
+                yield progress.get_nowait()
+            break
+    finally:
+        # Client disconnected mid-stream, do not leave the generation or the queue read running
+        if getter is not None and not getter.done():
+            getter.cancel()
+        if not task.done():
+            task.cancel()
+
 @app.post("/deploy")
-async def deploy_code_from_graph(request: ActDeployRequest):
+async def deploy_code_from_graph(request: ActDeployRequest, auth: dict = Depends(require_auth())):
+    if auth["status"] != "success":
+        return auth
+
     async def stream():
+        # Held for the whole deployment, /update, /stop_execution and /delete of this uid wait for it
+        async with uid_lock(request.uid):
+            async for line in deploy_attempts():
+                yield line
+
+    async def deploy_attempts():
         success = False
         for i in range(1,7):
             if(i == 1):
@@ -111,7 +181,11 @@ async def deploy_code_from_graph(request: ActDeployRequest):
             else:
                 yield f"[WALLET FOUND] Wallet already initialized.\n"
             yield "[GRAPH SYNC] Initiating graph to code conversion...\n"
-            output = await graph_to_code(request.uid, request.password, request.risk)
+            progress = asyncio.Queue()
+            task = asyncio.create_task(graph_to_code(request.uid, request.password, request.risk, on_progress=progress.put_nowait, candidates=request.candidates))
+            async for line in stream_progress(task, progress):
+                yield line
+            output = task.result()
             if output.get("status") != "success":
                 yield f"[GRAPH FAILURE] Error in graph to code conversion: {output.get('message')}\n"
                 continue
@@ -121,6 +195,8 @@ async def deploy_code_from_graph(request: ActDeployRequest):
             output = await handle_req_install(request.uid, request.password)
             if output.get("status") != "success":
                 yield f"[INSTALL FAILURE] Error in installing dependencies: {output.get('message')}\n"
+                # The retry regenerates the code instead of reinstalling the same requirements
+                await discard_cached_code(request.uid)
                 continue
             yield "[INSTALL SUCCESS] Dependencies successfully installed.\n"
 
@@ -128,6 +204,7 @@ async def deploy_code_from_graph(request: ActDeployRequest):
             output = await handle_req_import(request.uid, request.password)
             if output.get("status") != "success":
                 yield f"[IMPORT FAILURE] Error in checking imports: {output.get('message')}\n"
+                await discard_cached_code(request.uid)
                 continue
             yield "[IMPORT SUCCESS] Imports successfully compiled.\n"
 
@@ -135,6 +212,7 @@ async def deploy_code_from_graph(request: ActDeployRequest):
             output = await deploy_code(request.uid, request.password)
             if output.get("status") != "success":
                 yield f"[EXECUTION FAILURE] Error in finalizing deployment: {output.get('message')}\n"
+                await discard_cached_code(request.uid)
                 continue
             yield "[EXECUTION SUCCESS] Code has been successfully executed.\n"
             success = True
@@ -146,44 +224,161 @@ async def deploy_code_from_graph(request: ActDeployRequest):
     return StreamingResponse(stream(), media_type="text/plain")
 
 @app.post("/stop_execution")
-async def stop_execution(request: DeployRequest):
-    output = await kill_code(request.uid, request.password)
+async def stop_execution(request: DeployRequest, auth: dict = Depends(require_auth())):
+    if auth["status"] != "success":
+        return auth
+    async with uid_lock(request.uid):
+        output = await kill_code(request.uid)
     return output
 
+class FetchProjection(str, Enum):
+    full = "full"
+    meta = "meta"
+
 class FetchRequest(BaseModel):
     password: str
+    cursor: str | None = None                              # next_cursor of the previous page
+    limit: int | None = Field(default=None, ge=1, le=1000)  # None returns every graph in one page
+    projection: FetchProjection = FetchProjection.full       # meta: uid, name, deploy status, updated at, fingerprint
+    stream: bool = False                                    # NDJSON, one graph per line as it is read
 
 @app.post("/fetch_data")
 async def fetch_data(request: FetchRequest):
-    output = await fetch_user_data(request.password)
+    include_graph = request.projection == FetchProjection.full
+    if request.stream:
+        return StreamingResponse(
+            stream_user_data(request.password, request.cursor, request.limit, include_graph),
+            media_type="application/x-ndjson",
+        )
+    output = await fetch_user_data(request.password, request.cursor, request.limit, include_graph)
     return output
 
 class CloneRequest(BaseModel):
     uid_from: str
     password_from: str
     password_to: str
+    copies: int = Field(default=1, ge=1, le=1000)  # >1 provisions every target uid in one batch
 
 @app.post("/clone")
-async def clone_asset(request: CloneRequest):
-    gen_uid = await create_user(request.password_to)
-    uid_to = gen_uid["uid"]
-    output = await clone_code(uid_to, request.password_to, request.uid_from, request.password_from)
-    return output
+async def clone_asset(request: CloneRequest, auth: dict = Depends(require_auth("uid_from", "password_from"))):
+    if auth["status"] != "success":
+        return auth
+    gen_uids = await create_users(request.password_to, request.copies)
+    if gen_uids.get("status") != "success":
+        return gen_uids
+    async with uid_lock(request.uid_from):
+        if request.copies == 1:
+            output = await clone_code(gen_uids["uids"][0], request.uid_from)
+            return output
+        outputs = [await clone_code(uid_to, request.uid_from) for uid_to in gen_uids["uids"]]
+    failed = [output for output in outputs if output.get("status") != "success"]
+    if failed:
+        return failed[0]
+    return {"status": "success", "uids": gen_uids["uids"], "message": "Project code successfully cloned and synchronized."}
 
 class FetchLogRequest(BaseModel):
     uid: str
     password: str
+    cursor: int = Field(default=0, ge=0)                                    # byte offset, next_cursor of the previous call
+    limit: int = Field(default=LOG_DEFAULT_LIMIT, ge=1, le=LOG_MAX_LIMIT)  # bytes, pages end on a line boundary
+    tail: int | None = Field(default=None, ge=0, le=LOG_MAX_TAIL)          # last N lines instead of reading from cursor
 
 @app.post("/fetch_logs")
-async def fetch_logs(request: FetchLogRequest):
-    output = await get_datalogs(request.uid, request.password)
+async def fetch_logs(request: FetchLogRequest, auth: dict = Depends(require_auth())):
+    if auth["status"] != "success":
+        return auth
+    output = await get_datalogs(request.uid, request.password, request.cursor, request.limit, request.tail)
+    return output
+
+class StreamLogRequest(BaseModel):
+    uid: str
+    password: str
+    cursor: int = Field(default=0, ge=0)                            # byte offset to stream from, overridden by Last-Event-ID
+    tail: int | None = Field(default=None, ge=0, le=LOG_MAX_TAIL)  # start with the last N lines instead of cursor
+
+def log_event_stream(uid, cursor, tail, http_request):
+    last_event_id = http_request.headers.get("last-event-id", "")
+    if last_event_id.isdigit():
+        # Reconnect: resume right after the last event the client received
+        cursor, tail = int(last_event_id), None
+    return StreamingResponse(
+        stream_datalogs(uid, cursor, tail),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# Server-sent events: appended log lines as the bot writes them, one shared file watcher per log
+@app.post("/stream_logs")
+async def stream_logs(request: StreamLogRequest, http_request: Request, auth: dict = Depends(require_auth())):
+    if auth["status"] != "success":
+        return auth
+    return log_event_stream(request.uid, request.cursor, request.tail, http_request)
+
+# The same stream for browser EventSource clients, which can only send GET requests without a body
+@app.get("/stream_logs")
+async def stream_logs_get(
+    http_request: Request,
+    uid: str,
+    password: str,
+    cursor: int = Query(default=0, ge=0),
+    tail: int | None = Query(default=None, ge=0, le=LOG_MAX_TAIL),
+    auth: dict = Depends(require_auth(query=True)),
+):
+    if auth["status"] != "success":
+        return auth
+    return log_event_stream(uid, cursor, tail, http_request)
+
+class DecisionQueryRequest(BaseModel):
+    uid: str
+    password: str
+    since: float | None = None                                 # epoch seconds, inclusive
+    until: float | None = None                                 # epoch seconds, exclusive
+    cursor: int | None = Field(default=None, ge=0)             # next_cursor of the previous page
+    limit: int = Field(default=500, ge=1, le=MAX_DECISIONS)
+
+@app.post("/decision_logs")
+async def decision_logs(request: DecisionQueryRequest, auth: dict = Depends(require_auth())):
+    if auth["status"] != "success":
+        return auth
+    output = await get_decisions(request.uid, request.since, request.until, request.cursor, request.limit)
+    return output
+
+class DecisionStatsRequest(BaseModel):
+    uid: str
+    password: str
+    since: float | None = None  # rounded down to its hour
+    until: float | None = None
+
+# Buy/sell/hold counts and risk filter override rate per hour, answered from the decision log index
+@app.post("/decision_stats")
+async def decision_stats(request: DecisionStatsRequest, auth: dict = Depends(require_auth())):
+    if auth["status"] != "success":
+        return auth
+    output = await get_decision_stats(request.uid, request.since, request.until)
     return output
 
 @app.post("/delete")
-async def delete_data(request: DeployRequest):
-    output = await delete_asset(request.uid, request.password)
+async def delete_data(request: DeployRequest, auth: dict = Depends(require_auth())):
+    if auth["status"] != "success":
+        return auth
+    async with uid_lock(request.uid):
+        output = await delete_asset(request.uid)
+    return output
+
+class DeleteBatchRequest(BaseModel):
+    password: str
+    uids: list[str] = Field(min_length=1, max_length=MAX_DELETE_BATCH)
+
+# Bulk /delete for uids created with one password, verified once for the whole batch
+@app.post("/delete_batch")
+async def delete_batch(request: DeleteBatchRequest):
+    output = await delete_assets(request.password, request.uids)
     return output
 
+@app.get("/codegen_metrics")
+async def codegen_metrics():
+    return usage_summary()
+
 class TempRequest(BaseModel):
     uid: str
     password: str
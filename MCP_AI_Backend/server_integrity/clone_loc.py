@@ -1,68 +1,55 @@
-import os
-import shutil
-import json
+import asyncio
 import sqlite3
+import sys
 
-async def clone_code(uid_to, password_to, uid_from, password_from):
-    db_path = "./core_db/users.db"
-    user_assets_dir = "./user_assets"
+sys.path.append('..')
+from utils.graph_compiler import compile_graph_ir
+from core_db.state_store import get_state, get_graph, copy_state
+from utils.asset_files import clone_assets, shared_digest
 
-    # Step 1: Verify credentials using sqlite3
-    try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE uid = ? AND user_password = ?", (uid_from, password_from))
-        result = cursor.fetchone()
-        conn.close()
+async def clone_code(uid_to, uid_from):
+    # Step 1: Source credentials are verified by the auth dependency before this runs
 
-        if result is None:
-            return {
-                "status": "error",
-                "message": "Authentication error: Source UID or password is invalid."
-            }
-    except Exception as e:
+    # Step 2: Skip the copy when the target already holds this exact graph and code from the same source
+    try:
+        src_state = await get_state(uid_from)
+        dst_state = await get_state(uid_to)
+    except sqlite3.Error as e:
         return {
             "status": "error",
             "message": f"Database error: {str(e)}"
         }
-
-    # Step 2: Clone files from uid_from to uid_to
-    src_dir = os.path.join(user_assets_dir, uid_from)
-    dst_dir = os.path.join(user_assets_dir, uid_to)
-
-    if not os.path.isdir(src_dir) or not os.path.isdir(dst_dir):
+    if src_state is None or dst_state is None:
         return {
             "status": "error",
-            "message": "Source or target project folder is missing."
+            "message": "Source or target project state is missing."
+        }
+    fingerprint = src_state["graph_fingerprint"]
+    if not fingerprint:
+        # Rows imported from folders written before the fingerprint existed hash the graph once
+        fingerprint = compile_graph_ir(await get_graph(uid_from)).fingerprint
+    if dst_state["cloned_from_uid"] == uid_from and dst_state["graph_fingerprint"] == fingerprint and (
+        # The source may have regenerated its code for the same graph since the last clone
+        await asyncio.to_thread(shared_digest, uid_from) == await asyncio.to_thread(shared_digest, uid_to)
+    ):
+        return {
+            "status": "success",
+            "uid": uid_to,
+            "message": "Project graph is already in sync with the source."
         }
 
+    # Step 3: Hardlink the files of uid_from into uid_to, logs are not cloned
     try:
-        for filename in os.listdir(src_dir):
-            src_file = os.path.join(src_dir, filename)
-            dst_file = os.path.join(dst_dir, filename)
-
-            if os.path.isfile(src_file):
-                with open(src_file, 'r') as fsrc:
-                    content = fsrc.read()
-                with open(dst_file, 'w') as fdst:
-                    fdst.write(content)
+        await asyncio.to_thread(clone_assets, uid_from, uid_to)
     except Exception as e:
         return {
             "status": "error",
             "message": f"File cloning error: {str(e)}"
         }
 
-    # Step 3: Overwrite code_sync.json in target directory
+    # Step 4: Copy graph, wallet and lineage onto the target state, credentials are never copied
     try:
-        code_sync = {
-            "deploy_status": False,
-            "clone_status": True,
-            "cloned_from_uid": uid_from,
-            "cloned_from_password": password_from,
-        }
-        code_sync_path = os.path.join(dst_dir, "code_sync.json")
-        with open(code_sync_path, 'w') as f:
-            json.dump(code_sync, f, indent=4)
+        await copy_state(uid_from, uid_to)
     except Exception as e:
         return {
             "status": "error",
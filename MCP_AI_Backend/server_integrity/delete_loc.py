@@ -1,82 +1,167 @@
+import asyncio
 import os
-import json
-import shutil
 import sqlite3
+import sys
+import time
 
-async def delete_asset(uid, password):
-    db_path = "./core_db/users.db"
-    user_assets_dir = f"./user_assets/{uid}"
-    code_sync_path = os.path.join(user_assets_dir, "code_sync.json")
+sys.path.append('..')
+from uid_management.auth_service import tombstone_users, authenticate_owner
+from core_db.db_access import fetch_all, execute
+from utils.asset_files import user_folder, blob_shards, collect_blobs
+from utils.uid_locks import uid_lock
 
-    # Step 1: Verify user credentials
-    try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE uid = ? AND user_password = ?", (uid, password))
-        result = cursor.fetchone()
-        conn.close()
-
-        if not result:
-            return {
-                "status": "error",
-                "message": "Authentication failed: Invalid UID or password."
-            }
-    except sqlite3.Error as e:
-        return {
-            "status": "error",
-            "message": f"Database error during authentication: {e}"
-        }
+MAX_BATCH = 10000
+REAP_BATCH = 50                 # tombstones picked up per reaper pass
+REAP_FILES_PER_SECOND = 500     # upper bound on unlink/rmdir calls, keeps deletes from starving live bots of disk I/O
+REAP_CHUNK = 50                 # filesystem entries removed between two rate limiting sleeps
+REAP_IDLE_SECONDS = 30
+BLOB_COLLECT_SECONDS = 600      # at most one blob store sweep per interval, every delete in between shares it
+BLOB_CHECKS_PER_SECOND = 5000   # blobs stat-ed by a sweep, one blob shard at a time
 
-    # Step 2: Check deploy_status in code_sync.json
-    if not os.path.exists(code_sync_path):
-        return {
-            "status": "error",
-            "message": "Missing code_sync.json: Cannot verify deployment status."
-        }
+_reap_wakeup = None
+_blobs_pending = False          # uid folders were removed since the last sweep
+_blobs_swept_at = None
+
+def wake_reaper():
+    if _reap_wakeup is not None:
+        _reap_wakeup.set()
 
+async def delete_asset(uid):
+    # Step 1: Credentials are verified by the auth dependency before this runs
+
+    # Step 2: Tombstone the uid in one transaction, unless it is deployed
     try:
-        with open(code_sync_path, "r") as f:
-            code_sync = json.load(f)
-    except json.JSONDecodeError:
+        # Also drops the uid state, its pid row and the cached verification of this uid
+        deleted, deployed, _ = await tombstone_users([uid])
+    except sqlite3.Error as e:
         return {
             "status": "error",
-            "message": "Invalid JSON format in code_sync.json."
+            "message": f"Database error during deletion: {e}"
         }
 
-    if code_sync.get("deploy_status") is True:
+    if deployed:
         return {
             "status": "error",
             "message": "Asset is currently deployed. Please stop the deployment before deletion."
         }
-
-    # Step 3: Delete user asset directory
-    try:
-        shutil.rmtree(user_assets_dir)
-    except FileNotFoundError:
+    if not deleted:
         return {
             "status": "error",
-            "message": "User asset directory not found."
-        }
-    except Exception as e:
-        return {
-            "status": "error",
-            "message": f"Error deleting user assets: {e}"
+            "message": "Missing uid state: Cannot verify deployment status."
         }
 
-    # Step 4: Remove user entry from the database
-    try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM users WHERE uid = ? AND user_password = ?", (uid, password))
-        conn.commit()
-        conn.close()
-    except sqlite3.Error as e:
-        return {
-            "status": "error",
-            "message": f"Database error during deletion: {e}"
-        }
+    # Step 3: The asset directory is removed by the background reaper
+    wake_reaper()
 
     return {
         "status": "success",
-        "message": "User asset and credentials successfully deleted."
+        "message": "User credentials deleted, assets are removed in the background."
     }
+
+async def delete_assets(password, uids):
+    # Batch cleanup of abandoned uids created with one password
+    if len(uids) > MAX_BATCH:
+        return {"status": "error", "message": f"At most {MAX_BATCH} uids per request", "code": 400}
+
+    auth = await authenticate_owner(password, uids)
+    if auth["status"] != "success":
+        return auth
+
+    try:
+        # Like /delete, waits for running /deploy, /update and /stop_execution of these uids (locked in sorted order)
+        async with uid_lock(*uids):
+            deleted, deployed, not_found = await tombstone_users(uids, owner_password=password)
+    except sqlite3.Error as e:
+        return {"status": "error", "message": f"Database error during deletion: {e}", "code": 500}
+
+    wake_reaper()
+    return {"status": "success", "deleted": deleted, "deployed": deployed, "not_found": not_found}
+
+def list_tree(folder):
+    # Children before their parent directory, the order they can be removed in
+    entries = []
+    for root, dirs, files in os.walk(folder, topdown=False):
+        entries += [(os.path.join(root, name), False) for name in files]
+        entries += [(os.path.join(root, name), True) for name in dirs]
+    if os.path.isdir(folder):
+        entries.append((folder, True))
+    return entries
+
+def remove_entries(entries):
+    for path, is_dir in entries:
+        try:
+            if is_dir and not os.path.islink(path):
+                os.rmdir(path)
+            else:
+                os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+async def remove_folder(folder):
+    # Removing a uid folder unlinks at most REAP_FILES_PER_SECOND entries per second
+    entries = await asyncio.to_thread(list_tree, folder)
+    for start in range(0, len(entries), REAP_CHUNK):
+        chunk = entries[start:start + REAP_CHUNK]
+        await asyncio.to_thread(remove_entries, chunk)
+        await asyncio.sleep(len(chunk) / REAP_FILES_PER_SECOND)
+
+async def reap_tombstones(limit=REAP_BATCH):
+    """Remove the folders of up to limit tombstoned uids, oldest first. Returns how many were reaped."""
+    rows = await fetch_all("SELECT uid FROM tombstones ORDER BY deleted_at LIMIT ?", (limit,))
+    reaped = 0
+    for (uid,) in rows:
+        try:
+            await remove_folder(user_folder(uid))
+        except OSError as e:
+            # Left tombstoned, the next pass retries it
+            print(f"[REAPER] Unable to remove assets of {uid}: {e}")
+            continue
+        await execute("DELETE FROM tombstones WHERE uid = ?", (uid,))
+        reaped += 1
+    if reaped:
+        # Deleted folders may have held the last link to some blobs, the next sweep collects them
+        global _blobs_pending
+        _blobs_pending = True
+        print(f"[REAPER] Removed the assets of {reaped} deleted uid(s)")
+    return reaped
+
+async def sweep_blobs():
+    """Remove unreferenced blobs one shard at a time within BLOB_CHECKS_PER_SECOND, returns how many were removed."""
+    global _blobs_pending, _blobs_swept_at
+    # Cleared first, so a delete reaped during the sweep asks for another one
+    _blobs_pending = False
+    _blobs_swept_at = time.monotonic()
+    removed = 0
+    for shard in await asyncio.to_thread(blob_shards):
+        checked, count = await asyncio.to_thread(collect_blobs, shard)
+        removed += count
+        await asyncio.sleep(checked / BLOB_CHECKS_PER_SECOND)
+    print(f"[REAPER] Removed {removed} unreferenced blob(s)")
+    return removed
+
+def blobs_due():
+    return _blobs_pending and (_blobs_swept_at is None or time.monotonic() - _blobs_swept_at >= BLOB_COLLECT_SECONDS)
+
+async def run_reaper():
+    """Background task: reap tombstones as they appear, polling every REAP_IDLE_SECONDS otherwise."""
+    global _reap_wakeup
+    _reap_wakeup = asyncio.Event()
+    while True:
+        # Cleared before the pass, so a delete committed during it triggers another one
+        _reap_wakeup.clear()
+        try:
+            reaped = await reap_tombstones()
+        except sqlite3.Error as e:
+            print(f"[REAPER] Database error: {e}")
+            reaped = 0
+        if reaped:
+            continue
+        if blobs_due():
+            try:
+                await sweep_blobs()
+            except OSError as e:
+                print(f"[REAPER] Unable to collect blobs: {e}")
+        try:
+            await asyncio.wait_for(_reap_wakeup.wait(), REAP_IDLE_SECONDS)
+        except asyncio.TimeoutError:
+            pass
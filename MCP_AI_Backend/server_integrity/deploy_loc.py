@@ -1,13 +1,17 @@
-import os
+import asyncio
 import json
 import sys
 
 sys.path.append('..')
-from codegen_engine.graph_codegen import gen_code
-from utils.json_to_map import map_json
+from codegen_engine.code_correction import validate_generated_code
+from codegen_engine.code_cache import build_strategy_code, CodeValidationError
+from utils.graph_compiler import compile_graph_ir
+from utils.asset_files import write_assets, user_folder
+from core_db import state_store
 
 placeholder_code = """
 import os
+import sys
 import redis
 import json
 import requests
@@ -17,6 +21,11 @@ import numpy as np
 from datetime import datetime
 from scipy.stats import linregress
 
+# Bots run from the project root, the structured decision log writer and log rotation live in its utils package
+sys.path.append(os.getcwd())
+from utils.decision_log import DecisionWriter
+from utils.log_segments import rotate_log
+
 def compute_trend_slope(data, lookback=20):
     candles = data.get("candlesticks", [])
     if len(candles) < lookback:
@@ -50,9 +59,10 @@ def compute_rsi(data, lookback=14):
     return 100 - (100 / (1 + rs))
 
 def filter_decision(decision, data, risk="low"):
+    # Returns the filtered decision and the override reason ("" when it passed, None when not checked)
     original_decision = decision
     if risk == "high" or decision == "hold":
-        return decision
+        return decision, None
 
     trend = compute_trend_slope(data)
     vol = current_volume(data)
@@ -82,13 +92,13 @@ def filter_decision(decision, data, risk="low"):
                 reason = f"RSI ({rsi:.2f}) below acceptable threshold (50)"
 
     if new_decision != original_decision:
-        with open(f"./user_assets/{uid}/data_log.txt", "a", encoding="utf-8") as f:
+        with open("{user_folder}/data_log.txt", "a", encoding="utf-8") as f:
             f.write(f"[RISK FILTER] Risk profile '{risk.upper()}' intercepted decision '{original_decision.upper()}' → revised to 'HOLD'. Reason: {reason}.\\n")
     else:
-        with open(f"./user_assets/{uid}/data_log.txt", "a", encoding="utf-8") as f:
+        with open("{user_folder}/data_log.txt", "a", encoding="utf-8") as f:
             f.write(f"[RISK FILTER] Decision '{original_decision.upper()}' passed with risk profile '{risk.upper()}'. No action taken.\\n")
 
-    return new_decision
+    return new_decision, reason
 
 
 def ensure_json(wallet):
@@ -198,19 +208,25 @@ if __name__ == "__main__":
     wallet = >><<
     # wallet = Wallet(**wallet)
     risk_status = "<><>"
-    log_file_path = "./user_assets/{uid}/data_log.txt"
+    log_file_path = "{user_folder}/data_log.txt"
+    decision_log = DecisionWriter("{user_folder}")
     try:
         curr_status = "liq"
         for data in candle_generator():
             if not data.get('candlesticks'):
                 continue
+
+            # Size/time based rotation into gzip segments, keeps the disk usage of the log bounded
+            rotate_log(log_file_path)
             
             decision = agent_code(data)
             print(f"Agent Decision: {decision}")
             with open(log_file_path, 'a', encoding='utf-8') as f:
                 f.write("="*100)
                 f.write(f"\\n[AGENT EVALUATION] Agent Based Analysis Result: {decision.upper()}\\n")
-            decision = filter_decision(decision, data, risk_status)
+            agent_decision = str(decision).lower()
+            decision, filter_reason = filter_decision(decision, data, risk_status)
+            filtered_decision = decision
             print(f"Filtered Decision: {decision}")
 
             if decision == "buy" and curr_status == "liq":
@@ -246,6 +262,16 @@ if __name__ == "__main__":
             with open(log_file_path, 'a', encoding='utf-8') as f:
                 f.write(f"[FINAL DECISION] {decision.upper()} at {time.strftime('%Y-%m-%d %H:%M:%S')}\\n")
                 print(f"Logged decision: {decision}")
+
+            decision_log.write(
+                agent=agent_decision,
+                risk=risk_status,
+                checked=filter_reason is not None,
+                override=str(filtered_decision).lower() != agent_decision,
+                reason=filter_reason or None,
+                final=str(decision).lower(),
+                position=curr_status,
+            )
             
             with open(log_file_path, 'a', encoding='utf-8') as f:
                 f.write("="*100)
@@ -267,44 +293,43 @@ if __name__ == "__main__":
 
 async def get_wallet(uid):
     try:
-        user_folder = f"./user_assets/{uid}"
-        wallet_path = os.path.join(user_folder, "wallet_sync.json")
-        with open(wallet_path, 'r') as f:
-            wallet_data = json.load(f)
-        return wallet_data.get("wallet")
+        return await state_store.get_wallet(uid)
     except Exception as e:
         print(f"Error in getting wallet: {e}")
         return None
 
-async def graph_to_code(uid, password=None, risk="low"):
+async def graph_to_code(uid, password=None, risk="low", on_progress=None, candidates=1):
     try:
-        user_folder = f"./user_assets/{uid}"
-        code_sync_path = os.path.join(user_folder, "code_sync.json")
-
-        # Check if the user folder exists
-        if not os.path.exists(user_folder):
-            return {"status": "error", "message": "User folder does not exist", "code": 404}
-        
-        # Check if the code_sync.json file exists in the folder
-        if not os.path.isfile(code_sync_path):
-            return {"status": "error", "message": "code_sync.json file not found", "code": 404}
-        
-        # Read the code_sync.json file
-        with open(code_sync_path, 'r') as file:
-            code_sync_data = json.load(file)
-
-        # Check if the "deploy_status" field exists in the json and its value
-        if code_sync_data.get("deploy_status", False):
+        # Deploy status and graph come from the state store, the uid folder is created by the first write below
+        state = await state_store.get_state(uid)
+        if state is None:
+            return {"status": "error", "message": "UID state not found", "code": 404}
+
+        if state["deploy_status"]:
             return {"status": "error", "message": "The no code graph is already deployed and no changes are noticed", "code": 400}
 
-        # Copy the content of data_config.json and preprocess using map_json
-        with open(user_folder + "/data_config.json", 'r') as file:
-            data_config = json.load(file)
+        data_config = await state_store.get_graph(uid)
 
-        mapped_json = map_json(data_config)
+        # Graphs saved before /update validated them are rejected here, still before any LLM call
+        graph_ir = compile_graph_ir(data_config)
+        if not graph_ir.valid:
+            return {"status": "error", "message": "Invalid graph: " + "; ".join(graph_ir.errors), "code": 422}
 
         ### Here we will convert json to code, and then try to deploy it ###
-        req, imp, code = gen_code(mapped_json)
+        # An unchanged graph reuses its cached code, anything else goes through the template compiler / LLM
+        try:
+            req, imp, code = await build_strategy_code(uid, graph_ir, on_progress, candidates)
+        except CodeValidationError as e:
+            return {"status": "error", "message": str(e), "code": 422}
+
+        # Reject (or repair) a bad generation before pip install / import checks run
+        validation = validate_generated_code(req, imp, code)
+        if validation["status"] != "success":
+            return {"status": "error", "message": "Generated code failed validation: " + "; ".join(validation["errors"]), "code": 422}
+        for repair in validation["repairs"]:
+            if on_progress:
+                on_progress(f"[GRAPH REPAIR] {repair}\n")
+        req, imp, code = validation["requirements"], validation["imports"], validation["code"]
         imp2 = imp.copy()
         imp.append("\n\nprint(\"Hello World\")")
 
@@ -314,24 +339,18 @@ async def graph_to_code(uid, password=None, risk="low"):
         if not wallet:
             return {"status": "error", "message": "Wallet not found", "code": 404}
 
-        req_path = os.path.join(user_folder, "requirements.txt")
-        imp_path = os.path.join(user_folder, "initialise.py")
-        code_path = os.path.join(user_folder, "trading_code.py")
-
-        with open(req_path, 'w') as file:
-            file.write("\n".join(req))
-
-        # Write each import on a new line
-        with open(imp_path, 'w') as file:
-            file.write("\n".join(imp))
-
         indented_code = "\n".join("    " + line for line in code.splitlines())
 
         # Replace placeholder and combine
-        final_code = "\n".join(imp2) + "\n\n" + placeholder_code.replace("{uid}", str(uid)).replace("<<>>", indented_code).replace(">><<", json.dumps(wallet)).replace("<><>", risk)
-
-        with open(code_path, 'w', encoding='utf-8') as file:
-            file.write(final_code)
+        final_code = "\n".join(imp2) + "\n\n" + placeholder_code.replace("{user_folder}", user_folder(uid)).replace("<<>>", indented_code).replace(">><<", json.dumps(wallet)).replace("<><>", risk)
+
+        # All three files are replaced together, a failed write leaves the previous deployment intact
+        # The fsyncs run in a worker thread, not on the event loop
+        await asyncio.to_thread(write_assets, uid, {
+            "requirements.txt": "\n".join(req),
+            "initialise.py": "\n".join(imp),  # Write each import on a new line
+            "trading_code.py": final_code,
+        })
 
         return {"status": "success", "message": "Deployed successfully", "code": 200}
     except Exception as e:
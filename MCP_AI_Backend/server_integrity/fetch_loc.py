@@ -1,44 +1,59 @@
-import sqlite3
-import os
+import asyncio
 import json
-
-async def fetch_user_data(password):
-    # Database path
-    db_path = './core_db/users.db'
-    
-    # Connect to the SQLite database
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    # Query to get all uids where user_password matches the input password
-    cursor.execute("SELECT uid FROM users WHERE user_password = ?", (password,))
-    user_ids = cursor.fetchall()  # List of tuples (uid,)
+import sys
+
+sys.path.append('..')
+from utils.graph_compiler import compile_graph_ir
+from core_db.state_store import list_graphs_for_owner
+
+STREAM_BATCH = 100  # graphs read from the database per round trip while streaming
+
+def build_entry(graph):
+    # Full entries carry the graph and its IR diagnostics, metadata entries are returned as read
+    if "graph" not in graph:
+        return graph
+    graph_ir = compile_graph_ir(graph["graph"])
+    graph["fingerprint"] = graph_ir.fingerprint
+    graph["errors"] = graph_ir.errors
+    graph["warnings"] = graph_ir.warnings
+    return graph
+
+def build_entries(graphs):
+    # Compiling every graph of a page is CPU work, callers run this in a worker thread
+    return [build_entry(graph) for graph in graphs]
+
+async def read_page(password, cursor, limit, include_graph):
+    # One extra row tells whether another page follows
+    graphs = await list_graphs_for_owner(
+        password, after=cursor, limit=None if limit is None else limit + 1, include_graph=include_graph
+    )
+    if limit is not None and len(graphs) > limit:
+        graphs = graphs[:limit]
+        return graphs, graphs[-1]["uid"]
+    return graphs, None
+
+async def fetch_user_data(password, cursor=None, limit=None, include_graph=True):
+    # One indexed query for the graphs created with the input password (matched through its digest)
+    graphs, next_cursor = await read_page(password, cursor, limit, include_graph)
 
     # Prepare the data list to send to the frontend
-    data = []
-
-    # Iterate over the user_ids
-    for uid_tuple in user_ids:
-        uid = uid_tuple[0]  # Extract the uid from the tuple
-        user_folder = f"./user_assets/{uid}"
-
-        # Check if the folder exists
-        if os.path.exists(user_folder):
-            data_config_path = os.path.join(user_folder, "data_config.json")
-            
-            # Check if the data_config.json file exists in the folder
-            if os.path.isfile(data_config_path):
-                with open(data_config_path, 'r') as file:
-                    # Read the json file and load its content
-                    graph_data = json.load(file)
-                    
-                    # Append the uid and its corresponding graph data to the data list
-                    data.append({"uid": uid, "graph": graph_data})
-
-    # Close the database connection
-    conn.close()
-
-    # Prepare the final JSON response
-    response = {"data": data}
+    data = await asyncio.to_thread(build_entries, graphs)
+
+    # Prepare the final JSON response, next_cursor is None on the last page
+    response = {"data": data, "next_cursor": next_cursor}
 
     return response
+
+async def stream_user_data(password, cursor=None, limit=None, include_graph=True):
+    """NDJSON lines, one graph each as batches are read, then a {"next_cursor": ...} trailer."""
+    remaining = limit
+    while True:
+        batch = STREAM_BATCH if remaining is None else min(STREAM_BATCH, remaining)
+        graphs, cursor = await read_page(password, cursor, batch, include_graph)
+        for entry in await asyncio.to_thread(build_entries, graphs):
+            yield json.dumps(entry) + "\n"
+        if remaining is not None:
+            remaining -= len(graphs)
+        if cursor is None or remaining == 0:
+            break
+    yield json.dumps({"next_cursor": cursor}) + "\n"
@@ -1,10 +1,96 @@
-import os
-
-async def get_datalogs(uid, password):
-    log_path = f"./user_assets/{uid}/data_log.txt"
-    if os.path.exists(log_path):
-        with open(log_path, 'r') as f:
-            log_data = f.read()
-        return {"status": "success", "log": log_data, "code": 200}
+import asyncio
+import sys
+
+sys.path.append('..')
+from utils.asset_files import asset_path, user_folder
+from utils.decision_log import query_records, bucket_stats
+from utils.log_reader import read_range, read_tail
+from utils.log_watch import subscribe
+
+DEFAULT_LIMIT = 64 * 1024   # bytes returned per call unless the request asks for more
+MAX_LIMIT = 1024 * 1024
+MAX_TAIL = 10000
+MAX_DECISIONS = 5000        # records per /decision_logs page
+HEARTBEAT_SECONDS = 15      # idle time before a /stream_logs comment line, proxies drop silent connections
+
+async def get_datalogs(uid, password, cursor=0, limit=DEFAULT_LIMIT, tail=None):
+    # data_log.txt is created by the first deployment, before that the log is empty
+    path = asset_path(uid, "data_log.txt")
+
+    # Step 1: Read only the requested lines, a tail seeks back from the end of the file
+    if tail is not None:
+        log_data, start, next_cursor, size = await asyncio.to_thread(read_tail, path, tail, limit)
     else:
-        return {"status": "error", "message": "Log file not found", "code": 404}
\ No newline at end of file
+        log_data, start, next_cursor, size = await asyncio.to_thread(read_range, path, cursor, limit)
+
+    # Step 2: Pass next_cursor back as cursor to receive only what was appended since
+    return {
+        "status": "success",
+        "log": log_data,
+        "cursor": start,
+        "next_cursor": next_cursor,
+        "size": size,
+        # The cursor is past the end of the log, reading restarted at the current run
+        "reset": tail is None and start < cursor,
+        "code": 200,
+    }
+
+async def get_decisions(uid, since=None, until=None, cursor=None, limit=500):
+    # The hourly index seeks to the first hour of the range, only that range of decisions.jsonl is read
+    records, next_cursor = await asyncio.to_thread(query_records, user_folder(uid), since, until, cursor, limit)
+    return {"status": "success", "records": records, "next_cursor": next_cursor, "code": 200}
+
+async def get_decision_stats(uid, since=None, until=None):
+    # Closed hours are aggregated in the index, only the hour being written is scanned
+    hours, totals = await asyncio.to_thread(bucket_stats, user_folder(uid), since, until)
+    return {"status": "success", "hours": hours, "totals": totals, "code": 200}
+
+def sse_event(text, cursor, reset=False):
+    # One event per chunk, every log line is a data line; id lets a reconnecting client resume with Last-Event-ID
+    data = "".join(f"data: {line.rstrip(chr(13))}\n" for line in text.rstrip("\n").split("\n"))
+    event = "reset" if reset else "log"
+    return f"id: {cursor}\nevent: {event}\n{data}\n"
+
+async def stream_datalogs(uid, cursor=0, tail=None):
+    """Server-sent events with the lines appended to data_log.txt from cursor on, until the client disconnects."""
+    path = asset_path(uid, "data_log.txt")
+
+    # Subscribed before the first read, nothing appended in between is missed
+    async with subscribe(path) as queue:
+        # Step 1: Optional backlog, read backwards from the end
+        if tail is not None:
+            log_data, _, cursor, _ = await asyncio.to_thread(read_tail, path, tail, MAX_LIMIT)
+            if log_data:
+                yield sse_event(log_data, cursor)
+
+        catch_up = tail is None
+        while True:
+            # Step 2: Read from our own cursor when starting, after falling behind the shared feed or on a heartbeat
+            if catch_up or queue.lagging:
+                queue.lagging = False
+                while True:
+                    log_data, start, next_cursor, _ = await asyncio.to_thread(read_range, path, cursor, MAX_LIMIT)
+                    reset = start < cursor
+                    if next_cursor == cursor and not reset:
+                        break
+                    cursor = next_cursor
+                    yield sse_event(log_data, cursor, reset)
+                catch_up = False
+
+            # Step 3: Forward the chunks the shared watcher read, a heartbeat keeps idle connections open
+            try:
+                start, end, log_data, reset = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                catch_up = True
+                continue
+            if reset and cursor > end:
+                # Truncated and not seen by a read of our own yet
+                cursor = 0
+            if end <= cursor:
+                continue
+            if start != cursor:
+                catch_up = True
+                continue
+            cursor = end
+            yield sse_event(log_data, cursor, reset)
@@ -1,31 +1,24 @@
-import os
-import json
+import sqlite3
+import sys
 
-async def get_user_wallet_address(uid: str):
-    user_dir = f"./user_assets/{uid}"
-    
-    # Step 1: Check if user directory exists
-    if not os.path.exists(user_dir):
-        return {"status": "error", "message": "404 not found, the uid doesn't exist"}
-    
-    wallet_file = os.path.join(user_dir, "wallet_sync.json")
-    
-    # Step 2: Check if wallet_sync.json exists and read it
-    if not os.path.exists(wallet_file):
-        return {"status": "error", "message": "User didn't initialise a wallet for this uid"}
+sys.path.append('..')
+from core_db.state_store import get_state, get_wallet
 
+async def get_user_wallet_address(uid: str):
+    # Step 1: Check if the uid has any state
     try:
-        with open(wallet_file, mode='r') as f:
-            data = json.load(f)
-    except (json.JSONDecodeError, IOError):
-        return {"status": "error", "message": "Unable to read or parse wallet file"}
+        if await get_state(uid) is None:
+            return {"status": "error", "message": "404 not found, the uid doesn't exist"}
+
+        # Step 2: Read the wallet column
+        wallet_data = await get_wallet(uid)
+    except (sqlite3.Error, ValueError):
+        return {"status": "error", "message": "Unable to read or parse wallet data"}
     
-    # Step 3: Check for "wallet" key
-    if "wallet" not in data:
+    # Step 3: Check that a wallet was initialised
+    if wallet_data is None:
         return {"status": "error", "message": "User didn't initialise a wallet for this uid"}
     
-    wallet_data = data["wallet"]
-    
     # Step 4: Check for "address" key
     if "address" not in wallet_data:
         return {"status": "error", "message": "Wallet was initialised with an unknown key, unable to fetch the address"}
@@ -1,10 +1,11 @@
-import sqlite3
 import os
-import json
+import sqlite3
 import sys
 
 sys.path.append('..')
-from utils.graph_preprocess import filter_workflow_json
+from utils.graph_compiler import compile_graph_ir
+from utils.graph_diff import graph_signature, diff_signatures
+from core_db.state_store import sync_graph
 
 def safe_json_load(path):
     if not os.path.exists(path):
@@ -13,100 +14,72 @@ def safe_json_load(path):
         print(f"File {path} is empty")
     print(f"Loading JSON from {path}")
 
-async def check_and_sync_code(uid: str, code):
+def describe_graph(graph):
+    # State imported from folders written before the sync metadata existed reads the old graph once
+    return compile_graph_ir(graph).fingerprint, graph_signature(graph)
+
+async def check_and_sync_code(uid: str, code, graph_ir=None):
     try:
         print(uid, code)
-        user_dir = os.path.join("./user_assets", uid)
-        data_config_path = os.path.join(user_dir, "data_config.json")
-        code_sync_path = os.path.join(user_dir, "code_sync.json")
-
-        # Set "deploy_status" to False in code_sync.json
-        with open(code_sync_path, 'r') as f:
-            code_sync = json.load(f)
-
-        deploy_status = code_sync.get("deploy_status", False)
-        if deploy_status:
-            return False, 403
-
-        # Read data_config.json and compare the code
-        with open(data_config_path, 'r') as f:
-            current_code = json.load(f)
-
-        with open(data_config_path, 'w') as f:
-            json.dump(code, f, indent=4)
-
-        if filter_workflow_json(current_code) == filter_workflow_json(code) or current_code == code:
-            return False, 200
-
-        code_sync["deploy_status"] = False
-
-        with open(code_sync_path, 'w') as f:
-            json.dump(code_sync, f, indent=4)
-
-        return True, 200
-
-    except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError) as e:
+        # Compare signatures instead of re-reading and filtering the old graph
+        graph_ir = graph_ir or compile_graph_ir(code)
+        new_signature = graph_signature(graph_ir)
+
+        # The deploy check and the write are one transaction, a deploy committed meanwhile wins
+        synced = await sync_graph(uid, code, graph_ir.fingerprint, new_signature, describe_graph)
+        if synced is None:
+            return False, 404, None
+        deployed, old_signature = synced
+        if deployed:
+            return False, 403, None
+
+        # Positions and other React Flow fields are stored too, they never count as a change
+        changes = diff_signatures(old_signature, new_signature)
+        return changes["changed"], 200, changes
+
+    except (sqlite3.Error, KeyError, TypeError, ValueError) as e:
         print(f"Error: {e}")
-        return False, 500
+        return False, 500, None
 
-async def update_user(uid: str, password: str, code):
+async def update_user(uid: str, code):
+    # Credentials are verified by the auth dependency before this runs
     try:
-        # Connect to the database
-        print("init1")
-        conn = sqlite3.connect("./core_db/users.db")
-        cursor = conn.cursor()
-
-        # Use parameterized query to avoid SQL injection
-        cursor.execute("SELECT user_password FROM users WHERE uid = ?", (uid,))
-        rows = cursor.fetchall()
+        # Structural problems are rejected before touching any file
+        graph_ir = compile_graph_ir(code)
+        if not graph_ir.valid:
+            return {
+                "status": "error",
+                "message": "Invalid graph: " + "; ".join(graph_ir.errors),
+                "errors": graph_ir.errors,
+                "code": 422
+            }
 
-        if len(rows) == 0:
+        # Check and sync code
+        deploy_status, code_status, changes = await check_and_sync_code(uid, code, graph_ir)
+        print(deploy_status, code_status)
+        if code_status == 404:
             return {
                 "status": "error",
                 "message": "UID doesn't exist, bad request",
-                "code": 400  # HTTP 400 Bad Request
+                "code": 404
             }
-        elif len(rows) > 1:
-            print("Error: Duplicate UID found in the database.")
+        if code_status == 403:
+            return {
+                "status": "error",
+                "message": "Deployed code cannot be updated, please stop the execution first or clone the graph to a new UID",
+                "code": 403
+            }
+        if code_status != 200:
             return {
                 "status": "error",
                 "message": "Internal Server Error",
-                "code": 500  # HTTP 500 Internal Server Error
+                "code": code_status
             }
-        else:
-            stored_password = rows[0][0]
-            if stored_password != password:
-                return {
-                    "status": "error",
-                    "message": "Permission to access denied",
-                    "code": 403  # HTTP 403 Forbidden
-                }
-            else:
-                # Check and sync code
-                deploy_status, code_status = await check_and_sync_code(uid, code)
-                print(deploy_status, code_status)
-                if code_status == 403:
-                    return {
-                        "status": "error",
-                        "message": "Deployed code cannot be updated, please stop the execution first or clone the graph to a new UID",
-                        "code": 403
-                    }
-                if code_status != 200:
-                    return {
-                        "status": "error",
-                        "message": "Internal Server Error",
-                        "code": code_status
-                    }
-                return {
-                    "status": "success",
-                    "update": deploy_status
-                }
-
-    except sqlite3.Error as e:
         return {
-            "status": "error",
-            "message": f"Database error: {e}",
-            "code": 500
+            "status": "success",
+            "update": deploy_status,
+            "changes": changes,
+            "warnings": graph_ir.warnings
         }
 
     except Exception as e:
@@ -115,7 +88,3 @@ async def update_user(uid: str, password: str, code):
             "message": f"Internal Server Error: {e}",
             "code": 500
         }
-
-    finally:
-        if conn:
-            conn.close()
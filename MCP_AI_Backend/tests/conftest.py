@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from core_db import db_access
+from uid_management import uid_hasher
+from utils import log_segments
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # users.db, the owner digest key and user_assets are relative to the working directory, like in the server
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "core_db").mkdir()
+    (tmp_path / "user_assets").mkdir()
+    monkeypatch.setenv("OWNER_DIGEST_KEY", "test-owner-key")
+    monkeypatch.setattr(uid_hasher, "_owner_key", None)
+    db_access.close_db()
+    yield tmp_path
+    db_access.close_db()
+
+
+@pytest.fixture
+def small_segments(monkeypatch):
+    # Rotation after a few bytes and on every write, so a test log spans several segments
+    monkeypatch.setattr(log_segments, "SEGMENT_BYTES", 32)
+    monkeypatch.setattr(log_segments, "CHECK_SECONDS", 0)
+    monkeypatch.setattr(log_segments, "_checked", {})
@@ -0,0 +1,22 @@
+from utils.asset_files import clone_assets, shared_digest, write_assets, write_asset
+
+
+def test_clone_shares_digest_until_the_source_changes(workdir):
+    write_assets("uid0000001", {"main.py": "print(1)", "requirements.txt": "numpy", "data_log.txt": "log"})
+    assert sorted(clone_assets("uid0000001", "uid0000002")) == ["main.py", "requirements.txt"]
+    assert shared_digest("uid0000001") == shared_digest("uid0000002")
+
+    # Rewriting the same content links the same blob again
+    write_asset("uid0000001", "main.py", "print(1)")
+    assert shared_digest("uid0000001") == shared_digest("uid0000002")
+
+    write_asset("uid0000001", "main.py", "print(2)")
+    assert shared_digest("uid0000001") != shared_digest("uid0000002")
+
+
+def test_digest_ignores_runtime_output(workdir):
+    write_asset("uid0000001", "main.py", "print(1)")
+    before = shared_digest("uid0000001")
+    write_asset("uid0000001", "data_log.txt", "log")
+    assert shared_digest("uid0000001") == before
+    assert shared_digest("uid0000009") == shared_digest("uid0000008")
@@ -0,0 +1,66 @@
+import asyncio
+
+from core_db import db_access
+from uid_management import auth_service
+from uid_management.uid_hasher import hash_password, owner_digest
+
+
+def test_owner_digest_is_keyed(workdir, monkeypatch):
+    from uid_management import uid_hasher
+
+    digest = owner_digest("0xabc")
+    monkeypatch.setenv("OWNER_DIGEST_KEY", "another-key")
+    monkeypatch.setattr(uid_hasher, "_owner_key", None)
+    assert owner_digest("0xabc") != digest
+
+
+def test_register_authenticate_and_owner_batches(workdir):
+    async def scenario():
+        uids = await auth_service.register_users("0xabc", 3)
+        ok = await auth_service.authenticate(uids[0], "0xabc")
+        wrong = await auth_service.authenticate(uids[0], "0xdef")
+        owner = await auth_service.authenticate_owner("0xabc", uids)
+        stranger = await auth_service.authenticate_owner("0xdef", uids)
+        return ok, wrong, owner, stranger
+
+    ok, wrong, owner, stranger = asyncio.run(scenario())
+    assert ok["status"] == "success" and owner["status"] == "success"
+    assert wrong["code"] == 403 and stranger["code"] == 403
+
+
+def test_cached_login_sees_password_change_of_another_worker(workdir):
+    async def scenario():
+        uid = (await auth_service.register_users("0xabc", 1))[0]
+        first = await auth_service.authenticate(uid, "0xabc")
+        # Another process changes the password, only the shared stamp tells this one
+        await db_access.execute("UPDATE users SET password_hash = ? WHERE uid = ?", (hash_password("0xnew"), uid))
+        auth_service._bump_stamp()
+        return first, await auth_service.authenticate(uid, "0xabc")
+
+    first, second = asyncio.run(scenario())
+    assert first["status"] == "success"
+    assert second["code"] == 403
+
+
+def test_cached_login_skips_the_database(workdir, monkeypatch):
+    async def scenario():
+        uid = (await auth_service.register_users("0xabc", 1))[0]
+        await auth_service.authenticate(uid, "0xabc")
+
+        async def unavailable(*args):
+            raise AssertionError("cache hit queried the database")
+
+        monkeypatch.setattr(auth_service, "fetch_one", unavailable)
+        return await auth_service.authenticate(uid, "0xabc")
+
+    assert asyncio.run(scenario())["status"] == "success"
+
+
+def test_deleted_uid_is_not_served_from_the_cache(workdir):
+    async def scenario():
+        uid = (await auth_service.register_users("0xabc", 1))[0]
+        await auth_service.authenticate(uid, "0xabc")
+        await auth_service.tombstone_users([uid])
+        return await auth_service.authenticate(uid, "0xabc")
+
+    assert asyncio.run(scenario())["code"] == 400
@@ -0,0 +1,35 @@
+import asyncio
+import hashlib
+import os
+import shutil
+
+from server_integrity import delete_loc
+from utils.asset_files import blob_path, user_folder, write_assets
+
+
+def blob_of(content):
+    return blob_path(hashlib.sha256(content.encode("utf-8")).hexdigest())
+
+
+def test_sweep_removes_only_unlinked_blobs(workdir, monkeypatch):
+    monkeypatch.setattr(delete_loc, "_blobs_pending", False)
+    monkeypatch.setattr(delete_loc, "_blobs_swept_at", None)
+    write_assets("uid0000001", {"main.py": "shared", "requirements.txt": "only one"})
+    write_assets("uid0000002", {"main.py": "shared"})
+    shutil.rmtree(user_folder("uid0000001"))
+
+    assert asyncio.run(delete_loc.sweep_blobs()) == 1
+    assert not os.path.exists(blob_of("only one"))
+    assert os.path.exists(blob_of("shared"))
+
+
+def test_sweeps_are_throttled(monkeypatch):
+    monkeypatch.setattr(delete_loc, "_blobs_pending", True)
+    monkeypatch.setattr(delete_loc, "_blobs_swept_at", None)
+    assert delete_loc.blobs_due()
+    monkeypatch.setattr(delete_loc, "_blobs_swept_at", delete_loc.time.monotonic())
+    assert not delete_loc.blobs_due()
+    monkeypatch.setattr(delete_loc, "_blobs_swept_at", delete_loc.time.monotonic() - delete_loc.BLOB_COLLECT_SECONDS)
+    assert delete_loc.blobs_due()
+    monkeypatch.setattr(delete_loc, "_blobs_pending", False)
+    assert not delete_loc.blobs_due()
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from codegen_engine import candidate_selection
+from codegen_engine.candidate_selection import replay_score
+from codegen_engine.graph_codegen import ResponseFormat
+
+# Steadily rising prices: staying long beats staying flat
+CANDLES = [{"open": 1 + i / 100, "high": 1 + i / 100, "low": 1 + i / 100, "close": 1 + i / 100, "volume": 10} for i in range(200)]
+
+ALWAYS_BUY = "decision_to_buy_or_sell = 'buy'"
+ALWAYS_HOLD = "decision_to_buy_or_sell = 'hold'"
+
+
+def test_replay_scores_the_equity_multiple():
+    assert asyncio.run(replay_score([], ALWAYS_HOLD, CANDLES)) == 1.0
+    assert asyncio.run(replay_score([], ALWAYS_BUY, CANDLES)) > 1.0
+
+
+def test_replay_errors_and_hangs_are_contained(monkeypatch):
+    with pytest.raises(RuntimeError, match="ZeroDivisionError"):
+        asyncio.run(replay_score([], "x = 1 / 0\n" + ALWAYS_BUY, CANDLES))
+
+    monkeypatch.setattr(candidate_selection, "REPLAY_TIMEOUT", 0.5)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(replay_score(["import itertools"], "x = sum(itertools.count())\n" + ALWAYS_BUY, CANDLES))
+
+
+def test_best_valid_candidate_is_selected(monkeypatch):
+    responses = [
+        ResponseFormat(requirements=[], imports=[], code="decision_to_buy_or_sell = 'moon'"),
+        ResponseFormat(requirements=[], imports=[], code=ALWAYS_HOLD),
+        ResponseFormat(requirements=[], imports=[], code=ALWAYS_BUY),
+    ]
+
+    async def generate(json_data):
+        return responses.pop(0)
+
+    async def candles():
+        return CANDLES
+
+    monkeypatch.setattr(candidate_selection, "generate_code_response", generate)
+    monkeypatch.setattr(candidate_selection, "fetch_replay_candles", candles)
+    progress = []
+    requirements, imports, code = asyncio.run(candidate_selection.gen_best_code("graph", 3, progress.append))
+    assert code == ALWAYS_BUY
+    assert sum("rejected" in line for line in progress) == 1
+    assert sum("replay return" in line for line in progress) == 2
+
+
+def test_no_valid_candidate_is_an_error(monkeypatch):
+    async def generate(json_data):
+        return ResponseFormat(requirements=[], imports=[], code="decision_to_buy_or_sell = 'moon'")
+
+    async def candles():
+        return CANDLES
+
+    monkeypatch.setattr(candidate_selection, "generate_code_response", generate)
+    monkeypatch.setattr(candidate_selection, "fetch_replay_candles", candles)
+    with pytest.raises(ValueError, match="None of the 2 generated candidates"):
+        asyncio.run(candidate_selection.gen_best_code("graph", 2))
@@ -0,0 +1,71 @@
+import asyncio
+
+from codegen_engine import code_cache
+from codegen_engine.code_cache import build_strategy_code, discard_cached_code, load_cached_code
+from utils.graph_compiler import compile_graph_ir
+
+GRAPH = {
+    "nodes": [
+        {"id": "s", "type": "startNode", "data": {}},
+        {"id": "t", "type": "strategyNode", "data": {"strategyText": "buy when price is below 3.2 and sell when price is above 3.3"}},
+    ],
+    "edges": [{"source": "s", "target": "t"}],
+}
+
+
+def counting_generator(monkeypatch):
+    calls = []
+
+    async def generate(ir, on_progress=None, candidates=1):
+        calls.append(ir.fingerprint)
+        return {"requirements": [], "imports": [], "code": f"decision_to_buy_or_sell = {len(calls)}"}
+
+    monkeypatch.setattr(code_cache, "generate_graph_code", generate)
+    return calls
+
+
+def test_unchanged_graph_reuses_cached_code(workdir, monkeypatch):
+    calls = counting_generator(monkeypatch)
+    moved = {"nodes": [dict(node, position={"x": 5, "y": 5}) for node in GRAPH["nodes"]], "edges": GRAPH["edges"]}
+
+    async def scenario():
+        first = await build_strategy_code("uid0000001", compile_graph_ir(GRAPH))
+        # A layout-only edit has the same fingerprint
+        second = await build_strategy_code("uid0000001", compile_graph_ir(moved))
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == second == ([], [], "decision_to_buy_or_sell = 1")
+    assert len(calls) == 1
+
+
+def test_changed_graph_replaces_the_cache(workdir, monkeypatch):
+    calls = counting_generator(monkeypatch)
+    edited = {"nodes": [GRAPH["nodes"][0], {"id": "t", "type": "strategyNode", "data": {"strategyText": "rsi"}}], "edges": GRAPH["edges"]}
+
+    async def scenario():
+        await build_strategy_code("uid0000001", compile_graph_ir(GRAPH))
+        await build_strategy_code("uid0000001", compile_graph_ir(edited))
+        return await load_cached_code("uid0000001")
+
+    cached = asyncio.run(scenario())
+    assert len(calls) == 2
+    # Only the current graph is kept
+    assert list(cached) == [compile_graph_ir(edited).fingerprint]
+
+
+def test_failed_deploy_discards_the_cache(workdir, monkeypatch):
+    calls = counting_generator(monkeypatch)
+
+    async def scenario():
+        await build_strategy_code("uid0000001", compile_graph_ir(GRAPH))
+        await discard_cached_code("uid0000001")
+        return await build_strategy_code("uid0000001", compile_graph_ir(GRAPH))
+
+    assert asyncio.run(scenario())[2] == "decision_to_buy_or_sell = 2"
+    assert len(calls) == 2
+
+
+def test_template_graph_needs_no_llm(workdir):
+    entry = asyncio.run(code_cache.generate_graph_code(compile_graph_ir(GRAPH)))
+    assert "decision_to_buy_or_sell" in entry["code"]
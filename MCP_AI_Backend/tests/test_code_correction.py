@@ -0,0 +1,47 @@
+import pytest
+
+from codegen_engine.code_correction import validate_generated_code
+
+VALID = """price = data['candlesticks'][-1]['close']
+if price < 3.2:
+    decision_to_buy_or_sell = 'buy'
+else:
+    decision_to_buy_or_sell = 'hold'"""
+
+
+def test_valid_code_passes_unchanged():
+    result = validate_generated_code([], [], VALID)
+    assert result["status"] == "success"
+    assert result["code"] == VALID
+    assert result["repairs"] == []
+
+
+def test_safe_repairs():
+    code = "```python\nimport math\nprint(data)\ncloses = pd.Series([math.pi])\ndecision_to_buy_or_sell = 'hold'\n```"
+    result = validate_generated_code(["requests"], [], code)
+    assert result["status"] == "success"
+    assert result["imports"] == ["import math", "import pandas as pd"]
+    assert result["requirements"] == ["pandas"]
+    assert "print" not in result["code"] and "import" not in result["code"]
+    assert len(result["repairs"]) == 5
+
+
+@pytest.mark.parametrize("code, error", [
+    ("for c in data['candlesticks']:\n    pass\ndecision_to_buy_or_sell = 'buy'", "Loops are not allowed"),
+    ("data['candlesticks'].append(1)\ndecision_to_buy_or_sell = 'buy'", "`data` must not be modified via .append()"),
+    ("if data:\n    decision_to_buy_or_sell = 'buy'", "is not assigned on every code path"),
+    ("decision_to_buy_or_sell = 'moon'", "invalid value 'moon'"),
+    ("os.remove('x')\ndecision_to_buy_or_sell = 'buy'", "Use of 'os' is not allowed"),
+    ("decision_to_buy_or_sell = undefined_signal", "'undefined_signal' is used but never defined"),
+    ("decision_to_buy_or_sell = 'buy' if", "does not parse"),
+])
+def test_rule_violations_are_rejected(code, error):
+    result = validate_generated_code([], [], code)
+    assert result["status"] == "error"
+    assert any(error in message for message in result["errors"]), result["errors"]
+
+
+def test_modules_outside_the_allow_list_are_rejected():
+    result = validate_generated_code(["requests"], ["import subprocess"], "decision_to_buy_or_sell = 'hold'")
+    assert result["status"] == "error"
+    assert "Module 'subprocess' is not allowed" in result["errors"]
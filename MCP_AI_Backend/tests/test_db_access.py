@@ -0,0 +1,36 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from core_db import db_access
+from core_db.db_access import init_db, run_db, execute, fetch_one
+
+
+def test_fresh_database_reaches_latest_version(workdir):
+    assert asyncio.run(init_db()) == len(db_access.MIGRATIONS)
+    conn = sqlite3.connect(db_access.DB_PATH)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    conn.close()
+
+
+def test_failed_write_rolls_back(workdir):
+    def insert_then_fail(conn):
+        conn.execute("INSERT INTO tombstones (uid, deleted_at) VALUES ('a', 1)")
+        raise ValueError("boom")
+
+    async def scenario():
+        with pytest.raises(ValueError):
+            await run_db(insert_then_fail, write=True)
+        inserted = await execute("INSERT INTO tombstones (uid, deleted_at) VALUES ('b', 2)")
+        return inserted, await fetch_one("SELECT group_concat(uid) FROM tombstones")
+
+    assert asyncio.run(scenario()) == (1, ("b",))
+
+
+def test_concurrent_writes_are_serialised(workdir):
+    async def scenario():
+        await asyncio.gather(*(execute("INSERT INTO tombstones (uid, deleted_at) VALUES (?, ?)", (str(i), i)) for i in range(50)))
+        return await fetch_one("SELECT count(*) FROM tombstones")
+
+    assert asyncio.run(scenario()) == (50,)
@@ -0,0 +1,66 @@
+import asyncio
+import json
+import os
+import sqlite3
+
+from core_db import db_access
+from uid_management import auth_service
+from uid_management.uid_hasher import owner_digest
+from utils.asset_files import shard_folder, legacy_folder
+
+
+def write_sidecar(folder, name, content):
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, name), "w") as f:
+        json.dump(content, f)
+
+
+def legacy_database(users):
+    # A users.db at schema version 1, with plaintext passwords
+    conn = sqlite3.connect(db_access.DB_PATH, isolation_level=None)
+    migrations = db_access.MIGRATIONS
+    db_access.MIGRATIONS = migrations[:1]
+    try:
+        db_access.migrate(conn)
+    finally:
+        db_access.MIGRATIONS = migrations
+        # The pool migrates the rest on its first connection
+        db_access._schema_ready = False
+    conn.executemany("INSERT INTO users (uid, user_password) VALUES (?, ?)", users)
+    return conn
+
+
+def test_legacy_database_is_migrated(workdir):
+    write_sidecar(legacy_folder("flatUid001"), "data_config.json", {"nodes": [], "name": "flat"})
+    write_sidecar(shard_folder("shardUid01"), "code_sync.json", {"deploy_status": True, "graph_fingerprint": "f"})
+    os.makedirs("user_assets/.blobs/ab")
+    conn = legacy_database([("flatUid001", "0xabc"), ("shardUid01", "0xabc")])
+
+    assert db_access.migrate(conn) == len(db_access.MIGRATIONS)
+
+    # Sidecar files of both layouts are imported, .blobs and shard directories are not uids
+    states = dict(conn.execute("SELECT uid, deploy_status FROM user_state").fetchall())
+    assert states == {"flatUid001": 0, "shardUid01": 1}
+    assert json.loads(conn.execute("SELECT graph FROM user_state WHERE uid = 'flatUid001'").fetchone()[0])["name"] == "flat"
+
+    # No plaintext at rest, owner digests keyed with the server secret
+    rows = conn.execute("SELECT password_hash, owner_digest FROM users").fetchall()
+    assert all(password_hash.startswith("sha256$") for password_hash, _ in rows)
+    assert {digest for _, digest in rows} == {owner_digest("0xabc")}
+    assert "user_password" not in [column[1] for column in conn.execute("PRAGMA table_info(users)")]
+    conn.close()
+
+
+def test_migrated_password_is_upgraded_on_first_login(workdir):
+    legacy_database([("flatUid001", "0xabc")]).close()
+
+    async def login():
+        denied = await auth_service.authenticate("flatUid001", "0xdef")
+        allowed = await auth_service.authenticate("flatUid001", "0xabc")
+        stored = await db_access.fetch_one("SELECT password_hash FROM users WHERE uid = 'flatUid001'")
+        return denied, allowed, stored[0]
+
+    denied, allowed, stored = asyncio.run(login())
+    assert denied["code"] == 403
+    assert allowed["status"] == "success"
+    assert stored.startswith("pbkdf2_sha256$")
@@ -0,0 +1,62 @@
+from utils.decision_log import DecisionWriter, read_index, query_records, bucket_stats, BUCKET_SECONDS, RECORDS_FILE
+
+HOUR = 1_000 * BUCKET_SECONDS  # start of some hour
+
+
+def write_hours(writer, counts):
+    # counts[i] records in hour i, alternating buy/sell, every second one overridden by the risk filter
+    for hour, count in enumerate(counts):
+        for i in range(count):
+            writer.write(
+                ts=HOUR + hour * BUCKET_SECONDS + i, agent="buy" if i % 2 == 0 else "sell",
+                checked=True, override=i % 2 == 1, final="buy" if i % 2 == 0 else "hold",
+            )
+
+
+def test_closed_hours_are_indexed(tmp_path):
+    writer = DecisionWriter(str(tmp_path))
+    write_hours(writer, [3, 2, 4])
+
+    # The hour being written is not in the index yet
+    entries = read_index(str(tmp_path))
+    assert [entry["bucket"] for entry in entries] == [HOUR // BUCKET_SECONDS, HOUR // BUCKET_SECONDS + 1]
+    assert [entry["records"] for entry in entries] == [3, 2]
+    assert entries[0]["end"] == entries[1]["start"]
+
+
+def test_query_records_by_range_and_cursor(tmp_path):
+    write_hours(DecisionWriter(str(tmp_path)), [3, 2, 4])
+
+    records, cursor = query_records(str(tmp_path), since=HOUR + BUCKET_SECONDS, until=HOUR + 3 * BUCKET_SECONDS)
+    assert [r["ts"] for r in records] == [HOUR + BUCKET_SECONDS + i for i in range(2)] + [HOUR + 2 * BUCKET_SECONDS + i for i in range(4)]
+    assert cursor is None
+
+    page, cursor = query_records(str(tmp_path), limit=4)
+    rest, end = query_records(str(tmp_path), cursor=cursor, limit=100)
+    assert len(page) == 4 and len(rest) == 5 and end is None
+    assert page[-1]["ts"] < rest[0]["ts"]
+
+
+def test_bucket_stats(tmp_path):
+    write_hours(DecisionWriter(str(tmp_path)), [3, 2, 4])
+    hours, totals = bucket_stats(str(tmp_path), since=HOUR, until=HOUR + 2 * BUCKET_SECONDS)
+    assert [hour["hour"] for hour in hours] == [HOUR, HOUR + BUCKET_SECONDS]
+    assert hours[0]["agent"] == {"buy": 2, "sell": 1}
+    assert totals["records"] == 5 and totals["checked"] == 5 and totals["overridden"] == 2
+    assert totals["override_rate"] == 2 / 5
+    # The open hour is scanned, not indexed
+    assert bucket_stats(str(tmp_path))[1]["records"] == 9
+
+
+def test_restart_recovers_unindexed_hours_and_torn_lines(tmp_path):
+    writer = DecisionWriter(str(tmp_path))
+    write_hours(writer, [2, 3])
+    with open(tmp_path / RECORDS_FILE, "ab") as f:
+        f.write(b'{"ts": 1')  # killed mid-record
+
+    # A new writer closes the hours written since the last index entry and terminates the torn line
+    writer = DecisionWriter(str(tmp_path))
+    writer.write(ts=HOUR + 5 * BUCKET_SECONDS, agent="buy", final="buy")
+    assert [entry["records"] for entry in read_index(str(tmp_path))] == [2, 3]
+    records, _ = query_records(str(tmp_path))
+    assert len(records) == 6
@@ -0,0 +1,71 @@
+from utils.graph_compiler import compile_graph_ir
+
+
+def node(nid, ntype, **data):
+    return {"id": nid, "type": ntype, "data": data, "position": {"x": 0, "y": 0}}
+
+
+def edge(source, target):
+    return {"source": source, "target": target}
+
+
+def test_topological_order_keeps_original_order_for_ties():
+    ir = compile_graph_ir({
+        "nodes": [node("c", "x"), node("s", "startNode"), node("a", "x"), node("b", "x")],
+        "edges": [edge("s", "a"), edge("s", "b"), edge("a", "c"), edge("b", "c")],
+    })
+    assert ir.valid
+    assert ir.order == ["s", "a", "b", "c"]
+    assert ir.warnings == []
+
+
+def test_fingerprint_ignores_layout_fields():
+    graph = {"nodes": [node("s", "startNode"), node("a", "x", text="t")], "edges": [edge("s", "a")]}
+    moved = {"nodes": [dict(n, position={"x": 9, "y": 9}) for n in graph["nodes"]], "edges": graph["edges"]}
+    assert compile_graph_ir(graph).fingerprint == compile_graph_ir(moved).fingerprint
+    # Same fingerprint, same cached IR
+    assert compile_graph_ir(graph) is compile_graph_ir(moved)
+
+
+def test_structural_problems_are_errors():
+    ir = compile_graph_ir({
+        "nodes": [node("s", "startNode"), node("a", "x"), node("a", "x"), node("b", "x"), node("c", "x", parentId="nope")],
+        "edges": [edge("s", "a"), edge("a", "ghost"), edge("b", "c"), edge("c", "b")],
+    })
+    assert not ir.valid
+    assert any("Duplicate node id 'a'" in e for e in ir.errors)
+    assert any("unknown node(s): ghost" in e for e in ir.errors)
+    assert any("cycle" in e for e in ir.errors)
+    assert any("unresolved parentId 'nope'" in e for e in ir.errors)
+    assert any("not reachable" in w for w in ir.warnings)
+
+
+def test_malformed_input_is_reported_not_raised():
+    assert not compile_graph_ir([]).valid
+    ir = compile_graph_ir({
+        "nodes": [{"id": 1, "type": "x"}, node("a", "x"), {"id": "b", "type": "x", "data": "text"}],
+        "edges": [{"source": "a"}],
+    })
+    assert ir.errors[:3] == [
+        "Node #0 must have a string id and type",
+        "Node 'b' data must be an object",
+        "Edge #0 must have a source and target",
+    ]
+
+
+def test_non_string_data_fields_are_errors():
+    for value in (["a"], {"id": "a"}, 3):
+        ir = compile_graph_ir({"nodes": [node("a", "x"), node("b", "x", parentId=value)], "edges": []})
+        assert ir.errors == ["Node 'b' data field(s) must be strings: parentId"]
+    ir = compile_graph_ir({"nodes": [node("t", "strategyNode", strategyText={"buy": 1})], "edges": []})
+    assert ir.errors == ["Node 't' data field(s) must be strings: strategyText"]
+
+
+def test_cached_ir_does_not_alias_the_callers_data():
+    graph = {"nodes": [node("s", "startNode"), node("t", "strategyNode", strategyText="rsi", params={"period": 14})], "edges": [edge("s", "t")]}
+    ir = compile_graph_ir(graph)
+    graph["nodes"][1]["data"]["params"]["period"] = 7
+    graph["nodes"][1]["data"]["strategyText"] = "edited"
+    assert ir.nodes["t"].data == {"strategyText": "rsi", "params": {"period": 14}}
+    fresh = {"nodes": [node("s", "startNode"), node("t", "strategyNode", strategyText="rsi", params={"period": 14})], "edges": [edge("s", "t")]}
+    assert compile_graph_ir(fresh) is ir
@@ -0,0 +1,48 @@
+from utils.json_to_map import map_json
+
+DESCRIPTION = "Shows when to purchase and sell, cannot do transactions"
+
+
+def node(nid, ntype, **data):
+    return {"id": nid, "type": ntype, "data": data, "position": {"x": 1, "y": 2}}
+
+
+def test_compact_prompt():
+    graph = {
+        "nodes": [
+            node("strategyNode-001", "strategyNode", strategyText="buy  when\nprice is 3.2", label="Strategy"),
+            node("agentNode-001", "agentNode", name="Agent", description=DESCRIPTION, selected=True),
+            node("modelNode-001", "modelNode", model="gpt4", parentId="agentNode-001"),
+            node("agentNode-002", "agentNode", description=DESCRIPTION),
+            node("startNode-001", "startNode"),
+        ],
+        "edges": [
+            {"source": "startNode-001", "target": "agentNode-001"},
+            {"source": "startNode-001", "target": "strategyNode-001"},
+            {"source": "agentNode-001", "target": "modelNode-001"},
+            {"source": "agentNode-001", "target": "agentNode-002"},
+        ],
+    }
+    assert map_json(graph) == (
+        "### Node Descriptions:\n"
+        "- N1 Start\n"
+        "- N2 Strategy | strategyText: buy when price is 3.2\n"
+        "- N3 Agent | description: " + DESCRIPTION + " | name: Agent\n"
+        "- N4 Model | model: gpt4 | parent: N3\n"
+        "- N5 Agent | description: (same as N3.description)\n"
+        "\n### Graph Connections:\n"
+        "- N1 ➝ N2\n"
+        "- N1 ➝ N3\n"
+        "- N3 ➝ N4\n"
+        "- N3 ➝ N5"
+    )
+
+
+def test_layout_only_changes_keep_the_prompt():
+    graph = {"nodes": [node("s", "startNode"), node("t", "strategyNode", strategyText="rsi")], "edges": [{"source": "s", "target": "t"}]}
+    moved = {"nodes": [dict(n, position={"x": 50, "y": 60}, data=dict(n["data"], dragging=True)) for n in graph["nodes"]], "edges": graph["edges"]}
+    assert map_json(moved) == map_json(graph)
+
+
+def test_invalid_graph():
+    assert map_json({"nodes": "nope"}) == "Invalid graph structure"
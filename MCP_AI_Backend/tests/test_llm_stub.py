@@ -0,0 +1,59 @@
+import asyncio
+import json
+import os
+
+import httpx
+import pytest
+from groq import AsyncGroq
+
+from codegen_engine import llm_client
+from codegen_engine.graph_codegen import generate_code_response, get_prompt
+from codegen_engine.llm_stub_server import create_stub_app, prompt_key, DEFAULT_RESPONSE
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    # The shared client talks to an in-process stub app, no socket and no network
+    def use(**options):
+        app = create_stub_app(**options)
+        transport = httpx.ASGITransport(app=app)
+        client = AsyncGroq(api_key="offline", base_url="http://stub", http_client=httpx.AsyncClient(transport=transport))
+        monkeypatch.setattr(llm_client, "_client", client)
+        monkeypatch.setattr(llm_client, "_semaphore", None)
+        return app
+
+    return use
+
+
+def test_codegen_against_the_default_response(stub):
+    app = stub()
+    result = asyncio.run(generate_code_response("A1 Start ➝ B1 Strategy"))
+    assert result.model_dump() == DEFAULT_RESPONSE
+    assert app.state.stats == {"requests": 1, "replayed": 0, "recorded": 0, "default": 1}
+
+
+def test_recorded_response_is_replayed(stub, tmp_path):
+    recorded = {"requirements": [], "imports": [], "code": 'decision_to_buy_or_sell = "hold"'}
+    with open(os.path.join(tmp_path, f"{prompt_key(get_prompt('graph'))}.json"), "w", encoding="utf-8") as f:
+        json.dump({"content": json.dumps(recorded), "usage": None}, f)
+
+    app = stub(recordings_dir=str(tmp_path))
+    assert asyncio.run(generate_code_response("graph")).model_dump() == recorded
+    assert app.state.stats["replayed"] == 1
+
+
+def test_slow_llm_times_out(stub, monkeypatch):
+    stub(latency=1.0)
+    monkeypatch.setattr(llm_client, "CODEGEN_TIMEOUT", 0.1)
+    with pytest.raises(TimeoutError):
+        asyncio.run(generate_code_response("graph"))
+
+
+def test_multi_line_code_from_the_stream(stub, tmp_path):
+    content = '{"requirements": [], "imports": [], "code": "x = 1\nif x:\n    decision_to_buy_or_sell = \\"buy\\""}'
+    with open(os.path.join(tmp_path, f"{prompt_key(get_prompt('graph'))}.json"), "w", encoding="utf-8") as f:
+        json.dump({"content": content, "usage": None}, f)
+
+    stub(recordings_dir=str(tmp_path))
+    code = asyncio.run(generate_code_response("graph")).code
+    assert code.splitlines() == ["x = 1", "if x:", '    decision_to_buy_or_sell = "buy"']
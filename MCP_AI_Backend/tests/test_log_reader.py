@@ -0,0 +1,43 @@
+from utils.log_reader import read_range, read_tail
+
+
+def write(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def test_read_range_pages_end_on_line_boundaries(tmp_path):
+    path = str(tmp_path / "data_log.txt")
+    write(path, "alpha\nbeta\ngam")
+    text, start, next_cursor, size = read_range(path, 0, 8)
+    assert (text, start, next_cursor, size) == ("alpha\n", 0, 6, 14)
+    # The unfinished last line waits for the next poll
+    assert read_range(path, 6, 1024)[0] == "beta\n"
+    assert read_range(path, 11, 1024)[:3] == ("", 11, 11)
+
+
+def test_line_longer_than_limit_comes_in_pieces(tmp_path):
+    path = str(tmp_path / "data_log.txt")
+    write(path, "x" * 10 + "\n")
+    assert read_range(path, 0, 4)[:3] == ("xxxx", 0, 4)
+
+
+def test_cursor_past_end_restarts_at_active_file(tmp_path):
+    path = str(tmp_path / "data_log.txt")
+    write(path, "new run\n")
+    text, start, next_cursor, _ = read_range(path, 500, 1024)
+    assert (text, start, next_cursor) == ("new run\n", 0, 8)
+
+
+def test_missing_log_reads_empty(tmp_path):
+    path = str(tmp_path / "data_log.txt")
+    assert read_range(path, 0, 1024) == ("", 0, 0, 0)
+    assert read_tail(path, 10, 1024) == ("", 0, 0, 0)
+
+
+def test_tail_respects_line_count_and_byte_limit(tmp_path):
+    path = str(tmp_path / "data_log.txt")
+    write(path, "".join(f"{i}\n" for i in range(10)) + "partial")
+    text, start, next_cursor, size = read_tail(path, 2, 1024)
+    assert (text, start, next_cursor, size) == ("8\n9\n", 16, 20, 27)
+    assert read_tail(path, 100, 6)[0] == "7\n8\n9\n"
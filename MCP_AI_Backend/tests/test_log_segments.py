@@ -0,0 +1,67 @@
+import os
+
+from utils import log_segments
+from utils.log_reader import read_range, read_tail
+from utils.log_segments import rotate_log, segment_files, iter_lines, logical_size
+
+
+def append(path, *lines):
+    for line in lines:
+        rotate_log(path)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def read_all(path, limit=1024):
+    cursor, text = 0, ""
+    while True:
+        chunk, _, next_cursor, _ = read_range(path, cursor, limit)
+        if next_cursor == cursor:
+            return text
+        text += chunk
+        cursor = next_cursor
+
+
+def test_rotation_keeps_logical_offsets(tmp_path, small_segments):
+    path = str(tmp_path / "data_log.txt")
+    lines = [f"line {i:02d} " + "x" * 10 for i in range(8)]
+    append(path, *lines)
+
+    segments = segment_files(path)
+    assert len(segments) > 2
+    assert all(segment.endswith(".gz") for _, _, segment in segments)
+    # Segments are contiguous and the active file continues after the newest one
+    assert all(a[1] == b[0] for a, b in zip(segments, segments[1:]))
+    assert logical_size(path) == sum(len(line) + 1 for line in lines)
+    assert [line.decode().rstrip("\n") for _, line in iter_lines(path)] == lines
+    assert read_all(path) == "".join(line + "\n" for line in lines)
+
+
+def test_tail_reaches_into_rotated_segments(tmp_path, small_segments):
+    path = str(tmp_path / "data_log.txt")
+    lines = [f"entry {i:02d} " + "y" * 12 for i in range(6)]
+    append(path, *lines)
+    rotate_log(path, force=True)
+    # Every line now lives in a segment, the active file starts over
+    assert not os.path.exists(path)
+
+    text, start, next_cursor, size = read_tail(path, 3, 4096)
+    assert text == "".join(line + "\n" for line in lines[-3:])
+    assert next_cursor == size == logical_size(path)
+    assert start == next_cursor - len(text)
+    # Polling on from the tail cursor sees only new lines
+    append(path, "after")
+    assert read_range(path, next_cursor, 1024)[0] == "after\n"
+
+
+def test_retention_drops_oldest_segments(tmp_path, small_segments, monkeypatch):
+    monkeypatch.setattr(log_segments, "KEEP_SEGMENTS", 2)
+    path = str(tmp_path / "data_log.txt")
+    append(path, *[f"record {i:02d} " + "z" * 20 for i in range(8)])
+    rotate_log(path, force=True)
+
+    segments = segment_files(path)
+    assert len(segments) == 2
+    # A cursor into removed data continues at the oldest data left
+    text, start, _, _ = read_range(path, 0, 4096)
+    assert start == segments[0][0] and text.startswith("record")
@@ -0,0 +1,26 @@
+import asyncio
+import os
+
+from utils import log_watch
+from utils.asset_files import asset_path, user_folder
+
+
+def test_feed_waits_for_the_uid_folder_without_creating_it(workdir, monkeypatch):
+    monkeypatch.setattr(log_watch, "FOLDER_RECHECK_MS", 200)
+    path = asset_path("uid0000001", "data_log.txt")
+
+    async def scenario():
+        async with log_watch.subscribe(path) as queue:
+            await asyncio.sleep(0.3)
+            created_by_watch = os.path.isdir(user_folder("uid0000001"))
+            # The first deployment creates the folder and starts writing the log
+            os.makedirs(user_folder("uid0000001"))
+            with open(path, "a") as f:
+                f.write("started\n")
+            chunk = await asyncio.wait_for(queue.get(), 5)
+        return created_by_watch, chunk
+
+    created_by_watch, chunk = asyncio.run(scenario())
+    assert not created_by_watch
+    assert chunk == (0, 8, "started\n", False)
+    assert log_watch._feeds == {}
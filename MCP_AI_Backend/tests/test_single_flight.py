@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from codegen_engine.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    async def work(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return value * 2
+
+    async def scenario():
+        results = await asyncio.gather(*[flight.do("graph", work, 21) for _ in range(5)])
+        return results, flight.in_flight("graph")
+
+    results, still_running = asyncio.run(scenario())
+    assert calls == [21]
+    assert [result for result, _ in results] == [42] * 5
+    assert [shared for _, shared in results] == [False, True, True, True, True]
+    assert not still_running
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    flight = SingleFlight()
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream down")
+
+    async def scenario():
+        results = await asyncio.gather(*[flight.do("graph", failing) for _ in range(3)], return_exceptions=True)
+        # A later call runs again instead of replaying the failure
+        with pytest.raises(ValueError):
+            await flight.do("graph", failing)
+        return results
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert len(calls) == 2
+
+
+def test_work_survives_until_the_last_waiter_leaves():
+    flight = SingleFlight()
+    finished = []
+
+    async def work():
+        await asyncio.sleep(0.05)
+        finished.append(1)
+        return "code"
+
+    async def scenario():
+        first = asyncio.ensure_future(flight.do("graph", work))
+        second = asyncio.ensure_future(flight.do("graph", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        result = await second
+        # With every waiter gone the work itself is cancelled
+        third = asyncio.ensure_future(flight.do("other", work))
+        await asyncio.sleep(0.01)
+        third.cancel()
+        await asyncio.sleep(0.06)
+        return first.cancelled(), result
+
+    cancelled, result = asyncio.run(scenario())
+    assert cancelled and result == ("code", True)
+    assert finished == [1]
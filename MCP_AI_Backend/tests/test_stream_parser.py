@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from codegen_engine.stream_parser import ResponseStreamParser, MalformedStreamError
+
+# Literal newlines and indentation inside "code", as the prompt asks for
+COMPLETION = """```json
+{
+    "requirements": ["numpy"],
+    "imports": ["import numpy as np"],
+    "code": "closes = np.array([c['close'] for c in data['candlesticks']])
+if closes[-1] > closes[-20:].mean():
+\tdecision_to_buy_or_sell = \\"buy\\"
+else:
+    decision_to_buy_or_sell = \\"hold\\""
+}
+```"""
+
+
+def feed_in_chunks(text, size):
+    parser = ResponseStreamParser()
+    completed = []
+    for i in range(0, len(text), size):
+        completed += parser.feed(text[i:i + size])
+    return parser, completed
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 64])
+def test_multi_line_code_value_parses(size):
+    parser, completed = feed_in_chunks(COMPLETION, size)
+    assert parser.complete
+    assert completed == ["requirements", "imports", "code"]
+    code = json.loads(parser.text(), strict=False)["code"]
+    assert code.splitlines()[1] == "if closes[-1] > closes[-20:].mean():"
+    assert code.splitlines()[2] == '\tdecision_to_buy_or_sell = "buy"'
+
+
+def test_unexpected_field_fails_early():
+    parser = ResponseStreamParser()
+    with pytest.raises(MalformedStreamError):
+        parser.feed('{"requirements": [], "explanation')
+    assert len(parser.buffer) < 40
+
+
+def test_wrong_value_type_fails():
+    with pytest.raises(MalformedStreamError):
+        feed_in_chunks('{"code": ["x"]}', 4)
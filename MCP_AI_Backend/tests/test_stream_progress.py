@@ -0,0 +1,25 @@
+import asyncio
+
+from main import stream_progress
+
+
+def test_disconnect_cancels_the_task_and_the_pending_read():
+    async def scenario():
+        progress = asyncio.Queue()
+        task = asyncio.create_task(asyncio.sleep(60))
+        progress.put_nowait("[GRAPH SYNC] first line\n")
+        stream = stream_progress(task, progress)
+        first = await stream.__anext__()
+        # The next read is pending on the empty queue when the client goes away
+        reader = asyncio.create_task(stream.__anext__())
+        await asyncio.sleep(0.01)
+        reader.cancel()
+        await asyncio.gather(reader, return_exceptions=True)
+        await asyncio.sleep(0)
+        others = [t for t in asyncio.all_tasks() if t is not asyncio.current_task() and not t.done()]
+        return first, task.cancelled(), others
+
+    first, cancelled, others = asyncio.run(scenario())
+    assert first == "[GRAPH SYNC] first line\n"
+    assert cancelled
+    assert others == []
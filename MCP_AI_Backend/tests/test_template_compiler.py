@@ -0,0 +1,47 @@
+from codegen_engine.template_compiler import compile_graph
+
+
+def node(nid, ntype, **data):
+    return {"id": nid, "type": ntype, "data": data, "position": {"x": 0, "y": 0}}
+
+
+def edge(source, target):
+    return {"source": source, "target": target}
+
+
+def editor_graph(*extra):
+    # Shaped like the graphs the editor sends: start, an agent with its model and outputs, one strategy
+    nodes = [
+        node("startNode-001", "startNode"),
+        node("agentNode-001", "agentNode", name="Sample trading agent 1", description="Shows when to purchase and sell"),
+        node("strategyNode-001", "strategyNode", strategyText="purchase when price of 1 sui is 3.2 and send when it is 3.3"),
+        node("modelNode-001", "modelNode", model="gpt4", parentId="agentNode-001"),
+        node("notificationNode-001", "notificationNode", message="Enter notification message"),
+        node("telegramNode-001", "telegramNode", chatId="12345", botToken="token"),
+        node("toolNode-001", "toolNode", label="Tool"),
+        *extra,
+    ]
+    edges = [
+        edge("startNode-001", "agentNode-001"),
+        edge("startNode-001", "strategyNode-001"),
+        edge("agentNode-001", "modelNode-001"),
+        edge("agentNode-001", "notificationNode-001"),
+        edge("agentNode-001", "telegramNode-001"),
+        edge("agentNode-001", "toolNode-001"),
+    ]
+    return {"nodes": nodes, "edges": edges}
+
+
+def test_editor_graph_uses_the_template():
+    compiled = compile_graph(editor_graph())
+    assert compiled is not None
+    family, requirements, imports, code = compiled
+    assert family == "price"
+    assert "price <= 3.2" in code and "price >= 3.3" in code
+
+
+def test_nodes_that_shape_the_code_still_go_to_the_llm():
+    memory = node("memoryNode-001", "memoryNode", memoryType="postgres", parentId="agentNode-001")
+    assert compile_graph(editor_graph(memory)) is None
+    risk = node("riskNode-001", "riskNode", maxLoss="5%")
+    assert compile_graph(editor_graph(risk)) is None
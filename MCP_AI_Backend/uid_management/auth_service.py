@@ -0,0 +1,255 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import sqlite3
+import sys
+import time
+from collections import OrderedDict
+from fastapi import Request
+
+sys.path.append('..')
+from core_db.db_access import fetch_one, execute, run_db
+from uid_management.uid_hasher import owner_digest, hash_password, verify_password, needs_rehash
+from uid_management.uid_generator import get_uids
+from core_db.state_store import encode_state
+
+AUTH_CACHE_SIZE = 4096
+AUTH_CACHE_TTL = 300  # seconds a verified (uid, credential) pair skips PBKDF2 and the database
+# Replaced by every password change and delete, so other workers drop their cached verifications
+CREDENTIALS_STAMP_FILE = "./core_db/credentials.stamp"
+
+# Per process key: cache entries are useless outside this process and never hold a password
+_cache_key = os.urandom(32)
+_verified = OrderedDict()   # (uid, credential digest) -> expiry
+_digests_by_uid = {}        # uid -> credential digests in the cache, for invalidation
+_stamp = None               # identity of the credentials stamp the cache was filled under
+
+
+def credential_digest(uid, password):
+    return hmac.new(_cache_key, f"{uid}\0{password}".encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def _forget(key):
+    _verified.pop(key, None)
+    digests = _digests_by_uid.get(key[0])
+    if digests is not None:
+        digests.discard(key[1])
+        if not digests:
+            del _digests_by_uid[key[0]]
+
+
+def _read_stamp():
+    try:
+        stat = os.stat(CREDENTIALS_STAMP_FILE)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def _sync_stamp():
+    # One stat per request instead of a query: a changed stamp means some worker changed or deleted credentials
+    global _stamp
+    stamp = _read_stamp()
+    if stamp != _stamp:
+        _verified.clear()
+        _digests_by_uid.clear()
+        _stamp = stamp
+    return stamp
+
+
+def _bump_stamp():
+    # os.replace links a new inode, so the change shows even within the mtime resolution
+    tmp = f"{CREDENTIALS_STAMP_FILE}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(os.urandom(8).hex())
+    os.replace(tmp, CREDENTIALS_STAMP_FILE)
+
+
+def _is_verified(key):
+    expiry = _verified.get(key)
+    if expiry is None:
+        return False
+    if expiry < time.monotonic():
+        _forget(key)
+        return False
+    _verified.move_to_end(key)
+    return True
+
+
+def _remember(key):
+    _verified[key] = time.monotonic() + AUTH_CACHE_TTL
+    _verified.move_to_end(key)
+    _digests_by_uid.setdefault(key[0], set()).add(key[1])
+    while len(_verified) > AUTH_CACHE_SIZE:
+        _forget(next(iter(_verified)))
+
+
+def invalidate(*uids):
+    """Drop every cached verification of the uids in this process and make the other workers drop theirs."""
+    for uid in uids:
+        for digest in list(_digests_by_uid.get(uid, ())):
+            _forget((uid, digest))
+    _bump_stamp()
+
+
+async def authenticate(uid, password):
+    """Status dict for a (uid, password) pair, no database access once the pair has been verified."""
+    if not isinstance(uid, str) or not isinstance(password, str) or not uid or not password:
+        return {"status": "error", "message": "UID and password are required", "code": 400}
+
+    stamp = _sync_stamp()
+    key = (uid, credential_digest(uid, password))
+    if _is_verified(key):
+        return {"status": "success", "uid": uid}
+
+    try:
+        row = await fetch_one("SELECT password_hash FROM users WHERE uid = ?", (uid,))
+    except sqlite3.Error as e:
+        return {"status": "error", "message": f"Database error: {e}", "code": 500}
+    if row is None:
+        return {"status": "error", "message": "UID doesn't exist, bad request", "code": 400}
+
+    # PBKDF2 is deliberately slow, keep it off the event loop
+    if not await asyncio.to_thread(verify_password, password, row[0]):
+        return {"status": "error", "message": "Permission to access denied", "code": 403}
+
+    password_hash = row[0]
+    if needs_rehash(password_hash):
+        # Passwords migrated from plaintext carry an interim hash until their first login
+        upgraded = await asyncio.to_thread(hash_password, password)
+        try:
+            await execute(
+                "UPDATE users SET password_hash = ? WHERE uid = ? AND password_hash = ?", (upgraded, uid, password_hash),
+            )
+        except sqlite3.Error as e:
+            print(f"[AUTH] Unable to upgrade the password hash of {uid}: {e}")
+
+    # A change committed while this request verified the old row must not be cached
+    if _sync_stamp() == stamp:
+        _remember(key)
+    return {"status": "success", "uid": uid}
+
+
+async def register_users(password, count, initial_state=None):
+    """
+    Create count users sharing one password in a single write transaction.
+
+    Candidate UIDs are checked against the table inside the transaction (no
+    other writer can claim one meanwhile) and the PBKDF2 hash is computed once
+    for the whole batch, so a batch costs one hash and one commit. Every new
+    uid also gets its user_state row, with the columns in initial_state.
+    """
+    password_hash = await asyncio.to_thread(hash_password, password)
+    digest = owner_digest(password)
+    state = encode_state(initial_state or {})
+    state_columns = ["uid", "updated_at"] + list(state)
+    state_sql = f"INSERT INTO user_state ({', '.join(state_columns)}) VALUES ({', '.join('?' * len(state_columns))})"
+
+    def insert(conn):
+        uids = []
+        while len(uids) < count:
+            candidates = get_uids(count - len(uids), exclude=uids)
+            # A tombstoned uid stays reserved until the reaper has removed its folder
+            taken = {row[0] for row in conn.execute(
+                "SELECT uid FROM users WHERE uid IN (SELECT value FROM json_each(?1)) "
+                "UNION SELECT uid FROM tombstones WHERE uid IN (SELECT value FROM json_each(?1))",
+                (json.dumps(candidates),),
+            )}
+            uids += [uid for uid in candidates if uid not in taken]
+        conn.executemany(
+            "INSERT INTO users (uid, password_hash, owner_digest) VALUES (?, ?, ?)",
+            [(uid, password_hash, digest) for uid in uids],
+        )
+        now = time.time()
+        conn.executemany(state_sql, [(uid, now, *state.values()) for uid in uids])
+        return uids
+
+    # Not added to the verification cache, a large batch would evict every active session
+    return await run_db(insert, write=True)
+
+
+async def change_password(uid, new_password):
+    password_hash = await asyncio.to_thread(hash_password, new_password)
+    updated = await execute(
+        "UPDATE users SET password_hash = ?, owner_digest = ? WHERE uid = ?",
+        (password_hash, owner_digest(new_password), uid),
+    )
+    invalidate(uid)
+    return updated > 0
+
+
+async def tombstone_users(uids, owner_password=None):
+    """
+    Delete users in one transaction, leaving a tombstone for the asset reaper.
+
+    Deployed uids are skipped, and with owner_password only uids created with
+    that password are touched. Returns (deleted, deployed, not_found).
+    """
+    uids = list(dict.fromkeys(uids))
+    digest = None if owner_password is None else owner_digest(owner_password)
+
+    def delete(conn):
+        params = (json.dumps(uids), digest)
+        rows = conn.execute(
+            "SELECT u.uid, COALESCE(s.deploy_status, 0) FROM users u LEFT JOIN user_state s ON s.uid = u.uid "
+            "WHERE u.uid IN (SELECT value FROM json_each(?1)) AND (?2 IS NULL OR u.owner_digest = ?2)",
+            params,
+        ).fetchall()
+        deleted = [uid for uid, deployed in rows if not deployed]
+        batch = (json.dumps(deleted),)
+        conn.execute("DELETE FROM pid_data WHERE uid IN (SELECT value FROM json_each(?))", batch)
+        conn.execute("DELETE FROM user_state WHERE uid IN (SELECT value FROM json_each(?))", batch)
+        conn.execute("DELETE FROM users WHERE uid IN (SELECT value FROM json_each(?))", batch)
+        now = time.time()
+        conn.executemany("INSERT OR REPLACE INTO tombstones (uid, deleted_at) VALUES (?, ?)", [(uid, now) for uid in deleted])
+        return deleted, [uid for uid, deployed in rows if deployed]
+
+    deleted, deployed = await run_db(delete, write=True)
+    if deleted:
+        invalidate(*deleted)
+    found = set(deleted) | set(deployed)
+    return deleted, deployed, [uid for uid in uids if uid not in found]
+
+
+async def authenticate_owner(password, uids):
+    """
+    Status dict for batch operations on uids created with one password.
+
+    The password is verified once, against the first listed uid it owns; the
+    other uids are matched by owner digest in the same query as the batch.
+    """
+    if not isinstance(password, str) or not password:
+        return {"status": "error", "message": "Password is required", "code": 400}
+    try:
+        row = await fetch_one(
+            "SELECT uid FROM users WHERE owner_digest = ? AND uid IN (SELECT value FROM json_each(?)) LIMIT 1",
+            (owner_digest(password), json.dumps(list(uids))),
+        )
+    except sqlite3.Error as e:
+        return {"status": "error", "message": f"Database error: {e}", "code": 500}
+    if row is None:
+        return {"status": "error", "message": "Permission to access denied", "code": 403}
+    return await authenticate(row[0], password)
+
+
+def require_auth(uid_field="uid", password_field="password", query=False):
+    """
+    FastAPI dependency verifying the credentials in the JSON body (or, with query, the query string).
+
+    Returns the authenticate() status dict; endpoints return it unchanged when
+    the status is not "success", like every other handler error.
+    """
+    async def dependency(request: Request):
+        if query:
+            return await authenticate(request.query_params.get(uid_field), request.query_params.get(password_field))
+        try:
+            body = await request.json()
+        except ValueError:
+            return {"status": "error", "message": "Request body must be JSON", "code": 400}
+        if not isinstance(body, dict):
+            return {"status": "error", "message": "Request body must be a JSON object", "code": 400}
+        return await authenticate(body.get(uid_field), body.get(password_field))
+
+    return dependency
@@ -1,7 +1,19 @@
-import random
+import secrets
 import string
 
+# Base62 characters: uppercase letters, lowercase letters, and digits
+BASE62_CHARS = string.ascii_uppercase + string.ascii_lowercase + string.digits
+
 def get_uid(length=10):
-    # Base62 characters: uppercase letters, lowercase letters, and digits
-    base62_chars = string.ascii_uppercase + string.ascii_lowercase + string.digits
-    return ''.join(random.choice(base62_chars) for _ in range(length))
\ No newline at end of file
+    # secrets draws from the OS CSPRNG, UIDs are not guessable from earlier ones
+    return ''.join(secrets.choice(BASE62_CHARS) for _ in range(length))
+
+def get_uids(count, length=10, exclude=()):
+    """count distinct UIDs, none of them in exclude."""
+    exclude = set(exclude)
+    uids = set()
+    while len(uids) < count:
+        uid = get_uid(length)
+        if uid not in exclude:
+            uids.add(uid)
+    return list(uids)
@@ -1,4 +1,87 @@
 import hashlib
+import hmac
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PBKDF2_ITERATIONS = 100_000
+# Server side secret of the owner digests; without OWNER_DIGEST_KEY a random key is kept next to users.db.
+# Changing or losing the key orphans every owner digest, batch operations would no longer find their uids.
+OWNER_DIGEST_KEY_FILE = "./core_db/owner_digest.key"
+
+_owner_key = None
 
 def hash_data(data):
-    return hashlib.sha256(data.encode('utf-8')).hexdigest()
\ No newline at end of file
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+def _create_key_file():
+    # Written aside and linked into place, a worker that loses the race reads the complete key of the winner
+    key = os.urandom(32).hex()
+    tmp = f"{OWNER_DIGEST_KEY_FILE}.{os.getpid()}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(key)
+            f.flush()
+            os.fsync(f.fileno())
+        os.link(tmp, OWNER_DIGEST_KEY_FILE)
+    except FileExistsError:
+        with open(OWNER_DIGEST_KEY_FILE, "r") as f:
+            key = f.read().strip()
+    finally:
+        os.unlink(tmp)
+    return key
+
+def _get_owner_key():
+    global _owner_key
+    if _owner_key is None:
+        key = os.getenv("OWNER_DIGEST_KEY")
+        if not key:
+            try:
+                with open(OWNER_DIGEST_KEY_FILE, "r") as f:
+                    key = f.read().strip()
+            except FileNotFoundError:
+                key = _create_key_file()
+        _owner_key = key.encode('utf-8')
+    return _owner_key
+
+def rekey_digest(sha256_digest):
+    # HMAC over the plain sha256, so digests stored before the key existed can be converted without the password
+    return hmac.new(_get_owner_key(), sha256_digest.encode('utf-8'), hashlib.sha256).hexdigest()
+
+def owner_digest(password):
+    """Keyed digest finding the uids created with a password, useless without the server side key."""
+    return rekey_digest(hash_data(password))
+
+def hash_password(password, salt=None, iterations=PBKDF2_ITERATIONS):
+    # Self describing "pbkdf2_sha256$iterations$salt$hash" so the cost can be raised later
+    salt = salt or os.urandom(16).hex()
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), bytes.fromhex(salt), iterations).hex()
+    return f"pbkdf2_sha256${iterations}${salt}${digest}"
+
+def hash_password_interim(password, salt=None):
+    # One salted sha256 round for bulk migrations, replaced by hash_password on the next login
+    salt = salt or os.urandom(16).hex()
+    digest = hashlib.sha256(bytes.fromhex(salt) + password.encode('utf-8')).hexdigest()
+    return f"sha256$1${salt}${digest}"
+
+def needs_rehash(stored):
+    try:
+        scheme, iterations, _, _ = stored.split('$')
+        return scheme != "pbkdf2_sha256" or int(iterations) < PBKDF2_ITERATIONS
+    except (AttributeError, ValueError):
+        return True
+
+def verify_password(password, stored):
+    try:
+        scheme, iterations, salt, digest = stored.split('$')
+    except (AttributeError, ValueError):
+        return False
+    if scheme == "sha256":
+        candidate = hashlib.sha256(bytes.fromhex(salt) + password.encode('utf-8')).hexdigest()
+    elif scheme == "pbkdf2_sha256":
+        candidate = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), bytes.fromhex(salt), int(iterations)).hex()
+    else:
+        return False
+    return hmac.compare_digest(candidate, digest)
@@ -1,19 +1,23 @@
+import sys
 import os
 import subprocess
 import json
 import time
 from pathlib import Path
 
+sys.path.append('..')
+from utils.asset_files import asset_path
+
 def exec_code(uid: str, password: str) -> dict:
     ftype = "trading_code.py"
-    file_path = Path(f"./user_assets/{uid}/{ftype}")
+    file_path = Path(asset_path(uid, ftype))
     
     if not file_path.exists():
         return {"status": "error", "message": f"File {file_path} does not exist"}
 
     window_title = f"{uid}_{password}_trading_code"
-    log_file = Path(f"./user_assets/{uid}/trading_code.log")
-    exit_code_file = Path(f"./user_assets/{uid}/trading_code.exitcode")
+    log_file = Path(asset_path(uid, "trading_code.log"))
+    exit_code_file = Path(asset_path(uid, "trading_code.exitcode"))
 
     # Cleanup any previous files
     for f in [log_file, exit_code_file]:
@@ -1,17 +1,39 @@
+import asyncio
 import subprocess
-import json
-import sqlite3
+import sys
 from pathlib import Path
 
+import psutil
+
+sys.path.append('..')
+from core_db.state_store import mark_deployed
+from utils.asset_files import asset_path
+from utils.log_segments import rotate_log
+
+def kill_process_tree(pid):
+    # A bot that cannot be recorded in the state store must not keep running unmanaged
+    try:
+        parent = psutil.Process(pid)
+        for process in parent.children(recursive=True) + [parent]:
+            process.kill()
+    except psutil.Error as e:
+        print(f"Failed to kill process {pid}: {e}")
+
 async def deploy_code(uid: str, password: str) -> dict:
     """Deploy trading code in a new terminal window (runs indefinitely)"""
     try:
         ftype = "trading_code.py"
-        file_path = Path(f"./user_assets/{uid}/{ftype}")
+        file_path = Path(asset_path(uid, ftype))
         
         if not file_path.exists():
             return {"status": "error", "message": f"File {file_path} does not exist"}
 
+        # The previous run's log becomes a segment before the new bot starts appending, its history is kept
+        try:
+            await asyncio.to_thread(rotate_log, asset_path(uid, "data_log.txt"), True)
+        except OSError as e:
+            return {"status": "error", "message": f"Failed to rotate the data log: {str(e)}"}
+
         # Set terminal window title
         window_title = f"{uid}_{password}_python"
         print(f"Window title to Deploy: {window_title}")
@@ -25,40 +47,15 @@ async def deploy_code(uid: str, password: str) -> dict:
         pid = process.pid
         print(f"Started process with PID: {pid}")
 
-        # Insert PID into database
+        # Insert PID and set the deployment status in one transaction, unless the uid was deleted meanwhile
         try:
-            conn = sqlite3.connect("./core_db/users.db")
-            cursor = conn.cursor()
-
-            # Create the table if it doesn't exist
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS pid_data (
-                    uid TEXT PRIMARY KEY NOT NULL UNIQUE,
-                    user_password TEXT NOT NULL,
-                    pid INTEGER NOT NULL UNIQUE
-                )
-            """)
-
-            # Insert new entry (overwrite if exists)
-            cursor.execute("INSERT OR REPLACE INTO pid_data (uid, user_password, pid) VALUES (?, ?, ?)", (uid, password, pid))
-            conn.commit()
-            conn.close()
+            deployed = await mark_deployed(uid, pid)
         except Exception as db_error:
+            kill_process_tree(pid)
             return {"status": "error", "message": f"Database error: {str(db_error)}"}
-
-        # Update deployment status in code_sync.json
-        try:
-            sync_path = Path(f"./user_assets/{uid}/code_sync.json")
-            with open(sync_path, "r") as json_file:
-                data = json.load(json_file)
-            data["deploy_status"] = True
-            with open(sync_path, "w") as json_file:
-                json.dump(data, json_file, indent=4)
-            clear_log_path = Path(f"./user_assets/{uid}/data_log.txt")
-            with open(clear_log_path, "w") as f:
-                f.close()
-        except Exception as file_error:
-            return {"status": "error", "message": f"Failed to update code_sync.json: {str(file_error)}"}
+        if not deployed:
+            kill_process_tree(pid)
+            return {"status": "error", "message": "The uid was deleted during the deployment."}
 
         return {"status": "success", "message": "Deployed successfully."}
 
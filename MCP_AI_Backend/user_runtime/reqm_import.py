@@ -1,15 +1,19 @@
+import sys
 import os
 import subprocess
 import json
 import time
 from pathlib import Path
 
+sys.path.append('..')
+from utils.asset_files import asset_path
+
 async def handle_req_import(uid: str, password: str) -> dict:
     ftype = "initialise.py"
-    file_path = Path(f"./user_assets/{uid}/{ftype}")
+    file_path = Path(asset_path(uid, ftype))
     window_title = f"{uid}_{password}_python_init"
-    log_file = Path(f"./user_assets/{uid}/python_init.log")
-    exit_code_file = Path(f"./user_assets/{uid}/python_init.exitcode")
+    log_file = Path(asset_path(uid, "python_init.log"))
+    exit_code_file = Path(asset_path(uid, "python_init.exitcode"))
 
     # Cleanup any previous files
     for f in [log_file, exit_code_file]:
@@ -1,19 +1,23 @@
+import sys
 import os
 import subprocess
 import json
 import time
 from pathlib import Path
 
+sys.path.append('..')
+from utils.asset_files import asset_path
+
 async def handle_req_install(uid: str, password: str) -> dict:
     ftype = "requirements.txt"
 
-    file_path = Path(f"./user_assets/{uid}/{ftype}")
+    file_path = Path(asset_path(uid, ftype))
     if not file_path.exists():
         return {"status": "error", "message": f"File {file_path} does not exist"}
 
     window_title = f"{uid}_{password}_pip_install"
-    log_file = Path(f"./user_assets/{uid}/pip_install.log")
-    exit_code_file = Path(f"./user_assets/{uid}/pip_install.exitcode")
+    log_file = Path(asset_path(uid, "pip_install.log"))
+    exit_code_file = Path(asset_path(uid, "pip_install.exitcode"))
 
     # Cleanup any previous files
     for f in [log_file, exit_code_file]:
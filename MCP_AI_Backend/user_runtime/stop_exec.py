@@ -1,16 +1,14 @@
 import psutil
-import sqlite3
-import json
+import sys
 
-async def kill_code(uid: str, password: str):
-    try:
-        # Connect to your SQLite DB
-        conn = sqlite3.connect("./core_db/users.db")
-        cursor = conn.cursor()
+sys.path.append('..')
+from core_db.db_access import fetch_one, execute
+from core_db.state_store import set_deploy_status
 
-        # Fetch the PID for the given uid and password
-        cursor.execute("SELECT pid FROM pid_data WHERE uid = ? AND user_password = ?", (uid, password))
-        result = cursor.fetchone()
+async def kill_code(uid: str):
+    try:
+        # Fetch the PID for the given uid, credentials are verified by the auth dependency
+        result = await fetch_one("SELECT pid FROM pid_data WHERE uid = ?", (uid,))
 
         if not result:
             return {"status": "error", "message": "No process found for the given credentials."}
@@ -41,22 +39,10 @@ async def kill_code(uid: str, password: str):
         # Skip terminating or waiting on the parent `cmd.exe`
 
         # Remove entry from DB
-        cursor.execute("DELETE FROM pid_data WHERE uid = ? AND user_password = ?", (uid, password))
-        conn.commit()
-        conn.close()
-
-        json_path = f"./user_assets/{uid}/code_sync.json"
-
-        # Read JSON as a Python dictionary
-        with open(json_path, "r") as f:
-            data = json.load(f)
-
-        # Modify the dictionary
-        data["deploy_status"] = False
+        await execute("DELETE FROM pid_data WHERE uid = ?", (uid,))
 
-        # Write it back as JSON
-        with open(json_path, "w") as f:
-            json.dump(data, f, indent=4)
+        # Mark the graph as editable again
+        await set_deploy_status(uid, False)
         return {"status": "success", "message": "The code has been terminated successfully"}
 
     except psutil.NoSuchProcess:
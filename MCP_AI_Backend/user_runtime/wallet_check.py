@@ -1,52 +1,38 @@
-import os
-import json
+import sqlite3
 from uid_management.wallet_generator import get_wallet
+from core_db import state_store
 
 async def ensure_wallet(uid: str):
-    path = f"./user_assets/{uid}/wallet_sync.json"
-    
-    # Ensure directory exists
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    
-    # Load or initialize the JSON file
-    data = {}
+    # Load the wallet column of the uid state
     try:
-        if os.path.exists(path):
-            with open(path, "r") as f:
-                try:
-                    data = json.load(f)
-                except json.JSONDecodeError as e:
-                    print(f"Error loading JSON from {path}: {e}")
-                    data = {}
-        else:
-            data = {}
-    except OSError as e:
-        # If there's an error reading the file or directory
-        print(f"Error accessing the file system at {path}: {e}")
+        if await state_store.get_state(uid) is None:
+            return {"status": "error", "message": "404 not found, the uid doesn't exist"}
+        wallet = await state_store.get_wallet(uid)
+    except (sqlite3.Error, ValueError) as e:
+        print(f"Error reading the wallet of {uid}: {e}")
         return {
             "status": "error",
-            "message": "There was an issue accessing the file system. Please try again later."
+            "message": "There was an issue accessing the state store. Please try again later."
         }
     
-    # Check if "wallet" key already exists
-    if "wallet" in data:
+    # Check if a wallet already exists
+    if wallet is not None:
         return {"status": "success", "update": False}
 
     try:
         result = await get_wallet()
         if result["status"] == "success":
-            data["wallet"] = result["wallet"]
             try:
-                with open(path, "w") as f:
-                    json.dump(data, f, indent=2)
-            except OSError as e:
-                # If there's an error writing to the file
-                print(f"Error writing to file {path}: {e}")
+                # Only written when still empty, a concurrent deploy may have won the race
+                stored = await state_store.set_wallet_once(uid, result["wallet"])
+            except sqlite3.Error as e:
+                # If there's an error writing the wallet
+                print(f"Error saving the wallet of {uid}: {e}")
                 return {
                     "status": "error",
                     "message": "There was an issue saving the wallet. Please try again later."
                 }
-            return {"status": "success", "update": True}
+            return {"status": "success", "update": stored}
         else:
             # If get_wallet result is not successful
             print(f"Error getting wallet: {result}")
@@ -0,0 +1,256 @@
+"""
+Per-uid asset files under ./user_assets.
+
+Every uid folder is resolved here: ./user_assets/<h[:2]>/<h[2:4]>/<uid> with
+h the sha256 of the uid, so no directory holds more than a few hundred
+entries. Flat ./user_assets/<uid> folders from before the sharded layout are
+still found until utils.migrate_asset_layout moves them.
+
+Assets are created on first write and written atomically (temp file, fsync,
+os.replace). Their content is stored once in a content-addressed blob store,
+./user_assets/.blobs/<sha[:2]>/<sha256>, and every asset is a hardlink to its
+blob: identical files are deduplicated across uids and a clone only links
+files. Linked inodes are shared, so assets must only be changed through
+write_assets, which replaces the link instead of writing into it.
+"""
+import hashlib
+import os
+import secrets
+import shutil
+import tempfile
+
+USER_ASSETS_DIR = "./user_assets"
+BLOBS_DIR = os.path.join(USER_ASSETS_DIR, ".blobs")
+
+# Runtime output is appended to in place, it is never shared or cloned
+UNSHARED_FILES = {"data_log.txt", "trade_updates.json", "decisions.jsonl", "decisions.idx"}
+UNSHARED_SUFFIXES = (".log", ".exitcode")
+
+
+def shard_folder(uid):
+    # Forward slashes: the path is also embedded in generated Python source
+    digest = hashlib.sha256(uid.encode("utf-8")).hexdigest()
+    return f"{USER_ASSETS_DIR}/{digest[:2]}/{digest[2:4]}/{uid}"
+
+
+def legacy_folder(uid):
+    return f"{USER_ASSETS_DIR}/{uid}"
+
+
+def is_shard_name(name):
+    return len(name) == 2 and all(c in "0123456789abcdef" for c in name)
+
+
+def user_folder(uid):
+    folder = shard_folder(uid)
+    if not os.path.isdir(folder):
+        legacy = legacy_folder(uid)
+        if os.path.isdir(legacy):
+            return legacy
+    return folder
+
+
+def asset_path(uid, name):
+    return os.path.join(user_folder(uid), name)
+
+
+def blob_path(digest):
+    return os.path.join(BLOBS_DIR, digest[:2], digest)
+
+
+def is_shared(name):
+    # Dotfiles are staging temp files and rotation state, <log>.<start>-<end>[.gz] are rotated log segments
+    if name.startswith(".") or name.endswith(UNSHARED_SUFFIXES):
+        return False
+    return not any(name == log or name.startswith(f"{log}.") for log in UNSHARED_FILES)
+
+
+def read_asset(uid, name, default=""):
+    # Assets are created on first write, a file that was never written reads as its default
+    try:
+        with open(asset_path(uid, name), "r", encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return default
+
+
+def _write_temp(folder, name, data):
+    fd, tmp = tempfile.mkstemp(dir=folder, prefix=f".{name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return tmp
+
+
+def _link_temp(src, folder, name):
+    tmp = os.path.join(folder, f".{name}.{secrets.token_hex(6)}.tmp")
+    os.link(src, tmp)
+    return tmp
+
+
+def _fsync_dir(folder):
+    # Makes the renames durable; directories cannot be opened for fsync on Windows
+    try:
+        fd = os.open(folder, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _store_blob(data):
+    digest = hashlib.sha256(data).hexdigest()
+    path = blob_path(digest)
+    if not os.path.exists(path):
+        folder = os.path.dirname(path)
+        os.makedirs(folder, exist_ok=True)
+        # Concurrent writers of the same content race to an identical file
+        os.replace(_write_temp(folder, digest, data), path)
+        _fsync_dir(folder)
+    return path
+
+
+def _commit(folder, staged):
+    try:
+        for tmp, path in staged:
+            os.replace(tmp, path)
+    except BaseException:
+        for tmp, _ in staged:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+        raise
+    _fsync_dir(folder)
+    return [path for _, path in staged]
+
+
+def write_assets(uid, files):
+    """
+    Atomically replace several assets of a uid, creating its folder on the first write.
+
+    Every file is staged (a link to its fsynced blob, or a private fsynced
+    copy where the filesystem has no hardlinks) before the first os.replace,
+    so a crash leaves either the old or the new content. The folder is fsynced
+    once for the whole batch.
+    """
+    folder = user_folder(uid)
+    if folder != shard_folder(uid):
+        try:
+            return _write_assets(folder, files)
+        except FileNotFoundError:
+            # The legacy folder was moved into its shard by utils.migrate_asset_layout meanwhile
+            folder = shard_folder(uid)
+    os.makedirs(folder, exist_ok=True)
+    return _write_assets(folder, files)
+
+
+def _write_assets(folder, files):
+    staged = []
+    try:
+        for name, content in files.items():
+            data = content.encode("utf-8")
+            try:
+                tmp = _link_temp(_store_blob(data), folder, name)
+            except OSError:
+                # No hardlinks here, or the blob was collected meanwhile
+                tmp = _write_temp(folder, name, data)
+            staged.append((tmp, os.path.join(folder, name)))
+    except BaseException:
+        for tmp, _ in staged:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+        raise
+    return _commit(folder, staged)
+
+
+def write_asset(uid, name, content):
+    return write_assets(uid, {name: content})[0]
+
+
+def clone_assets(uid_from, uid_to):
+    """
+    Give uid_to the shared assets of uid_from, returns the cloned file names.
+
+    Files are hardlinked, so a clone costs the same whatever their size; logs
+    and other runtime output are left behind. Filesystems without hardlinks
+    fall back to a copy.
+    """
+    try:
+        entries = [entry for entry in os.scandir(user_folder(uid_from)) if entry.is_file() and is_shared(entry.name)]
+    except FileNotFoundError:
+        return []
+    if not entries:
+        return []
+
+    folder = user_folder(uid_to)
+    os.makedirs(folder, exist_ok=True)
+    staged = []
+    try:
+        for entry in entries:
+            try:
+                tmp = _link_temp(entry.path, folder, entry.name)
+            except OSError:
+                tmp = os.path.join(folder, f".{entry.name}.{secrets.token_hex(6)}.tmp")
+                shutil.copyfile(entry.path, tmp)
+            staged.append((tmp, os.path.join(folder, entry.name)))
+    except BaseException:
+        for tmp, _ in staged:
+            os.unlink(tmp)
+        raise
+    _commit(folder, staged)
+    return [entry.name for entry in entries]
+
+
+def shared_digest(uid):
+    """
+    sha256 over the names and file identities of the assets clone_assets would copy from a uid.
+
+    Assets are links to their blob, so two uids holding the same content share
+    the inode and nothing is read. Copies made without hardlinks never match,
+    which only costs a fresh clone.
+    """
+    try:
+        entries = sorted(
+            (entry for entry in os.scandir(user_folder(uid)) if entry.is_file() and is_shared(entry.name)),
+            key=lambda entry: entry.name,
+        )
+    except FileNotFoundError:
+        entries = []
+    digest = hashlib.sha256()
+    for entry in entries:
+        # DirEntry.stat() leaves st_ino at 0 on Windows
+        stat = os.stat(entry.path)
+        digest.update(f"{entry.name}\0{stat.st_dev}:{stat.st_ino}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def blob_shards():
+    """Paths of the shard folders of the blob store."""
+    try:
+        return sorted(entry.path for entry in os.scandir(BLOBS_DIR) if entry.is_dir())
+    except FileNotFoundError:
+        return []
+
+
+def collect_blobs(shard):
+    """Remove the blobs of one shard folder no asset links to any more, returns (checked, removed)."""
+    checked = removed = 0
+    try:
+        entries = list(os.scandir(shard))
+    except FileNotFoundError:
+        return 0, 0
+    for entry in entries:
+        if not entry.is_file() or entry.name.startswith("."):
+            continue
+        checked += 1
+        # DirEntry.stat() leaves st_nlink at 0 on Windows
+        if os.stat(entry.path).st_nlink == 1:
+            os.unlink(entry.path)
+            removed += 1
+    return checked, removed
@@ -0,0 +1,210 @@
+"""
+Structured decision log of a deployed bot, with an hourly index.
+
+The bot appends one JSON record per evaluated candle batch to decisions.jsonl
+in its uid folder. Every closed hour gets one line in decisions.idx with the
+byte range of its records and their aggregates (agent and final decisions,
+risk filter checks and overrides), so time-range queries seek straight to
+their first hour and hourly statistics are read from the index; only the
+hour still being written is scanned.
+
+Record fields written by the generated bot:
+    ts        epoch seconds
+    agent     decision of the generated agent code (buy / sell / hold)
+    risk      risk profile (low / med / high)
+    checked   whether the risk filter evaluated the decision
+    override  whether the risk filter turned it into a hold
+    reason    why the risk filter overrode it
+    final     decision after the risk filter and the position check
+    position  liq or tkn after the decision
+
+Offsets are logical (utils.log_segments): decisions.jsonl is rotated into
+gzip segments like data_log.txt, the index keeps the aggregates of hours
+whose records retention already removed.
+
+This module only uses the standard library, the bot imports it from the
+project root.
+"""
+import json
+import os
+import time
+
+from utils.log_segments import rotate_log, iter_lines
+
+RECORDS_FILE = "decisions.jsonl"
+INDEX_FILE = "decisions.idx"
+BUCKET_SECONDS = 3600
+
+
+def _new_bucket(bucket, start):
+    return {"bucket": bucket, "start": start, "end": start, "records": 0, "agent": {}, "final": {}, "checked": 0, "overridden": 0}
+
+
+def _count(entry, record):
+    entry["records"] += 1
+    for field in ("agent", "final"):
+        value = record.get(field)
+        if isinstance(value, str):
+            entry[field][value] = entry[field].get(value, 0) + 1
+    if record.get("checked"):
+        entry["checked"] += 1
+        if record.get("override"):
+            entry["overridden"] += 1
+
+
+def _terminate_last_line(path):
+    # A writer killed mid-line would otherwise glue its half record to the next one
+    try:
+        with open(path, "rb+") as f:
+            if f.seek(0, os.SEEK_END) == 0:
+                return
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+    except FileNotFoundError:
+        pass
+
+
+def read_index(folder):
+    """Index entries of the closed hours, oldest first; a torn last line is ignored."""
+    entries = []
+    try:
+        with open(os.path.join(folder, INDEX_FILE), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def scan(path, start=0):
+    """(offset, end, record) for every complete record from logical offset start on, rotated segments included."""
+    for offset, line in iter_lines(path, start):
+        if not line.endswith(b"\n"):
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(record, dict) and isinstance(record.get("ts"), (int, float)):
+            yield offset, offset + len(line), record
+
+
+def summarise(path, start=0):
+    """Bucket entries of the records from start on; timestamps never move a record into an earlier bucket."""
+    buckets = []
+    for offset, end, record in scan(path, start):
+        bucket = int(record["ts"] // BUCKET_SECONDS)
+        if not buckets or bucket > buckets[-1]["bucket"]:
+            buckets.append(_new_bucket(bucket, offset))
+        _count(buckets[-1], record)
+        buckets[-1]["end"] = end
+    return buckets
+
+
+class DecisionWriter:
+    """Appends decision records of one uid and closes hourly index entries as hours go by."""
+
+    def __init__(self, folder):
+        os.makedirs(folder, exist_ok=True)
+        self.path = os.path.join(folder, RECORDS_FILE)
+        self.index_path = os.path.join(folder, INDEX_FILE)
+        _terminate_last_line(self.path)
+        _terminate_last_line(self.index_path)
+
+        # Records written after the last index entry (a restart, or a crash before an hour was closed)
+        entries = read_index(folder)
+        buckets = summarise(self.path, entries[-1]["end"] if entries else 0)
+        for entry in buckets[:-1]:
+            self._append_index(entry)
+        self.bucket = buckets[-1] if buckets else None
+
+    def _append_index(self, entry):
+        with open(self.index_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+    def write(self, **record):
+        record.setdefault("ts", time.time())
+        line = (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+        base = rotate_log(self.path)
+        with open(self.path, "ab") as f:
+            offset = base + f.tell()
+            f.write(line)
+
+        bucket = int(record["ts"] // BUCKET_SECONDS)
+        if self.bucket is not None and bucket > self.bucket["bucket"]:
+            self._append_index(self.bucket)
+            self.bucket = None
+        if self.bucket is None:
+            self.bucket = _new_bucket(bucket, offset)
+        _count(self.bucket, record)
+        self.bucket["end"] = offset + len(line)
+
+
+def _buckets(folder):
+    # Closed hours from the index plus the open hour(s) after its last entry
+    entries = read_index(folder)
+    tail = summarise(os.path.join(folder, RECORDS_FILE), entries[-1]["end"] if entries else 0)
+    return entries + tail
+
+
+def query_records(folder, since=None, until=None, cursor=None, limit=500):
+    """
+    Records with since <= ts < until, oldest first, at most limit of them.
+
+    Returns (records, next_cursor); pass next_cursor back as cursor for the
+    next page, it is None once the range is exhausted.
+    """
+    # Step 1: Seek to the first hour of the range, or to the open hour when no closed one qualifies
+    start = 0
+    if since is not None:
+        entries = read_index(folder)
+        first = since // BUCKET_SECONDS
+        start = next((entry["start"] for entry in entries if entry["bucket"] >= first), entries[-1]["end"] if entries else 0)
+    if cursor is not None:
+        start = max(start, cursor)
+
+    # Step 2: Read records until the hour after until
+    last = None if until is None else until // BUCKET_SECONDS
+    records = []
+    for _, end, record in scan(os.path.join(folder, RECORDS_FILE), start):
+        if last is not None and record["ts"] // BUCKET_SECONDS > last:
+            break
+        if (since is not None and record["ts"] < since) or (until is not None and record["ts"] >= until):
+            continue
+        records.append(record)
+        if len(records) == limit:
+            return records, end
+    return records, None
+
+
+def bucket_stats(folder, since=None, until=None):
+    """Hourly aggregates of the hours overlapping [since, until) plus their totals."""
+    first = None if since is None else since // BUCKET_SECONDS
+    last = None if until is None else (until - 1) // BUCKET_SECONDS
+    hours = []
+    totals = _new_bucket(None, 0)
+    for entry in _buckets(folder):
+        if (first is not None and entry["bucket"] < first) or (last is not None and entry["bucket"] > last):
+            continue
+        hours.append({
+            "hour": entry["bucket"] * BUCKET_SECONDS,
+            "records": entry["records"],
+            "agent": entry["agent"],
+            "final": entry["final"],
+            "checked": entry["checked"],
+            "overridden": entry["overridden"],
+            "override_rate": entry["overridden"] / entry["checked"] if entry["checked"] else None,
+        })
+        totals["records"] += entry["records"]
+        totals["checked"] += entry["checked"]
+        totals["overridden"] += entry["overridden"]
+        for field in ("agent", "final"):
+            for value, count in entry[field].items():
+                totals[field][value] = totals[field].get(value, 0) + count
+    summary = {field: totals[field] for field in ("records", "agent", "final", "checked", "overridden")}
+    summary["override_rate"] = totals["overridden"] / totals["checked"] if totals["checked"] else None
+    return hours, summary
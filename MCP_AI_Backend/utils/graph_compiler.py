@@ -0,0 +1,172 @@
+import copy
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Dict, Any
+from utils.graph_preprocess import canonical_graph_hash
+
+IR_CACHE_SIZE = 256
+START_NODE_TYPE = "startNode"
+# data fields the backend reads, with the type clients must send them as
+DATA_FIELD_TYPES = {"parentId": str, "strategyText": str}
+
+
+@dataclass(frozen=True)
+class GraphNode:
+    id: str
+    type: str
+    data: Dict[str, Any]
+
+
+@dataclass
+class GraphIR:
+    fingerprint: str
+    nodes: Dict[str, GraphNode]                 # id -> node, in the original order
+    edges: list[tuple[str, str]]                # unique (source, target) pairs between known nodes
+    children: Dict[str, list[str]]
+    parents: Dict[str, list[str]]
+    order: list[str]                            # topological order, ties keep the original order
+    errors: list[str] = field(default_factory=list)
+    warnings: list[str] = field(default_factory=list)
+
+    @property
+    def valid(self):
+        return not self.errors
+
+    def ordered_nodes(self):
+        return [self.nodes[nid] for nid in self.order]
+
+    def nodes_of_type(self, node_type):
+        return [node for node in self.nodes.values() if node.type == node_type]
+
+    def to_workflow(self, exclude=()):
+        """filter_workflow_json shaped dict, optionally without some nodes and their edges."""
+        return {
+            "nodes": [{"id": n.id, "type": n.type, "data": n.data} for n in self.nodes.values() if n.id not in exclude],
+            "edges": [{"source": s, "target": t} for s, t in self.edges if s not in exclude and t not in exclude],
+        }
+
+
+_ir_cache = OrderedDict()
+
+
+def _build_ir(fingerprint, raw_nodes, raw_edges):
+    errors = []
+    nodes = {}
+    for node in raw_nodes:
+        if node["id"] in nodes:
+            errors.append(f"Duplicate node id '{node['id']}'")
+            continue
+        # The IR is cached and shared, it must not alias the caller's dicts
+        nodes[node["id"]] = GraphNode(node["id"], node["type"], copy.deepcopy(node["data"]) or {})
+
+    # Step 1: Adjacency, dropping edges that point at nodes which do not exist
+    edges = []
+    seen = set()
+    children = {nid: [] for nid in nodes}
+    parents = {nid: [] for nid in nodes}
+    for edge in raw_edges:
+        source, target = edge["source"], edge["target"]
+        missing = [end for end in (source, target) if end not in nodes]
+        if missing:
+            errors.append(f"Edge {source} -> {target} references unknown node(s): {', '.join(missing)}")
+            continue
+        if (source, target) in seen:
+            continue
+        seen.add((source, target))
+        edges.append((source, target))
+        children[source].append(target)
+        parents[target].append(source)
+
+    # Step 2: parentId references (grouped nodes)
+    for node in nodes.values():
+        parent_id = node.data.get("parentId")
+        if isinstance(parent_id, str) and parent_id not in nodes:
+            errors.append(f"Node '{node.id}' has unresolved parentId '{parent_id}'")
+
+    # Step 3: Topological order (Kahn), whatever is left over sits on a cycle
+    position = {nid: i for i, nid in enumerate(nodes)}
+    indegree = {nid: len(parents[nid]) for nid in nodes}
+    ready = sorted((nid for nid, degree in indegree.items() if degree == 0), key=position.get)
+    order = []
+    while ready:
+        nid = ready.pop(0)
+        order.append(nid)
+        for child in children[nid]:
+            indegree[child] -= 1
+            if indegree[child] == 0:
+                ready.append(child)
+                ready.sort(key=position.get)
+    cyclic = [nid for nid in nodes if indegree[nid] > 0]
+    if cyclic:
+        errors.append(f"Graph contains a cycle, nodes on or after it: {', '.join(cyclic)}")
+        order += cyclic
+
+    # Step 4: Reachability from the start node(s)
+    warnings = []
+    starts = [nid for nid, node in nodes.items() if node.type == START_NODE_TYPE]
+    if nodes and not starts:
+        warnings.append("Graph has no start node")
+    elif starts:
+        reached = set(starts)
+        queue = deque(starts)
+        while queue:
+            for child in children[queue.popleft()]:
+                if child not in reached:
+                    reached.add(child)
+                    queue.append(child)
+        unreachable = [nid for nid in nodes if nid not in reached]
+        if unreachable:
+            warnings.append(f"Node(s) not reachable from the start node: {', '.join(unreachable)}")
+
+    return GraphIR(fingerprint, nodes, edges, children, parents, order, errors, warnings)
+
+
+def compile_graph_ir(input_json):
+    """
+    Typed, validated view of a workflow graph, built once per fingerprint.
+
+    Malformed input (nodes without id/type, edges without source/target, data
+    fields of the wrong type) is reported through `errors` instead of raising,
+    so /update can reject it.
+    """
+    errors = []
+    raw_nodes, raw_edges = [], []
+    if not isinstance(input_json, dict):
+        errors.append("Graph must be a JSON object")
+        input_json = {}
+    for i, node in enumerate(input_json.get("nodes", []) or []):
+        if not isinstance(node, dict) or not isinstance(node.get("id"), str) or not isinstance(node.get("type"), str):
+            errors.append(f"Node #{i} must have a string id and type")
+            continue
+        # Raw data goes into the fingerprint so it matches canonical_graph_hash
+        data = node.get("data", {})
+        if data is not None and not isinstance(data, dict):
+            errors.append(f"Node '{node['id']}' data must be an object")
+            continue
+        wrong = [key for key, kind in DATA_FIELD_TYPES.items() if (data or {}).get(key) is not None and not isinstance(data[key], kind)]
+        if wrong:
+            errors.append(f"Node '{node['id']}' data field(s) must be strings: {', '.join(wrong)}")
+            continue
+        raw_nodes.append({"id": node["id"], "type": node["type"], "data": data})
+    for i, edge in enumerate(input_json.get("edges", []) or []):
+        if not isinstance(edge, dict) or not isinstance(edge.get("source"), str) or not isinstance(edge.get("target"), str):
+            errors.append(f"Edge #{i} must have a source and target")
+            continue
+        raw_edges.append({"source": edge["source"], "target": edge["target"]})
+
+    fingerprint = canonical_graph_hash({"nodes": raw_nodes, "edges": raw_edges})
+    if errors:
+        # Shape errors are not part of the fingerprint, so such builds are never shared
+        ir = _build_ir(fingerprint, raw_nodes, raw_edges)
+        ir.errors = errors + ir.errors
+        return ir
+
+    ir = _ir_cache.get(fingerprint)
+    if ir is not None:
+        _ir_cache.move_to_end(fingerprint)
+        return ir
+    ir = _build_ir(fingerprint, raw_nodes, raw_edges)
+    _ir_cache[fingerprint] = ir
+    if len(_ir_cache) > IR_CACHE_SIZE:
+        _ir_cache.popitem(last=False)
+    return ir
@@ -0,0 +1,42 @@
+import json
+import hashlib
+from utils.graph_compiler import compile_graph_ir, GraphIR
+
+
+def node_hash(node):
+    # Type and data only, positions and other React Flow fields never reach the hash
+    canonical = json.dumps({"type": node.type, "data": node.data}, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+def graph_signature(input_json):
+    # Compact per-node view of a graph, stored with the uid state so the next update can diff without the old graph
+    ir = input_json if isinstance(input_json, GraphIR) else compile_graph_ir(input_json)
+    return {
+        "nodes": {nid: node_hash(node) for nid, node in ir.nodes.items()},
+        "edges": sorted(ir.edges),
+    }
+
+
+def diff_signatures(old, new):
+    old_nodes, new_nodes = old.get("nodes", {}), new.get("nodes", {})
+    old_edges = {tuple(edge) for edge in old.get("edges", [])}
+    new_edges = {tuple(edge) for edge in new.get("edges", [])}
+
+    changes = {
+        "nodes": {
+            "added": sorted(set(new_nodes) - set(old_nodes)),
+            "removed": sorted(set(old_nodes) - set(new_nodes)),
+            "changed": sorted(nid for nid in set(old_nodes) & set(new_nodes) if old_nodes[nid] != new_nodes[nid]),
+        },
+        "edges": {
+            "added": [list(edge) for edge in sorted(new_edges - old_edges)],
+            "removed": [list(edge) for edge in sorted(old_edges - new_edges)],
+        },
+    }
+    changes["changed"] = any(changes["nodes"].values()) or any(changes["edges"].values())
+    return changes
+
+
+def diff_graphs(old_graph, new_graph):
+    return diff_signatures(graph_signature(old_graph), graph_signature(new_graph))
@@ -1,4 +1,5 @@
 import json
+import hashlib
 
 def filter_workflow_json(input_json):
     return {
@@ -17,4 +18,14 @@ def filter_workflow_json(input_json):
             }
             for edge in input_json.get("edges", [])
         ]
-    }
\ No newline at end of file
+    }
+
+def canonical_graph_hash(input_json):
+    # Stable hash of the semantic graph: UI-only fields dropped, nodes/edges sorted
+    graph = filter_workflow_json(input_json)
+    graph["nodes"].sort(key=lambda node: node["id"])
+    graph["edges"].sort(key=lambda edge: (edge["source"], edge["target"]))
+    canonical = json.dumps(graph, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
@@ -1,26 +1,59 @@
 import json
-from utils.graph_preprocess import filter_workflow_json
+from utils.graph_compiler import compile_graph_ir
+
+# Frontend/React Flow fields that carry no strategy meaning
+UI_FIELDS = {
+    "label", "onAddChildNode", "selected", "dragging", "width", "height", "style",
+    "className", "color", "icon", "position", "positionAbsolute", "expanded", "collapsed",
+}
+
+# Repeated values shorter than this are cheaper to repeat than to reference
+DEDUPE_MIN_LENGTH = 24
+
 
 def map_json(graph):
-    graph_json = filter_workflow_json(graph)
-    if not graph_json:
+    ir = compile_graph_ir(graph)
+    if not ir.nodes and ir.errors:
         return "Invalid graph structure"
-        
+
+    # Short aliases (N1, N2, ...) in topological order instead of long frontend ids
+    ordered = ir.ordered_nodes()
+    alias = {node.id: f"N{i}" for i, node in enumerate(ordered, start=1)}
+    seen_values = {}
+
+    def describe_value(node_alias, key, value):
+        if key == "parentId":
+            return f"parent: {alias.get(value, value)}"
+        if not isinstance(value, str):
+            value = json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+        value = " ".join(value.split())
+        if len(value) >= DEDUPE_MIN_LENGTH:
+            if value in seen_values:
+                return f"{key}: (same as {seen_values[value]})"
+            seen_values[value] = f"{node_alias}.{key}"
+        return f"{key}: {value}"
+
     def describe_node(node):
-        node_type = node["type"].replace("Node", "").capitalize()
-        desc = f"Node ID: {node['id']} | Type: {node_type}"
-        if node["data"]:
-            data_parts = [f"{k}: {v}" for k, v in node["data"].items()]
-            desc += " | " + ", ".join(data_parts)
+        node_alias = alias[node.id]
+        node_type = node.type.replace("Node", "").capitalize()
+        desc = f"{node_alias} {node_type}"
+        data_parts = [
+            describe_value(node_alias, k, v)
+            for k, v in sorted(node.data.items())
+            if k not in UI_FIELDS and v not in (None, "", [], {})
+        ]
+        if data_parts:
+            desc += " | " + " | ".join(data_parts)
         return desc
 
     def describe_edge(edge):
-        source = edge["source"]
-        target = edge["target"]
+        source = alias.get(edge["source"], edge["source"])
+        target = alias.get(edge["target"], edge["target"])
         return f"{source} ➝ {target}"
 
-    node_descriptions = [describe_node(node) for node in graph_json["nodes"]]
-    edge_descriptions = [describe_edge(edge) for edge in graph_json["edges"]]
+    node_descriptions = [describe_node(node) for node in ordered]
+    edges = sorted(ir.edges, key=lambda e: (alias[e[0]], alias[e[1]]))
+    edge_descriptions = [describe_edge({"source": s, "target": t}) for s, t in edges]
 
     final_output = "### Node Descriptions:\n"
     final_output += "\n".join(f"- {desc}" for desc in node_descriptions)
@@ -0,0 +1,154 @@
+"""
+Bounded reads of append-only log files by byte offset.
+
+A poll costs what it returns: reads start at a byte cursor (or seek back from
+the end for a tail) and never touch the rest of the log. Offsets are logical
+(utils.log_segments), so one cursor walks transparently from rotated gzip
+segments into the active file. Pages end on a line boundary, so a record is
+never split between two responses; a trailing line the writer has not
+finished yet is left for the next poll.
+"""
+import os
+
+from utils.log_segments import segment_files, active_base, read_segment
+
+TAIL_BLOCK = 8192  # bytes read per backwards step while looking for line starts
+
+
+def _decode(data):
+    return data.decode("utf-8", errors="replace")
+
+
+def _align(data, limit, complete):
+    # Cut after the last newline, unless the data ends a rotated segment (nothing will be appended to it)
+    if complete:
+        return data
+    end = data.rfind(b"\n") + 1
+    if end:
+        return data[:end]
+    # A single line longer than limit is returned in limit sized pieces
+    return data if len(data) >= limit else b""
+
+
+def read_range(path, cursor, limit):
+    """
+    Complete lines from logical byte offset cursor on, at most limit bytes.
+
+    Returns (text, start, next_cursor, size). A cursor past the end of the log
+    restarts at the beginning of the active file, which the caller sees as
+    start < cursor. A cursor into segments removed by retention continues at
+    the oldest data left (start > cursor). A page never spans two files.
+    """
+    segments = segment_files(path)
+    base = active_base(path, segments)
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        f = None
+    try:
+        size = base + (os.fstat(f.fileno()).st_size if f else 0)
+        start = cursor if cursor <= size else base
+
+        # Step 1: Offsets before the active file are served from the segment holding them
+        if start < base:
+            for seg_start, seg_end, segment in segments:
+                if seg_end <= start:
+                    continue
+                start = max(start, seg_start)
+                try:
+                    data = read_segment(segment, start - seg_start, limit)
+                except FileNotFoundError:
+                    # Removed by retention meanwhile
+                    continue
+                data = _align(data, limit, start + len(data) == seg_end)
+                return _decode(data), start, start + len(data), size
+            start = base
+
+        # Step 2: The active file
+        if f is None:
+            return "", start, start, size
+        f.seek(start - base)
+        data = _align(f.read(limit), limit, False)
+        return _decode(data), start, start + len(data), size
+    finally:
+        if f:
+            f.close()
+
+
+def _tail_lines(f, size, lines, limit):
+    # Complete lines at the end of an open file, read backwards block by block; returns (lines, end, from the file start)
+    # Step 1: Ignore an unfinished last line
+    end = size
+    while end > 0:
+        block_start = max(0, end - TAIL_BLOCK)
+        f.seek(block_start)
+        newline = f.read(end - block_start).rfind(b"\n")
+        if newline != -1:
+            end = block_start + newline + 1
+            break
+        end = block_start
+
+    # Step 2: Walk back until enough line starts are found, the first piece is partial unless the file starts there
+    start, found, data = end, 0, b""
+    while start > 0 and found <= lines and end - start < limit:
+        block_start = max(0, start - TAIL_BLOCK)
+        f.seek(block_start)
+        data = f.read(start - block_start) + data
+        start = block_start
+        found = data.count(b"\n")
+    pieces = data.split(b"\n")[:-1]
+    if start > 0:
+        pieces = pieces[1:]
+    return [piece + b"\n" for piece in pieces], end, start == 0
+
+
+def _split_lines(data):
+    # A rotated segment is complete, its last line counts even without a newline
+    pieces = data.split(b"\n")
+    return [piece + b"\n" for piece in pieces[:-1]] + ([pieces[-1]] if pieces[-1] else [])
+
+
+def read_tail(path, lines, limit):
+    """
+    The last `lines` complete lines, at most limit bytes, read backwards from the end.
+
+    Lines missing from the active file (just rotated) come from the newest
+    segments. Returns (text, start, next_cursor, size); next_cursor continues
+    polling right after the returned lines.
+    """
+    segments = segment_files(path)
+    base = active_base(path, segments)
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        pieces, end, size, from_start = [], 0, 0, True
+    else:
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            pieces, end, from_start = _tail_lines(f, size, lines, limit)
+
+    # Step 3: Keep the last lines that fit in limit, older ones from the segments before the active file
+    kept, length, full = [], 0, False
+    sources = [pieces] + (list(reversed(segments)) if from_start else [])
+    expected = base
+    for source in sources:
+        if full or len(kept) >= lines:
+            break
+        if isinstance(source, tuple):
+            seg_start, seg_end, segment = source
+            if seg_end != expected:
+                # Retention left a gap, the tail stays contiguous
+                break
+            try:
+                source = _split_lines(read_segment(segment))
+            except FileNotFoundError:
+                break
+            expected = seg_start
+        for line in reversed(source):
+            if len(kept) >= lines or length + len(line) > limit:
+                full = True
+                break
+            kept.append(line)
+            length += len(line)
+    text = b"".join(reversed(kept))
+    return _decode(text), base + end - len(text), base + end, base + size
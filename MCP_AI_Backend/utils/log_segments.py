@@ -0,0 +1,215 @@
+"""
+Size and time based rotation of append-only logs into gzip segments.
+
+A log keeps one active file (data_log.txt) that its writer appends to. When
+it reaches SEGMENT_BYTES, or ROTATE_SECONDS after the last rotation, the
+writer renames it to data_log.txt.<start>-<end> and compresses that into
+data_log.txt.<start>-<end>.gz. start and end are logical byte offsets: the
+position of the bytes in the whole history of the log, so cursors handed out
+by the readers stay valid across rotations. The active file starts at the
+end of the newest segment (or, once retention removed every segment, at the
+offset remembered in .data_log.txt.rotation).
+
+Retention keeps at most KEEP_SEGMENTS segments, KEEP_BYTES of compressed
+data and nothing older than KEEP_SECONDS, so a bot that runs for months
+stays within about SEGMENT_BYTES + KEEP_BYTES of disk per log.
+
+This module only uses the standard library, the bot imports it from the
+project root.
+"""
+import gzip
+import json
+import os
+import re
+import shutil
+import time
+
+SEGMENT_BYTES = 8 * 1024 * 1024
+ROTATE_SECONDS = 24 * 3600
+KEEP_SEGMENTS = 30
+KEEP_BYTES = 64 * 1024 * 1024
+KEEP_SECONDS = 30 * 24 * 3600
+CHECK_SECONDS = 30  # writers look at their active file at most this often
+
+# path -> (last check, active base offset) of the logs rotated by this process
+_checked = {}
+
+_SEGMENT_NAME = re.compile(r"\.(\d{20})-(\d{20})(\.gz)?$")
+
+
+def _state_path(path):
+    folder, name = os.path.split(path)
+    return os.path.join(folder, f".{name}.rotation")
+
+
+def read_state(path):
+    try:
+        with open(_state_path(path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"offset": 0, "rotated_at": None}
+
+
+def _write_state(path, offset, rotated_at):
+    state_path = _state_path(path)
+    tmp = f"{state_path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"offset": offset, "rotated_at": rotated_at}, f)
+    os.replace(tmp, state_path)
+
+
+def segment_files(path):
+    """(start, end, segment path) of the rotated segments of a log, oldest first."""
+    folder, name = os.path.split(path)
+    found = {}
+    try:
+        entries = os.listdir(folder or ".")
+    except FileNotFoundError:
+        return []
+    for entry in entries:
+        if not entry.startswith(f"{name}."):
+            continue
+        match = _SEGMENT_NAME.fullmatch(entry[len(name):])
+        if match is None:
+            continue
+        start, end = int(match.group(1)), int(match.group(2))
+        # A segment still being compressed exists twice, the finished .gz wins
+        if start not in found or match.group(3):
+            found[start] = (start, end, os.path.join(folder, entry))
+    return [found[start] for start in sorted(found)]
+
+
+def active_base(path, segments=None):
+    """Logical offset of the first byte of the active file."""
+    if segments is None:
+        segments = segment_files(path)
+    offset = read_state(path)["offset"]
+    return max(offset, segments[-1][1]) if segments else offset
+
+
+def read_segment(segment_path, offset=0, size=-1):
+    """Bytes of a segment from a position inside it, decompressing .gz segments."""
+    opener = gzip.open if segment_path.endswith(".gz") else open
+    with opener(segment_path, "rb") as f:
+        f.seek(offset)
+        return f.read(size)
+
+
+def _compress(segment_path):
+    tmp = f"{segment_path}.gz.tmp"
+    with open(segment_path, "rb") as src, gzip.open(tmp, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    with open(tmp, "rb+") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, f"{segment_path}.gz")
+    os.unlink(segment_path)
+
+
+def _apply_retention(path, now):
+    segments = segment_files(path)
+    sizes = [os.path.getsize(segment) for _, _, segment in segments]
+    total = sum(sizes)
+    count = len(segments)
+    for (_, _, segment), size in zip(segments, sizes):
+        expired = now - os.path.getmtime(segment) > KEEP_SECONDS
+        if not expired and count <= KEEP_SEGMENTS and total <= KEEP_BYTES:
+            break
+        os.unlink(segment)
+        count -= 1
+        total -= size
+
+
+def rotate_log(path, force=False, now=None):
+    """
+    Rotate the active file of a log when it is due (or force), returns the active base offset.
+
+    Only the writer of a log (or the deploy, before the writer starts) rotates
+    it. A rotation that cannot rename the file, e.g. while a reader holds it
+    open on Windows, is retried on the next call.
+    """
+    now = time.time() if now is None else now
+    checked = _checked.get(path)
+    if not force and checked is not None and now - checked[0] < CHECK_SECONDS:
+        return checked[1]
+    base = _rotate(path, force, now)
+    _checked[path] = (now, base)
+    return base
+
+
+def _rotate(path, force, now):
+    state = read_state(path)
+    segments = segment_files(path)
+    base = active_base(path, segments)
+    try:
+        size = os.path.getsize(path)
+    except FileNotFoundError:
+        size = 0
+
+    # Step 1: Is the active file due
+    if state["rotated_at"] is None:
+        # First call for this log, the rotation period starts now
+        _write_state(path, base, now)
+        state["rotated_at"] = now
+    due = size >= SEGMENT_BYTES or now - state["rotated_at"] >= ROTATE_SECONDS
+    if size == 0 or not (force or due):
+        return base
+
+    # Step 2: Rename it into a segment, the next append starts a new active file
+    end = base + size
+    segment_path = f"{path}.{base:020d}-{end:020d}"
+    try:
+        os.rename(path, segment_path)
+    except OSError as e:
+        print(f"[LOG ROTATION] Unable to rotate {path}: {e}")
+        return base
+    _write_state(path, end, now)
+
+    # Step 3: Compress it (and any segment an interrupted rotation left uncompressed), then apply retention
+    try:
+        for _, _, pending in segment_files(path):
+            if not pending.endswith(".gz"):
+                _compress(pending)
+        _apply_retention(path, now)
+    except OSError as e:
+        # The writer keeps going, uncompressed segments stay readable and are retried next rotation
+        print(f"[LOG ROTATION] Unable to compress or prune the segments of {path}: {e}")
+    return end
+
+
+def logical_size(path):
+    """Logical offset right after the last byte written to a log."""
+    try:
+        size = os.path.getsize(path)
+    except FileNotFoundError:
+        size = 0
+    return active_base(path) + size
+
+
+def iter_lines(path, start=0):
+    """(offset, line) for every line from logical offset start on, across segments and the active file."""
+    segments = segment_files(path)
+    base = active_base(path, segments)
+    for seg_start, seg_end, segment in segments:
+        if seg_end <= start:
+            continue
+        offset = max(start, seg_start)
+        opener = gzip.open if segment.endswith(".gz") else open
+        try:
+            with opener(segment, "rb") as f:
+                f.seek(offset - seg_start)
+                for line in f:
+                    yield offset, line
+                    offset += len(line)
+        except FileNotFoundError:
+            # Removed by retention meanwhile
+            continue
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return
+    with f:
+        offset = max(start, base)
+        f.seek(offset - base)
+        for line in f:
+            yield offset, line
+            offset += len(line)
@@ -0,0 +1,108 @@
+"""
+One filesystem watcher per log file, fanned out to every subscriber.
+
+The first subscriber of a path starts a watchfiles task on its folder; each
+change is read once, from the last offset on, and the new lines are queued to
+every subscriber. Queues are bounded: a subscriber that falls behind stops
+receiving chunks and catches up with its own bounded reads instead, so a slow
+client never blocks the others or grows memory. The watcher stops with its
+last subscriber. A uid folder that does not exist yet is not created (assets
+are created on first write), the watcher waits for it on its nearest
+existing parent.
+"""
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+from watchfiles import awatch
+
+from utils.log_reader import read_range, read_tail
+
+FEED_PAGE = 256 * 1024     # bytes read per step when the watcher picks up an append
+SUBSCRIBER_QUEUE = 64      # chunks buffered per subscriber before it has to catch up on its own
+WATCH_DEBOUNCE_MS = 200
+FOLDER_RECHECK_MS = 5000   # the missing folder is looked for again at least this often, in case its creation was missed
+
+# path -> _Feed, entries go away with their last subscriber
+_feeds = {}
+
+
+def _existing_parent(folder):
+    parent = os.path.dirname(os.path.abspath(folder))
+    while not os.path.isdir(parent):
+        parent = os.path.dirname(parent)
+    return parent
+
+
+class _Feed:
+    def __init__(self, path):
+        self.path = path
+        self.position = None
+        self.subscribers = set()
+        self.stop = asyncio.Event()
+        self.task = asyncio.create_task(self.run())
+
+    async def run(self):
+        folder, name = os.path.split(self.path)
+        try:
+            # End of the last complete line, the same boundary subscribers' reads stop at; nothing is published before
+            self.position = (await asyncio.to_thread(read_tail, self.path, 0, 1))[2]
+            if not await self.wait_for_folder(folder):
+                return
+            # Lines written before the watch below started
+            await self.publish()
+            async for _ in awatch(
+                folder, stop_event=self.stop, debounce=WATCH_DEBOUNCE_MS, recursive=False,
+                watch_filter=lambda change, changed: os.path.basename(changed) == name,
+            ):
+                await self.publish()
+        except Exception as e:
+            # Subscribers still re-read from their cursor on every heartbeat
+            print(f"[LOG WATCH] Watcher on {self.path} stopped: {e}")
+
+    async def wait_for_folder(self, folder):
+        # The first write creates the folder, watch whichever of its parents exists until it is there
+        target = os.path.abspath(folder)
+        while not await asyncio.to_thread(os.path.isdir, folder):
+            parent = await asyncio.to_thread(_existing_parent, folder)
+            async for _ in awatch(
+                parent, stop_event=self.stop, debounce=WATCH_DEBOUNCE_MS, recursive=False,
+                rust_timeout=FOLDER_RECHECK_MS, yield_on_timeout=True,
+                watch_filter=lambda change, changed: target.startswith(os.path.abspath(changed)),
+            ):
+                break
+            if self.stop.is_set():
+                return False
+        return True
+
+    async def publish(self):
+        while True:
+            text, start, end, _ = await asyncio.to_thread(read_range, self.path, self.position, FEED_PAGE)
+            reset = start < self.position
+            if end == self.position and not reset:
+                return
+            self.position = end
+            for queue in self.subscribers:
+                try:
+                    queue.put_nowait((start, end, text, reset))
+                except asyncio.QueueFull:
+                    # Marks the subscriber as lagging, it re-reads from its own cursor
+                    queue.lagging = True
+
+
+@asynccontextmanager
+async def subscribe(path):
+    """Queue of (start, end, text, reset) chunks appended to path; queue.lagging means chunks were dropped."""
+    feed = _feeds.get(path)
+    if feed is None:
+        feed = _feeds[path] = _Feed(path)
+    queue = asyncio.Queue(SUBSCRIBER_QUEUE)
+    queue.lagging = False
+    feed.subscribers.add(queue)
+    try:
+        yield queue
+    finally:
+        feed.subscribers.discard(queue)
+        if not feed.subscribers:
+            del _feeds[path]
+            feed.stop.set()
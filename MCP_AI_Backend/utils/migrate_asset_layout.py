@@ -0,0 +1,110 @@
+"""
+Online migration of flat ./user_assets/<uid> folders into the sharded layout.
+
+Safe to run while the server is up: utils.asset_files.user_folder finds a
+uid in either layout, and each folder moves with a single os.rename inside
+the same filesystem. Folders are left where they are when their uid is
+deployed (the running bot has the path compiled in) or when they were
+written recently (a deploy pipeline may still be using the old path); run
+the tool again later to pick them up.
+
+    python -m utils.migrate_asset_layout --dry-run
+    python -m utils.migrate_asset_layout --rate 200 --min-idle 300
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from core_db.db_access import init_db, close_db
+from core_db.state_store import get_state
+from utils.asset_files import USER_ASSETS_DIR, shard_folder, is_shard_name
+
+
+def legacy_uids():
+    # Flat uid folders, shard directories and dot directories (.blobs) are not uids
+    with os.scandir(USER_ASSETS_DIR) as entries:
+        return sorted(
+            entry.name for entry in entries
+            if entry.is_dir() and not entry.name.startswith(".") and not is_shard_name(entry.name)
+        )
+
+
+def last_write(folder):
+    latest = os.stat(folder).st_mtime
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            latest = max(latest, entry.stat(follow_symlinks=False).st_mtime)
+    return latest
+
+
+def move_folder(uid):
+    source = os.path.join(USER_ASSETS_DIR, uid)
+    target = shard_folder(uid)
+    if os.path.exists(target):
+        return False
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.rename(source, target)
+    return True
+
+
+async def migrate(rate, min_idle, dry_run):
+    """Move every idle, undeployed legacy folder into its shard; returns (moved, skipped)."""
+    moved, skipped = 0, 0
+    for uid in legacy_uids():
+        # Step 1: Leave deployed and recently written folders where they are
+        state = await get_state(uid)
+        if state is not None and state["deploy_status"]:
+            print(f"[SKIP] {uid}: deployed")
+            skipped += 1
+            continue
+        if time.time() - last_write(os.path.join(USER_ASSETS_DIR, uid)) < min_idle:
+            print(f"[SKIP] {uid}: written in the last {min_idle}s")
+            skipped += 1
+            continue
+
+        # Step 2: Move the folder in one rename
+        if dry_run:
+            print(f"[DRY RUN] {uid} -> {shard_folder(uid)}")
+        elif move_folder(uid):
+            moved += 1
+        else:
+            print(f"[SKIP] {uid}: {shard_folder(uid)} already exists")
+            skipped += 1
+            continue
+
+        # Step 3: Rate limit, the server keeps serving from the same disk
+        await asyncio.sleep(1 / rate)
+    return moved, skipped
+
+
+async def run(args):
+    await init_db()
+    try:
+        return await migrate(args.rate, args.min_idle, args.dry_run)
+    finally:
+        close_db()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move flat user_assets/<uid> folders into the sharded layout")
+    parser.add_argument("--rate", type=float, default=100.0, help="Folders moved per second")
+    parser.add_argument("--min-idle", type=float, default=300.0, help="Skip folders written within this many seconds")
+    parser.add_argument("--dry-run", action="store_true", help="Only print the planned moves")
+    args = parser.parse_args()
+
+    # Paths are relative to the project root, like the server's
+    os.chdir(PROJECT_ROOT)
+    if not os.path.isdir(USER_ASSETS_DIR):
+        print(f"Nothing to migrate, {USER_ASSETS_DIR} does not exist")
+        return
+    moved, skipped = asyncio.run(run(args))
+    print(f"Moved {moved} folder(s) into the sharded layout, skipped {skipped}")
+
+
+if __name__ == "__main__":
+    main()
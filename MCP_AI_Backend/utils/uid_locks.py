@@ -0,0 +1,34 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+# uid -> [lock, number of tasks holding or waiting for it], entries go away when unused
+_locks = {}
+
+
+@asynccontextmanager
+async def uid_lock(*uids):
+    """
+    Serialise the requests touching the same uid(s) inside this process.
+
+    Several uids are locked in sorted order so two requests over the same pair
+    cannot deadlock. Across worker processes the state store transactions and
+    atomic asset writes keep each individual change consistent.
+    """
+    ordered = sorted(set(uids))
+    for uid in ordered:
+        entry = _locks.setdefault(uid, [asyncio.Lock(), 0])
+        entry[1] += 1
+    acquired = []
+    try:
+        for uid in ordered:
+            await _locks[uid][0].acquire()
+            acquired.append(uid)
+        yield
+    finally:
+        for uid in reversed(acquired):
+            _locks[uid][0].release()
+        for uid in ordered:
+            entry = _locks[uid]
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _locks[uid]